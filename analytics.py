@@ -0,0 +1,181 @@
+# analytics.py
+import pandas as pd
+
+from feedback_nlp import TEXT_COLUMNS, label_matrix
+from feedback_store import (
+    COMPANY_COLUMN,
+    STUDENT_COLUMN,
+    INDEXED_COLUMNS,
+    SKILL_COLUMNS,
+    HIRE_COLUMN,
+    REHIRE_COLUMN,
+    YEAR_COLUMN,
+)
+
+OVERALL_PERFORMANCE = 'Overall Performance'
+FEEDBACK_COUNT = 'Feedback Count'
+HIRE_YES = 'Hire Yes'
+REHIRE_YES = 'Rehire Yes'
+HIRE_RATE = 'Hire Rate'
+REHIRE_RATE = 'Rehire Rate'
+
+
+def _resolve(df, name):
+    # Headers are canonical after ingestion, so this is an exact lookup
+    return name if name in df.columns else None
+
+
+def _yes_flags(df, name):
+    """
+    Marks 'yes' answers (ignoring case and spaces); missing questions give NaN.
+    """
+    column = _resolve(df, name)
+    if column is None:
+        return pd.Series(float('nan'), index=df.index)
+    answers = df[column].astype('string').str.strip().str.lower()
+    return (answers == 'yes').astype(float).where(answers.notna())
+
+
+class AnalyticsCube:
+    """
+    Skill averages, overall performance and hiring/rehire answers aggregated once
+    per dataset for every company, student, VIIT mentor and (company, student) pair.
+    Views become dictionary lookups instead of per-rerun filtering.
+    """
+
+    def __init__(self, df):
+        skill_columns = [column for column in (_resolve(df, name) for name in SKILL_COLUMNS) if column]
+        # Ratings may be stored as float32; averages are taken in float64
+        facts = df[skill_columns].apply(pd.to_numeric, errors='coerce').astype(float)
+        facts.columns = [column.strip() for column in skill_columns]
+        self.skill_columns = list(facts.columns)
+        facts[OVERALL_PERFORMANCE] = facts[self.skill_columns].mean(axis=1)
+        facts[HIRE_YES] = _yes_flags(df, HIRE_COLUMN)
+        facts[REHIRE_YES] = _yes_flags(df, REHIRE_COLUMN)
+        self.has_hiring = _resolve(df, HIRE_COLUMN) is not None
+        self.has_rehire = _resolve(df, REHIRE_COLUMN) is not None
+
+        self.overall = self._aggregate(facts.assign(_all='All'), ['_all']).iloc[0]
+        self.tables = {}
+        # Datasets combining several academic years are also aggregated per year
+        for key in INDEXED_COLUMNS + [YEAR_COLUMN]:
+            column = _resolve(df, key)
+            if column is not None:
+                self.tables[key] = self._aggregate(facts.assign(**{key: df[column]}), [key])
+
+        company, student = _resolve(df, COMPANY_COLUMN), _resolve(df, STUDENT_COLUMN)
+
+        # Comments are labelled on first use (see comment_labels); only the columns are kept
+        self.text_columns = [column for column in TEXT_COLUMNS if column in df.columns]
+        self._comments = df[self.text_columns] if company is not None else None
+        self._comment_companies = df[company] if company is not None else None
+        self._comment_labels = {}
+        self.pairs = None
+        if company is not None and student is not None:
+            self.pairs = self._aggregate(
+                facts.assign(**{COMPANY_COLUMN: df[company], STUDENT_COLUMN: df[student]}),
+                [COMPANY_COLUMN, STUDENT_COLUMN],
+            )
+        self.company_years = None
+        if company is not None and YEAR_COLUMN in df.columns:
+            self.company_years = self._aggregate(
+                facts.assign(**{COMPANY_COLUMN: df[company], YEAR_COLUMN: df[YEAR_COLUMN]}),
+                [COMPANY_COLUMN, YEAR_COLUMN],
+            )
+
+    def _aggregate(self, facts, keys):
+        # observed=True: categorical keys must not expand into every name combination
+        grouped = facts.groupby(keys, sort=False, dropna=True, observed=True)
+        table = grouped[self.skill_columns + [OVERALL_PERFORMANCE]].mean()
+        table[FEEDBACK_COUNT] = grouped.size()
+        # Yes counts, and the share of answered questions that were yes
+        table[HIRE_YES] = grouped[HIRE_YES].sum()
+        table[REHIRE_YES] = grouped[REHIRE_YES].sum()
+        table[HIRE_RATE] = grouped[HIRE_YES].mean()
+        table[REHIRE_RATE] = grouped[REHIRE_YES].mean()
+        return table
+
+    def names(self, key):
+        table = self.tables.get(key)
+        return [] if table is None else list(table.index)
+
+    def stats(self, key, name):
+        """
+        Returns the aggregated row (a Series) for one company, student or VIIT mentor, or None.
+        """
+        table = self.tables.get(key)
+        if table is None or name not in table.index:
+            return None
+        return table.loc[name]
+
+    def student_performance(self, company_name):
+        """
+        Returns the overall performance of each student of a company.
+        """
+        if self.pairs is None or company_name not in self.pairs.index.get_level_values(0):
+            return pd.Series(dtype=float)
+        return self.pairs.loc[company_name][OVERALL_PERFORMANCE]
+
+    def companies_of(self, student_name):
+        """
+        Returns the companies a student got feedback from.
+        """
+        if self.pairs is None:
+            return []
+        students = self.pairs.index.get_level_values(1)
+        return list(self.pairs.index.get_level_values(0)[students == student_name])
+
+    def company_by_year(self, company_name):
+        """
+        Returns one aggregated row per academic year for a company, or an empty
+        DataFrame when the dataset covers a single export.
+        """
+        if self.company_years is None or company_name not in self.company_years.index.get_level_values(0):
+            return pd.DataFrame()
+        return self.company_years.loc[company_name].sort_index()
+
+    def student_skills(self, company_name, student_name):
+        """
+        Returns a student's skill ratings at one company, or None.
+        """
+        if self.pairs is None or (company_name, student_name) not in self.pairs.index:
+            return None
+        return self.pairs.loc[(company_name, student_name)][self.skill_columns]
+
+    def comment_labels(self, company_name, column):
+        """
+        Returns the sentiment and topic counts of one company's comments in a
+        free-text column (a Series indexed by feedback_nlp.LABELS), or None.
+        """
+        if self._comments is None or column not in self.text_columns:
+            return None
+        if column not in self._comment_labels:
+            labels = label_matrix(self._comments[column])
+            self._comment_labels[column] = labels.groupby(self._comment_companies, sort=False, observed=True).sum()
+        table = self._comment_labels[column]
+        if company_name not in table.index:
+            return None
+        return table.loc[company_name]
+
+    def describe(self, key, name):
+        """
+        Summarizes one entity's key figures as text for LLM prompts, next to the
+        averages of the whole dataset.
+        """
+        row = self.stats(key, name)
+        if row is None:
+            return ""
+        lines = [
+            f"Key figures for '{name}' (dataset average in parentheses):",
+            f"- Feedback rows: {int(row[FEEDBACK_COUNT])}",
+            f"- Overall performance: {row[OVERALL_PERFORMANCE]:.2f} ({self.overall[OVERALL_PERFORMANCE]:.2f})",
+        ]
+        strongest = row[self.skill_columns].dropna().sort_values()
+        if not strongest.empty:
+            lines.append(f"- Strongest skill: {strongest.index[-1]} ({strongest.iloc[-1]:.2f})")
+            lines.append(f"- Weakest skill: {strongest.index[0]} ({strongest.iloc[0]:.2f})")
+        if self.has_hiring and pd.notna(row[HIRE_RATE]):
+            lines.append(f"- Considered for hiring: {int(row[HIRE_YES])} ({row[HIRE_RATE]:.0%} vs {self.overall[HIRE_RATE]:.0%})")
+        if self.has_rehire and pd.notna(row[REHIRE_RATE]):
+            lines.append(f"- Would take VIIT students again: {int(row[REHIRE_YES])} ({row[REHIRE_RATE]:.0%} vs {self.overall[REHIRE_RATE]:.0%})")
+        return "\n".join(lines)
@@ -1,11 +1,18 @@
 # app.py
-import streamlit as st
-import pandas as pd
-from prompts import get_prompt
-from langchain_groq import ChatGroq
 import os
-from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+import time
+import streamlit as st
+from feedback_db import init_db, save_contacts, save_dataset
+from batch import BATCH_OPTIONS, batch_jobs, changed_jobs, run_batch
+from summarizer import summarize_feedback, progress_reporter, DEFAULT_MAX_CONCURRENCY
+from resources import get_chain, get_llm_cache, get_catalog, get_notification_dispatcher, load_feedback_dataset, load_catalog_dataset, upload_hash, catalog_version, prompt_size, clear_caches
+from ingest import report_warnings
+from llm_cache import model_name, summary_model
+from metrics import stage_timer, record_request, render_sidebar
+from service import SERVICE_URL_VARIABLE, ServiceClient
+from feedback_store import COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN
+from comment_search import show_similar_feedback
+from notifications import SMTP_HOST_VARIABLE, notification_counts, queue_notifications, read_contacts, recent_failures, retry_failed
 
 # Set the page configuration (light theme with white background)
 st.set_page_config(
@@ -15,45 +22,88 @@ st.set_page_config(
     initial_sidebar_state="auto",
 )
 
-# Load environment variables for API key
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+# Explicitly invalidate cached uploads and the LLM client (e.g. after editing .env)
+if st.sidebar.button("Reload cached data and LLM client"):
+    clear_caches()
 
-# Load LLM
-def load_llm():
-    return ChatGroq(temperature=0.4, model_name="llama3-8b-8192", api_key=groq_api_key)
+# Latency and token counts of recorded summary requests
+render_sidebar()
 
-# Extract data from the CSV file
-def csv_to_dict(file_path):
-    df = pd.read_csv(file_path)
-    return df.to_dict(orient='list')
+# Email notifications of stored summaries, sent in the background (see notifications.py)
+with st.sidebar.expander("Email notifications"):
+    notify_conn = init_db()
+    contacts_file = st.file_uploader("Contacts CSV (type, name, email)", type="csv", key="contacts_file")
+    if contacts_file and st.button("Import contacts"):
+        try:
+            contacts, skipped = read_contacts(contacts_file.getvalue())
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            st.write(f"Added {save_contacts(notify_conn, contacts)} of {len(contacts)} contacts ({skipped} rows skipped).")
+    dispatcher = get_notification_dispatcher()
+    if dispatcher is None:
+        st.info(f"Set {SMTP_HOST_VARIABLE} (and SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD) in .env to send notifications.")
+    if st.button("Queue latest summaries"):
+        st.write(f"Queued {queue_notifications(notify_conn)} notifications.")
+        if dispatcher is not None:
+            dispatcher.wake()
+    if st.button("Retry failed notifications"):
+        st.write(f"Queued {retry_failed(notify_conn)} notifications again.")
+        if dispatcher is not None:
+            dispatcher.wake()
+    st.write(", ".join(f"{count} {status}" for status, count in notification_counts(notify_conn).items()))
+    failures = recent_failures(notify_conn)
+    if failures:
+        st.dataframe([dict(failure) for failure in failures])
+    notify_conn.close()
 
 # Streamlit App
 st.title("Eduplus Industry Feedback Summarization")
 st.write("Upload a CSV file to generate a summary.")
 
-# File uploader
-uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+# Academic years saved in the catalog (catalog.py) can be summarized together instead of an upload
+uploaded_file = None
+selected_years = []
+catalog_years = get_catalog().years()
+if catalog_years and st.radio("Feedback source", ["Upload a CSV", "Saved academic years"]) == "Saved academic years":
+    selected_years = st.multiselect("Academic years", catalog_years, default=catalog_years)
+else:
+    # File uploader
+    uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
 
-# If a file is uploaded
-if uploaded_file:
-    st.write("File uploaded successfully!")
+# If a file is uploaded or academic years are selected
+if uploaded_file or selected_years:
+    if uploaded_file:
+        st.write("File uploaded successfully!")
     
-    # Read the CSV data
-    data_dict = csv_to_dict(uploaded_file)
-
-    # Extract unique company names, student names, and VIIT mentor names
-    company_names = list(set(data_dict['Name of The Company']))
-    student_names = list(set(data_dict['Name of The Student']))
-        # Check if 'Faculty Mentor from VIIT' column exists and handle missing columns
-    if 'Faculty Mentor from VIIT' in data_dict:
-        mentor_names = list(set(data_dict['Faculty Mentor from VIIT']))
-    elif 'Faculty Mentor from VIIT ' in data_dict:  # Check for potential extra space
-        mentor_names = list(set(data_dict['Faculty Mentor from VIIT ']))
+    # Read the CSV data (or the stored years)
+    # Per-request stage timings and token counts, recorded in metrics.jsonl
+    timings = {}
+    with stage_timer(timings, 'ingest'):
+        if uploaded_file:
+            data_dict = load_feedback_dataset(uploaded_file)
+            source_name, source_hash = uploaded_file.name, upload_hash(uploaded_file)
+        else:
+            data_dict = load_catalog_dataset(selected_years)
+            source_name, source_hash = "AY " + ", ".join(sorted(selected_years)), catalog_version(selected_years)[2]
+
+    # Rows and ratings skipped while reading the upload
+    for warning in report_warnings(data_dict.ingest_report):
+        st.warning(warning)
+
+    # Extract unique company names, student names, and VIIT mentor names from the prebuilt indexes
+    company_names = data_dict.names(COMPANY_COLUMN)
+    student_names = data_dict.names(STUDENT_COLUMN)
+    # Check if 'Faculty Mentor from VIIT' column exists (header variants are renamed on ingestion)
+    if data_dict.has_column(VIIT_MENTOR_COLUMN):
+        mentor_names = data_dict.names(VIIT_MENTOR_COLUMN)
     else:
         mentor_names = []
         st.error("The column 'Faculty Mentor from VIIT' is missing in the uploaded CSV.")
 
+    # Similarity search over the comments, e.g. "which students got feedback like this one?"
+    show_similar_feedback(data_dict)
+
     # Dropdown for summary options
     summary_option = st.selectbox(
         "Select a summary type",
@@ -69,55 +119,120 @@ if uploaded_file:
     elif summary_option == "VIIT-Mentor-wise Summary":
         additional_input = st.selectbox("Select a VIIT mentor for the summary", mentor_names)
 
-    # Load the LLM
-    llm = load_llm()
-
     if summary_option != "Select an option" and (not additional_input or additional_input.strip()):
-        # Generate a prompt based on the selected summary option and additional input
-        prompt_text = get_prompt(summary_option, data_dict, additional_input)
-        print(prompt_text)
+        # Size of the prompt for the selected summary option and additional input; the prompt
+        # itself is built when the summary is generated
+        prompt_tokens = prompt_size(source_hash, summary_option, additional_input, data_dict)
         
-        # Display the selected option and prompt
+        # Display the selected option and prompt size
         st.write(f"Selected Option: {summary_option}")
+        st.caption(f"Prompt size: ~{prompt_tokens} tokens")
         
-        # Define the prompt template
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    "You are a helpful assistant that summarizes feedback data for university internship programs."
-                ),
-                ("human", "{input}"),
-                (
-                    "system",
-                    "Here is the feedback data: {feedback_data}. Provide a structured summary based on this data."
-                ),
-            ]
-        )
-        
-        # Prepare input data for the prompt
-        input_data = {
-            "input": f"Summarize the feedback data for {summary_option}.",
-            "feedback_data": prompt_text
-        }
-
-        # Connect the prompt to the LLM and invoke the chain
-        chain = prompt_template | llm
+        # Large uploads are summarized in chunks; this controls how many chunks run at once
+        max_concurrency = st.slider("Parallel LLM calls for large uploads", 1, 8, DEFAULT_MAX_CONCURRENCY)
         
+        # With FEEDBACK_SERVICE_URL set, summaries run in the headless service (service.py) and are polled
+        service_url = os.getenv(SERVICE_URL_VARIABLE)
+        if service_url:
+            client = ServiceClient(service_url)
+            try:
+                if st.button("Generate Summary"):
+                    if uploaded_file:
+                        dataset_id = client.upload_dataset(uploaded_file.getvalue(), source_name, source_hash)
+                    else:
+                        # The service takes CSV uploads; it hashes the exported years itself
+                        dataset_id = client.upload_dataset(get_catalog().to_csv(selected_years), source_name)
+                    job_id = client.submit(dataset_id, summary_option, additional_input)
+                    st.session_state['summary_job'] = (job_id, summary_option, additional_input)
+
+                # A rerun picks the submitted job up again instead of submitting a new one
+                job_id, job_option, job_input = st.session_state.get('summary_job', (None, None, None))
+                if job_id and (job_option, job_input) == (summary_option, additional_input):
+                    st.write("Summary:")
+                    summary_placeholder = st.empty()
+                    status_line = st.empty()
+
+                    def show_job(job):
+                        summary_placeholder.markdown(job['text'])
+                        if job['status'] == 'queued':
+                            status_line.caption(f"Waiting for a free worker (position {job['queue_position']})")
+                        elif job['progress']:
+                            status_line.caption("Summarizing ({stage}): {done}/{total}".format(**job['progress']))
+
+                    job = client.wait(job_id, show_job)
+                    if job is None:
+                        st.error("The summary service no longer has this job; generate the summary again.")
+                    elif job['status'] == 'failed':
+                        st.error(f"Summary failed: {job['error']}")
+                    elif job['from_store']:
+                        status_line.caption("The feedback rows are unchanged; the stored summary was returned without an LLM call.")
+                    else:
+                        status_line.caption(f"First token after {job['timings']['time_to_first_token']:.2f}s, complete after {job['timings']['total']:.2f}s")
+            except (OSError, RuntimeError) as error:
+                st.error(f"Could not reach the summary service at {service_url}: {error}")
+
         # Send the prompt to the LLM for summarization
-        if st.button("Generate Summary"):
+        elif st.button("Generate Summary"):
             st.write("Summarizing feedback data...")
+            # Shared LLM client and prompt chain, created once per process on first use
+            chain = get_chain()
             
-            response = chain.invoke(input_data)
-            
-            # Extract the content from the response
-            if hasattr(response, 'content'):
-                response_content = response.content
-            else:
-                response_content = str(response)  # Fallback to converting to string if no content attribute
-
-            # Clean up the response
-            cleaned_response = response_content.replace("\n\n", "\n").replace("\n", "\n\n")
-            
+            # Responses (chunk summaries included) are cached on disk, so repeats and retries skip the LLM
+            llm_cache = get_llm_cache()
+            progress_callback = progress_reporter(st.empty())
             st.write("Summary:")
-            st.write(cleaned_response)  # Display LLM response (summary)
+            # Tokens are rendered as they arrive instead of after the whole completion
+            summary_placeholder = st.empty()
+            models = []
+            cleaned_response = summarize_feedback(
+                chain, summary_option, data_dict, additional_input,
+                max_concurrency=max_concurrency,
+                cache=llm_cache,
+                progress_callback=progress_callback,
+                on_text=summary_placeholder.markdown,
+                timings=timings,
+                models=models,
+            )
+            st.caption(f"First token after {timings['time_to_first_token']:.2f}s, complete after {timings['total']:.2f}s")
+            st.caption("LLM cache: {hits} hits, {misses} misses, {entries} stored responses".format(**llm_cache.stats()))
+            record_request(timings, app="app", summary_type=summary_option, entity=additional_input or "All", model=summary_model(models))
+
+    # Batch mode: generate the summary of every company, student and VIIT mentor in one go
+    with st.expander("Batch mode: generate all summaries"):
+        batch_options = st.multiselect("Summary types to generate", list(BATCH_OPTIONS), default=list(BATCH_OPTIONS))
+        batch_concurrency = st.slider("Parallel LLM calls", 1, 16, DEFAULT_MAX_CONCURRENCY, key="batch_concurrency")
+        only_changed = st.checkbox("Only regenerate summaries whose feedback rows changed", value=True)
+        # Opt-in: this mails students, companies and mentors outside the department
+        notify = st.checkbox("Email the new summaries to their contacts", value=False)
+        if st.button("Generate All Summaries"):
+            chain = get_chain()
+            jobs = batch_jobs(data_dict, batch_options)
+            conn = init_db()
+            if only_changed:
+                # Entities with the same rows as last time keep their stored summary
+                all_jobs = len(jobs)
+                jobs = changed_jobs(conn, data_dict, jobs, model_name(chain))
+                st.write(f"{all_jobs - len(jobs)} of {all_jobs} summaries are unchanged and kept.")
+            batch_progress = st.progress(0.0)
+
+            def report_batch(done, total, option, name, error):
+                batch_progress.progress(done / total, text=f"{done}/{total}: {option} - {name or 'All'}")
+
+            # Each summary is written to the database as soon as it completes
+            dataset_id = save_dataset(conn, source_hash, source_name, data_dict.num_rows)
+            batch_started = time.time()
+            results = run_batch(chain, data_dict, jobs, conn, batch_concurrency,
+                                cache=get_llm_cache(), progress_callback=report_batch, dataset_id=dataset_id)
+            failures = [result for result in results if result.error is not None]
+            stand_ins = [result for result in results if result.error is None and result.model is None]
+            st.success(f"Saved {len(results) - len(failures) - len(stand_ins)} of {len(results)} summaries to the database.")
+            if stand_ins:
+                st.warning(f"{len(stand_ins)} summaries were written by the local stand-in model and were not saved.")
+            if notify:
+                # Only queued here; the background dispatcher sends them without holding up the page
+                st.write(f"Queued {queue_notifications(conn, since=batch_started)} email notifications.")
+                if get_notification_dispatcher() is not None:
+                    get_notification_dispatcher().wake()
+            conn.close()
+            for result in failures:
+                st.error(f"{result.option} - {result.name}: {result.error}")
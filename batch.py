@@ -0,0 +1,205 @@
+# batch.py
+import argparse
+import asyncio
+import os
+import random
+from collections import namedtuple
+
+from dotenv import load_dotenv
+
+from feedback_db import DATABASE_FILE, init_db, save_dataset, save_summaries, stored_fingerprints, text_hash
+from feedback_store import load_dataset, COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN
+from llm_cache import LLMCache, acached_invoke, model_name, summary_model
+from prompts import build_prompt
+from rate_limits import is_rate_limit_error, retry_after
+from summarizer import build_chain, clean_response, DEFAULT_MAX_CONCURRENCY
+
+# Summary types generated once per entity, and the column the entity names come from
+BATCH_OPTIONS = {
+    "Company-wise Summary": COMPANY_COLUMN,
+    "Student-wise Summary": STUDENT_COLUMN,
+    "VIIT-Mentor-wise Summary": VIIT_MENTOR_COLUMN,
+}
+
+# Short names for the command line
+CLI_OPTIONS = {
+    "overall": "Overall Summary",
+    "company": "Company-wise Summary",
+    "student": "Student-wise Summary",
+    "mentor": "VIIT-Mentor-wise Summary",
+}
+
+DEFAULT_MAX_RETRIES = 5
+
+# Completed summaries are written to the database in transactions of this size
+WRITE_BATCH_SIZE = 25
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# `model` is the model that wrote the summary, None for a stand-in model (not stored)
+BatchResult = namedtuple('BatchResult', ['option', 'name', 'summary', 'error', 'prompt_hash', 'model'])
+
+
+def batch_jobs(dataset, options=tuple(BATCH_OPTIONS)):
+    """
+    Lists one (summary option, name) job per company, student and/or VIIT mentor.
+    "Overall Summary" yields a single job with no name.
+    """
+    jobs = []
+    for option in options:
+        if option == "Overall Summary":
+            jobs.append((option, None))
+        else:
+            jobs.extend((option, name) for name in dataset.names(BATCH_OPTIONS[option]))
+    return jobs
+
+
+def job_fingerprint(dataset, option, name):
+    """
+    Fingerprint of the rows a (summary option, name) job summarizes.
+    """
+    return dataset.fingerprint(BATCH_OPTIONS.get(option), name)
+
+
+def changed_jobs(conn, dataset, jobs, model=None):
+    """
+    Drops the jobs whose rows are unchanged since a summary was stored for them
+    (by `model`, when given), so only new or edited entities go to the LLM.
+    """
+    stored = {}
+    changed = []
+    for option, name in jobs:
+        if option not in stored:
+            stored[option] = stored_fingerprints(conn, option, model)
+        if ((name or "All").strip(), job_fingerprint(dataset, option, name)) not in stored[option]:
+            changed.append((option, name))
+    return changed
+
+
+def _retries_itself(chain):
+    # ResilientChatModel (llm_client.py) already waits for rate limits and retries with backoff
+    return hasattr(getattr(chain, 'last', chain), 'router')
+
+
+async def _summarize_with_retry(chain, dataset, option, name, cache, max_retries):
+    # Labelling and comment selection are CPU-bound; a worker thread keeps the other jobs' LLM calls going
+    prompt_text, _ = await asyncio.to_thread(build_prompt, option, dataset, name)
+    if _retries_itself(chain):
+        max_retries = 0
+    input_data = {"input": f"Summarize the feedback data for {option}.", "feedback_data": prompt_text}
+    for attempt in range(max_retries + 1):
+        models = []
+        try:
+            summary = clean_response(await acached_invoke(chain, input_data, cache, models))
+            return summary, text_hash(prompt_text), summary_model(models)
+        except Exception as error:
+            if attempt == max_retries or not is_rate_limit_error(error):
+                raise
+            # Honour the server's Retry-After when given, otherwise back off exponentially with jitter
+            delay = retry_after(error) or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(1.0, 1.25))
+
+
+async def generate_summaries(chain, dataset, jobs, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                             max_retries=DEFAULT_MAX_RETRIES, cache=None, on_result=None):
+    """
+    Generates summaries for all jobs with at most `max_concurrency` LLM calls in
+    flight. `on_result(result)` is called with a BatchResult as each job
+    finishes, in completion order. Returns all BatchResults. Rate-limited
+    calls are retried up to `max_retries` times, unless the chain's model
+    retries by itself (llm_client.ResilientChatModel).
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(option, name):
+        async with semaphore:
+            try:
+                summary, prompt_hash, model = await _summarize_with_retry(chain, dataset, option, name, cache, max_retries)
+                return BatchResult(option, name, summary, None, prompt_hash, model)
+            except Exception as error:
+                return BatchResult(option, name, None, error, None, None)
+
+    results = []
+    for task in asyncio.as_completed([run(option, name) for option, name in jobs]):
+        result = await task
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def run_batch(chain, dataset, jobs, conn, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+              max_retries=DEFAULT_MAX_RETRIES, cache=None, progress_callback=None, dataset_id=None):
+    """
+    Runs generate_summaries and streams the summaries into the database as they
+    arrive, WRITE_BATCH_SIZE per transaction. `progress_callback(done, total,
+    option, name, error)` reports each job. Summaries written by a stand-in
+    model are returned but not stored.
+    """
+    done = [0]
+    pending = []
+
+    def on_result(result):
+        done[0] += 1
+        if result.error is None and result.model is not None:
+            pending.append({
+                "summary_type": result.option,
+                "entity_name": result.name,
+                "summary": result.summary,
+                "model": result.model,
+                "prompt_hash": result.prompt_hash,
+                "fingerprint": job_fingerprint(dataset, result.option, result.name),
+                "dataset_id": dataset_id,
+            })
+            if len(pending) >= WRITE_BATCH_SIZE:
+                save_summaries(conn, pending)
+                pending.clear()
+        if progress_callback:
+            progress_callback(done[0], len(jobs), result.option, result.name, result.error)
+
+    try:
+        return asyncio.run(generate_summaries(chain, dataset, jobs, max_concurrency, max_retries, cache, on_result))
+    finally:
+        if pending:
+            save_summaries(conn, pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate summaries for every company, student and VIIT mentor in a feedback CSV.")
+    parser.add_argument("csv_file", help="Feedback CSV export")
+    parser.add_argument("--types", nargs="+", choices=sorted(CLI_OPTIONS), default=["company", "student", "mentor"],
+                        help="Summary types to generate (default: company student mentor)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Maximum LLM calls in flight")
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES, help="Retries per LLM call on rate limits and other transient errors")
+    parser.add_argument("--db", default=DATABASE_FILE, help="SQLite database to store the summaries in")
+    parser.add_argument("--force", action="store_true", help="Regenerate summaries even when their feedback rows are unchanged")
+    args = parser.parse_args()
+
+    from llm_client import build_llm
+
+    load_dotenv()
+    chain = build_chain(build_llm(max_attempts=args.retries + 1))
+    dataset = load_dataset(args.csv_file)
+    jobs = batch_jobs(dataset, [CLI_OPTIONS[name] for name in args.types])
+    conn = init_db(args.db)
+    if not args.force:
+        all_jobs = len(jobs)
+        jobs = changed_jobs(conn, dataset, jobs, model_name(chain))
+        print(f"{all_jobs - len(jobs)} of {all_jobs} summaries are unchanged and kept.")
+    with open(args.csv_file, 'rb') as csv_file:
+        dataset_id = save_dataset(conn, text_hash(csv_file.read()), os.path.basename(args.csv_file), dataset.num_rows)
+
+    def report(done, total, option, name, error):
+        status = f"failed: {error}" if error else "done"
+        print(f"[{done}/{total}] {option} - {name or 'All'}: {status}", flush=True)
+
+    results = run_batch(chain, dataset, jobs, conn, args.concurrency, args.retries,
+                        LLMCache(args.db), report, dataset_id)
+    failures = sum(1 for result in results if result.error is not None)
+    stored = sum(1 for result in results if result.model is not None)
+    print(f"Generated {len(results) - failures} of {len(results)} summaries, stored {stored}.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
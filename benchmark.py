@@ -0,0 +1,387 @@
+# benchmark.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from analytics import AnalyticsCube
+from batch import batch_jobs, generate_summaries
+from feedback_store import (
+    FeedbackDataset,
+    CANONICAL_COLUMNS,
+    COMPANY_COLUMN,
+    INDUSTRY_MENTOR_COLUMN,
+    STUDENT_COLUMN,
+    VIIT_MENTOR_COLUMN,
+    SKILL_COLUMNS,
+    STRENGTHS_COLUMN,
+    IMPROVEMENT_COLUMN,
+    HIRE_COLUMN,
+    REHIRE_COLUMN,
+)
+from ingest import read_feedback_csv
+from prompts import build_prompt
+from summarizer import build_chain, summarize_feedback, DEFAULT_MAX_CONCURRENCY
+
+DEFAULT_ROW_COUNTS = [1000, 10000, 100000]
+
+# Set by --no-memory; tracing allocations slows the code down, so it gets its own run
+TRACE_MEMORY = True
+
+# Streamlit apps profiled by --startup, and the slow imports they should only load on demand
+STARTUP_SCRIPTS = ['app.py', 'fetch.py', 'integrated.py']
+HEAVY_MODULES = ['langchain_core', 'langchain_groq', 'matplotlib', 'plotly', 'textblob', 'nltk']
+
+# Runs one app top to bottom in bare mode (no upload, no button pressed), like the
+# first page load after `streamlit run`, and reports the time and heavy modules loaded
+_STARTUP_CODE = '''
+import json, runpy, sys, time
+started = time.perf_counter()
+error = None
+try:
+    runpy.run_path(sys.argv[1], run_name="__main__")
+except Exception as exc:
+    error = repr(exc)
+print(json.dumps({"seconds": time.perf_counter() - started, "error": error,
+                  "heavy": [name for name in sys.argv[2:] if name in sys.modules]}))
+'''
+
+# Names of each kind per synthetic row; about 20 rows per company and 50 per VIIT mentor
+ROWS_PER_COMPANY = 20
+ROWS_PER_VIIT_MENTOR = 50
+
+STRENGTHS = [
+    "Quick learner", "Good communication", "Strong technical knowledge", "Punctual and disciplined",
+    "Works well in a team", "Creative problem solver", "Takes ownership of tasks", "Good analytical skills",
+]
+IMPROVEMENTS = [
+    "Should ask more questions", "Documentation skills", "Time management", "Needs more confidence while presenting",
+    "Attention to detail", "Domain knowledge", "Written communication", "Nothing specific",
+]
+
+# Canned answer of the stand-in model, about the length of a real summary
+FAKE_SUMMARY = (
+    "**Summary**\n\nStrengths: students were rated highly for knowledge, attitude and team work, "
+    "and mentors praised their communication and willingness to learn.\n\n"
+    "Areas for improvement: time management, documentation and confidence while presenting.\n\n"
+    "Hiring: most companies would consider absorbing the students and would take VIIT students again."
+)
+
+
+class BenchmarkChatModel(SimpleChatModel):
+    """
+    Stand-in for the Groq chat model: waits `latency` seconds before the first
+    token, then streams the canned summary word by word, `chunk_delay` apart.
+    """
+
+    latency: float = 0.05
+    chunk_delay: float = 0.0
+    response: str = FAKE_SUMMARY
+
+    @property
+    def _llm_type(self):
+        return "benchmark-chat-model"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency + self.chunk_delay * len(self.response.split(" ")))
+        return self.response
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency + self.chunk_delay * len(self.response.split(" ")))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for idx, word in enumerate(self.response.split(" ")):
+            if idx and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if idx == 0 else " " + word))
+
+
+def synthetic_feedback(rows, seed=0):
+    """
+    Builds a feedback table in the real export layout with `rows` rows.
+    """
+    rng = np.random.default_rng(seed)
+    companies = max(1, rows // ROWS_PER_COMPANY)
+    viit_mentors = max(1, rows // ROWS_PER_VIIT_MENTOR)
+    company = rng.integers(0, companies, rows)
+    data = {
+        'Timestamp': pd.date_range("2024-01-01", periods=rows, freq="min").strftime("%Y/%m/%d %H:%M:%S"),
+        COMPANY_COLUMN: [f"Company {idx}" for idx in company],
+        INDUSTRY_MENTOR_COLUMN: [f"Industry Mentor {idx}" for idx in company],
+        # Most students get one feedback row, some get two
+        STUDENT_COLUMN: [f"Student {idx}" for idx in rng.integers(0, max(1, int(rows * 0.8)), rows)],
+        # The trailing space of the real export
+        VIIT_MENTOR_COLUMN + ' ': [f"Prof {idx}" for idx in rng.integers(0, viit_mentors, rows)],
+    }
+    for column in SKILL_COLUMNS:
+        data[column] = rng.integers(1, 6, rows)
+    data[STRENGTHS_COLUMN] = rng.choice(STRENGTHS, rows)
+    data[IMPROVEMENT_COLUMN] = rng.choice(IMPROVEMENTS, rows)
+    data[HIRE_COLUMN] = rng.choice(["Yes", "No", "Maybe"], rows, p=[0.6, 0.3, 0.1])
+    data[REHIRE_COLUMN] = rng.choice(["Yes", "No"], rows, p=[0.8, 0.2])
+    df = pd.DataFrame(data)
+    return df[[column if column in df.columns else column + ' ' for column in CANONICAL_COLUMNS]]
+
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func and returns (result, wall seconds, peak traced memory in MB).
+    The wall time comes from a plain run; the peak memory from a second run
+    under tracemalloc (skipped with --no-memory, reported as 0).
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    if not TRACE_MEMORY:
+        return result, elapsed, 0.0
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def _result(stage, elapsed, peak_mb, **extra):
+    row = {"stage": stage, "seconds": round(elapsed, 4), "peak_mb": round(peak_mb, 2)}
+    row.update(extra)
+    return row
+
+
+def bench_prompts(dataset, samples, rng):
+    """
+    Runs build_prompt for the overall summary and for `samples` names of each
+    entity option, reporting the time per prompt and the prompt sizes.
+    """
+    results = []
+    options = [("Overall Summary", [None])] + [
+        (option, rng.sample(dataset.names(column), min(samples, len(dataset.names(column)))))
+        for option, column in [
+            ("Company-wise Summary", COMPANY_COLUMN),
+            ("Student-wise Summary", STUDENT_COLUMN),
+            ("VIIT-Mentor-wise Summary", VIIT_MENTOR_COLUMN),
+        ]
+    ]
+    for option, names in options:
+        def build_all():
+            return [build_prompt(option, dataset, name)[1] for name in names]
+        tokens, elapsed, peak_mb = measure(build_all)
+        results.append(_result(
+            f"prompt: {option}", elapsed, peak_mb,
+            calls=len(names), ms_per_call=round(1000 * elapsed / len(names), 2),
+            prompt_tokens_mean=round(float(np.mean(tokens))), prompt_tokens_max=int(np.max(tokens)),
+        ))
+    return results
+
+
+def bench_analytics(df, samples, rng):
+    """
+    Builds the AnalyticsCube and runs the lookups performance_analysis makes
+    for `samples` companies and one of their students.
+    """
+    cube, build_seconds, build_peak = measure(AnalyticsCube, df)
+    companies = rng.sample(cube.names(COMPANY_COLUMN), min(samples, len(cube.names(COMPANY_COLUMN))))
+
+    def lookups():
+        for company in companies:
+            students = cube.student_performance(company)
+            cube.stats(COMPANY_COLUMN, company)
+            if len(students):
+                cube.student_skills(company, students.index[0])
+    _, elapsed, peak_mb = measure(lookups)
+    return [
+        _result("analytics: build cube", build_seconds, build_peak),
+        _result("analytics: company view lookups", elapsed, peak_mb,
+                calls=len(companies), ms_per_call=round(1000 * elapsed / max(1, len(companies)), 3)),
+    ]
+
+
+def bench_summaries(dataset, chain, max_concurrency, rng):
+    """
+    Runs summarize_feedback (streaming, no LLM cache) once per option.
+    """
+    results = []
+    for option, column in [
+        ("Overall Summary", None),
+        ("Company-wise Summary", COMPANY_COLUMN),
+        ("Student-wise Summary", STUDENT_COLUMN),
+        ("VIIT-Mentor-wise Summary", VIIT_MENTOR_COLUMN),
+    ]:
+        name = rng.choice(dataset.names(column)) if column else None
+
+        def summarize():
+            timings = {}
+            summarize_feedback(chain, option, dataset, name, max_concurrency=max_concurrency,
+                               on_text=lambda text: None, timings=timings)
+            return timings
+        timings, elapsed, peak_mb = measure(summarize)
+        results.append(_result(
+            f"summary: {option}", elapsed, peak_mb,
+            llm_calls=timings.get('llm_calls', 0), prompt_tokens=timings.get('prompt_tokens', 0),
+            time_to_first_token=round(timings.get('time_to_first_token', 0.0), 4),
+        ))
+    return results
+
+
+def bench_batch(dataset, chain, jobs, max_concurrency):
+    """
+    Generates the first `jobs` batch-mode summaries without saving them.
+    """
+    selected = batch_jobs(dataset)[:jobs]
+
+    def run():
+        return asyncio.run(generate_summaries(chain, dataset, selected, max_concurrency=max_concurrency, max_retries=0))
+    results, elapsed, peak_mb = measure(run)
+    failures = sum(1 for result in results if result.error is not None)
+    return [_result("batch: generate summaries", elapsed, peak_mb, calls=len(selected), failures=failures,
+                    summaries_per_second=round(len(selected) / elapsed, 2) if elapsed else None)]
+
+
+def run_benchmark(rows, args, workdir):
+    rng = random.Random(args.seed)
+    csv_path = os.path.join(workdir, f"feedback_{rows}.csv")
+    synthetic_feedback(rows, args.seed).to_csv(csv_path, index=False)
+
+    (df, report), elapsed, peak_mb = measure(read_feedback_csv, csv_path)
+    results = [_result("ingest: read csv", elapsed, peak_mb, rows=report.rows_kept,
+                       file_mb=round(os.path.getsize(csv_path) / 2 ** 20, 2))]
+    dataset, elapsed, peak_mb = measure(FeedbackDataset, df, report)
+    results.append(_result("ingest: build indexes", elapsed, peak_mb))
+
+    results += bench_prompts(dataset, args.samples, rng)
+    results += bench_analytics(df, args.samples, rng)
+    if not args.skip_llm:
+        chain = build_chain(BenchmarkChatModel(latency=args.latency, chunk_delay=args.chunk_delay))
+        results += bench_summaries(dataset, chain, args.concurrency, rng)
+        results += bench_batch(dataset, chain, args.batch_jobs, args.concurrency)
+    for row in results:
+        row["rows"] = rows
+    return results
+
+
+def _run_startup(script, importtime=False, workdir=None):
+    # A fresh interpreter per run so nothing is already imported; it runs in
+    # `workdir` or a scratch directory so the apps create their database there, not in the repo
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    command = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    command += ["-c", _STARTUP_CODE, os.path.join(repo, script)] + HEAVY_MODULES
+    with tempfile.TemporaryDirectory() as scratch:
+        done = subprocess.run(command, cwd=workdir or scratch, env=env, capture_output=True, text=True)
+    lines = done.stdout.strip().splitlines()
+    if not lines:
+        raise RuntimeError(f"{script} did not start: {done.stderr.strip()[-500:]}")
+    return json.loads(lines[-1]), done.stderr
+
+
+def _slowest_imports(importtime_log, top=5):
+    """
+    Parses `python -X importtime` output and returns the `top` slowest
+    top-level imports as (module, seconds including their dependencies).
+    """
+    imports = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented under the module that pulled them in
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def startup_profile(script, runs=3, workdir=None):
+    """
+    Measures the cold start of one Streamlit app: the median time to run it
+    once in bare mode, the heavy modules it loaded and its slowest imports.
+    The app runs in `workdir` when given (e.g. one holding the files it reads).
+    """
+    timings = []
+    for _ in range(runs):
+        result, _ = _run_startup(script, workdir=workdir)
+        timings.append(result["seconds"])
+    result, importtime_log = _run_startup(script, importtime=True, workdir=workdir)
+    return {
+        "script": script,
+        "seconds": float(np.median(timings)),
+        "error": result["error"],
+        "heavy_modules": result["heavy"],
+        "slowest_imports": _slowest_imports(importtime_log),
+    }
+
+
+def format_startup(profiles):
+    lines = []
+    for profile in profiles:
+        heavy = ", ".join(profile["heavy_modules"]) or "none"
+        lines.append(f"{profile['script']:<16} {profile['seconds']:>7.3f}s  heavy modules loaded: {heavy}")
+        if profile["error"]:
+            lines.append(f"{'':<16} stopped early: {profile['error']}")
+        for module, seconds in profile["slowest_imports"]:
+            lines.append(f"{'':<16} {seconds:>7.3f}s  import {module}")
+    return "\n".join(lines)
+
+
+def format_results(results):
+    lines = []
+    for row in results:
+        extra = ", ".join(f"{key}={value}" for key, value in row.items() if key not in ("stage", "seconds", "peak_mb", "rows"))
+        lines.append(f"{row['rows']:>7}  {row['stage']:<38} {row['seconds']:>9.3f}s {row['peak_mb']:>9.1f} MB  {extra}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, prompts, analytics and summarization on synthetic feedback, without calling Groq.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROW_COUNTS, help="Dataset sizes to generate")
+    parser.add_argument("--samples", type=int, default=20, help="Names per option to build prompts and analytics views for")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the stand-in model waits before answering")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed words")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Parallel LLM calls")
+    parser.add_argument("--batch-jobs", type=int, default=50, help="Batch-mode summaries to generate")
+    parser.add_argument("--skip-llm", action="store_true", help="Only benchmark ingestion, prompts and analytics")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory runs (halves the run time)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--startup", action="store_true", help="Only profile the cold start of the Streamlit apps")
+    args = parser.parse_args()
+
+    if args.startup:
+        profiles = [startup_profile(script) for script in STARTUP_SCRIPTS]
+        print(format_startup(profiles))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as json_file:
+                json.dump({"startup": profiles}, json_file, indent=2)
+        return 0
+
+    global TRACE_MEMORY
+    TRACE_MEMORY = not args.no_memory
+    all_results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            results = run_benchmark(rows, args, workdir)
+            print(format_results(results), flush=True)
+            all_results += results
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump({"settings": vars(args), "results": all_results}, json_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,216 @@
+# catalog.py
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from feedback_store import YEAR_COLUMN
+from ingest import IngestReport, REQUIRED_COLUMNS, concat_frames, read_feedback_csv, report_warnings
+
+# Where the per-year Parquet files and their index are kept; override with FEEDBACK_CATALOG_DIR
+CATALOG_DIR = os.getenv("FEEDBACK_CATALOG_DIR", "feedback_catalog")
+INDEX_FILE = "catalog.json"
+
+# Academic years as written in export names, e.g. "AY 2023-24", "2023-2024" or "2023_24"
+_YEAR_PATTERN = re.compile(r'(?<!\d)(20\d{2})\s*[-–/_]\s*(\d{4}|\d{2})(?!\d)')
+
+
+def academic_year(name):
+    """
+    Reads the academic year from an export's file name, e.g.
+    "Industry Mentor Feedback Form (AY 2023-24).csv" gives "2023-24". Returns None if there is none.
+    """
+    match = _YEAR_PATTERN.search(str(name or ''))
+    if match is None:
+        return None
+    start, end = match.groups()
+    return f"{start}-{end[-2:]}"
+
+
+def _write_atomically(path, write):
+    # Readers never see a half-written file, even if two processes save at once
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _merge_reports(reports, columns):
+    invalid_ratings, renamed = {}, {}
+    for report in reports:
+        for column, count in report.invalid_ratings.items():
+            invalid_ratings[column] = invalid_ratings.get(column, 0) + count
+        renamed.update(report.renamed)
+    return IngestReport(
+        rows_read=sum(report.rows_read for report in reports),
+        rows_kept=sum(report.rows_kept for report in reports),
+        rows_dropped=sum(report.rows_dropped for report in reports),
+        invalid_ratings=invalid_ratings,
+        renamed=renamed,
+        missing=[column for column in REQUIRED_COLUMNS if column not in columns],
+    )
+
+
+class FeedbackCatalog:
+    """
+    Feedback exports of several academic years. Each CSV is ingested once and
+    stored as a Parquet file that keeps the compact dtypes (float32 ratings,
+    categorical names), so loading a year skips CSV parsing. An index file
+    records the source, content hash and ingest report of every year.
+    """
+
+    def __init__(self, directory=CATALOG_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def entries(self):
+        """
+        Returns the index: one entry per academic year.
+        """
+        try:
+            with open(self._path(INDEX_FILE), encoding="utf-8") as index_file:
+                return json.load(index_file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_entries(self, entries):
+        def write(path):
+            with open(path, "w", encoding="utf-8") as index_file:
+                json.dump(entries, index_file, indent=2)
+        _write_atomically(self._path(INDEX_FILE), write)
+
+    def years(self):
+        return sorted(self.entries())
+
+    def content_hash(self, years):
+        """
+        Identifies the stored content of the given years; it changes when one of them is replaced.
+        """
+        entries = self.entries()
+        parts = [f"{year}:{entries[year]['content_hash']}" for year in sorted(years) if year in entries]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def add(self, content, name, year=None):
+        """
+        Ingests one CSV export (bytes) as the feedback of `year`, read from the
+        file name when not given, replacing what was stored for that year.
+        An unchanged file is not read again. Returns the year and its IngestReport.
+        """
+        year = year or academic_year(name)
+        if not year:
+            raise ValueError(f"Cannot tell the academic year of '{name}'; put it in the file name, e.g. '... (AY 2024-25).csv'")
+        content_hash = hashlib.sha256(content).hexdigest()
+        entry = self.entries().get(year)
+        if entry is not None and entry["content_hash"] == content_hash:
+            return year, IngestReport(**entry["report"])
+
+        df, report = read_feedback_csv(io.BytesIO(content))
+        os.makedirs(self.directory, exist_ok=True)
+        data_file = f"{year}.parquet"
+        _write_atomically(self._path(data_file), lambda path: df.to_parquet(path, index=False))
+        with self._lock:
+            entries = self.entries()
+            entries[year] = {
+                "source": os.path.basename(name),
+                "content_hash": content_hash,
+                "data_file": data_file,
+                "rows": len(df),
+                "added_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "report": report._asdict(),
+            }
+            self._save_entries(entries)
+        return year, report
+
+    def remove(self, year):
+        with self._lock:
+            entries = self.entries()
+            entry = entries.pop(year, None)
+            if entry is None:
+                return False
+            self._save_entries(entries)
+        if os.path.exists(self._path(entry["data_file"])):
+            os.remove(self._path(entry["data_file"]))
+        return True
+
+    def load(self, years=None):
+        """
+        Loads the feedback of the given years (all by default) as one DataFrame
+        with an Academic Year column. Returns it with the combined IngestReport.
+        """
+        entries = self.entries()
+        years = sorted(entries if years is None else years)
+        unknown = [year for year in years if year not in entries]
+        if unknown:
+            raise KeyError(f"No feedback stored for {', '.join(unknown)}")
+        frames = []
+        for year in years:
+            df = pd.read_parquet(self._path(entries[year]["data_file"]))
+            df[YEAR_COLUMN] = pd.Categorical.from_codes([0] * len(df), categories=[year])
+            frames.append(df)
+        df = concat_frames(frames) if frames else pd.DataFrame(columns=[YEAR_COLUMN])
+        return df, _merge_reports([IngestReport(**entries[year]["report"]) for year in years], df.columns)
+
+    def to_csv(self, years=None):
+        """
+        Exports the feedback of the given years as CSV bytes, e.g. to send it to the summary service.
+        """
+        return self.load(years)[0].to_csv(index=False).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store feedback exports of several academic years for fast loading.")
+    parser.add_argument("--dir", default=CATALOG_DIR, help="Catalog directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Add or replace the exports of one or more years")
+    add.add_argument("csv_files", nargs="+", help="Feedback CSV exports, with the academic year in the file name")
+    add.add_argument("--year", help="Academic year (e.g. 2024-25) when adding a single file without it in the name")
+    commands.add_parser("list", help="List the stored years")
+    remove = commands.add_parser("remove", help="Remove a stored year")
+    remove.add_argument("year")
+    args = parser.parse_args()
+
+    catalog = FeedbackCatalog(args.dir)
+    if args.command == "add":
+        if args.year and len(args.csv_files) > 1:
+            parser.error("--year can only be used with a single file")
+        failed = 0
+        for csv_path in args.csv_files:
+            with open(csv_path, "rb") as csv_file:
+                started = time.perf_counter()
+                try:
+                    year, report = catalog.add(csv_file.read(), csv_path, args.year)
+                except ValueError as error:
+                    print(error)
+                    failed += 1
+                    continue
+            print(f"{year}: {report.rows_kept} rows from {os.path.basename(csv_path)} ({time.perf_counter() - started:.2f}s)")
+            for warning in report_warnings(report):
+                print(f"  {warning}")
+        return 1 if failed else 0
+    elif args.command == "list":
+        entries = catalog.entries()
+        if not entries:
+            print(f"No academic years stored in {args.dir}.")
+        for year in sorted(entries):
+            entry = entries[year]
+            print(f"{year}: {entry['rows']} rows from {entry['source']} (added {entry['added_at']})")
+    elif not catalog.remove(args.year):
+        print(f"No feedback stored for {args.year}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+# charts.py
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+# How the analytics charts are drawn: matplotlib rendered once to a PNG (the original
+# charts), plotly, or Streamlit's own charts (fastest, but the student pie becomes bars).
+# The default can be set with FEEDBACK_CHART_BACKEND, e.g. "native" to opt in.
+CHART_BACKENDS = ['matplotlib', 'plotly', 'native']
+DEFAULT_BACKEND = os.getenv("FEEDBACK_CHART_BACKEND", "matplotlib")
+if DEFAULT_BACKEND not in CHART_BACKENDS:
+    DEFAULT_BACKEND = 'matplotlib'
+
+# Rendered charts kept per process; the least recently used are dropped first. Enough
+# for the charts of a full PDF report run (see reports.py), about 50 KB per image.
+MAX_CACHED_CHARTS = 512
+
+# Matplotlib figure size (inches) and PNG resolution
+FIGURE_SIZE = (8, 6)
+FIGURE_DPI = 100
+
+# A rendered chart: `kind` is 'bar' (a Series for st.bar_chart), 'plotly' (a figure)
+# or 'image' (PNG bytes)
+Chart = namedtuple('Chart', ['kind', 'payload'])
+
+
+class ChartCache:
+    """
+    In-memory LRU cache of rendered charts, keyed by (dataset version, company,
+    chart type, backend). Safe to share between sessions and threads.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_CHARTS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._charts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._charts:
+                self.hits += 1
+                self._charts.move_to_end(key)
+                return self._charts[key]
+            self.misses += 1
+        # Rendered outside the lock; two sessions asking for the same new chart
+        # at once both render it, which is harmless
+        chart = render()
+        self.put(key, chart)
+        return chart
+
+    def get(self, key):
+        """
+        Returns a cached chart without rendering it, or None.
+        """
+        with self._lock:
+            if key in self._charts:
+                self._charts.move_to_end(key)
+            return self._charts.get(key)
+
+    def put(self, key, chart):
+        with self._lock:
+            self._charts[key] = chart
+            self._charts.move_to_end(key)
+            while len(self._charts) > self.max_entries:
+                self._charts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._charts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._charts)
+
+
+def _figure_png(fig):
+    # Figures are created without pyplot, so none are registered globally; the
+    # figure is dropped as soon as its PNG has been written
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=FIGURE_DPI, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def skill_bar_chart(skill_means, backend=DEFAULT_BACKEND, title='Average Skills Across Students'):
+    """
+    Renders the average rating per skill of a company's students (or one student's ratings).
+    """
+    if backend == 'plotly':
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Bar(x=list(skill_means.index), y=skill_means.to_numpy(), marker_color='skyblue'))
+        fig.update_layout(title=title, yaxis_title='Average Score', xaxis_tickangle=-45)
+        return Chart('plotly', fig)
+    if backend == 'matplotlib':
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=FIGURE_SIZE)
+        ax = fig.subplots()
+        ax.bar(skill_means.index, skill_means, color='skyblue')
+        ax.set_title(title, fontsize=14)
+        ax.set_xticks(range(len(skill_means)))
+        ax.set_xticklabels(skill_means.index, rotation=45, ha='right')
+        ax.set_ylabel('Average Score')
+        return Chart('image', _figure_png(fig))
+    return Chart('bar', skill_means.rename('Average Score'))
+
+
+def student_pie_chart(student_averages, backend=DEFAULT_BACKEND):
+    """
+    Renders each student's share of the company's overall performance. The
+    native backend has no pie chart and shows the same values as bars.
+    """
+    title = 'Overall Performance of Students'
+    if backend == 'plotly':
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Pie(labels=list(student_averages.index), values=student_averages.to_numpy(),
+                               sort=False, direction='counterclockwise', rotation=90))
+        fig.update_layout(title=title)
+        return Chart('plotly', fig)
+    if backend == 'matplotlib':
+        import matplotlib
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=FIGURE_SIZE)
+        ax = fig.subplots()
+        ax.pie(student_averages, labels=student_averages.index, autopct='%1.1f%%', startangle=90,
+               colors=matplotlib.colormaps['tab20'].colors)
+        ax.set_title(title, fontsize=14)
+        return Chart('image', _figure_png(fig))
+    return Chart('bar', student_averages.rename('Average Rating'))
+
+
+def show_chart(chart):
+    """
+    Draws a rendered chart in the Streamlit page.
+    """
+    # Imported here so PDF report workers (reports.py) can render charts without Streamlit
+    import streamlit as st
+    if chart.kind == 'plotly':
+        st.plotly_chart(chart.payload, use_container_width=True)
+    elif chart.kind == 'image':
+        st.image(chart.payload)
+    else:
+        st.bar_chart(chart.payload.astype(float).to_frame())
@@ -0,0 +1,266 @@
+# comment_search.py
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from embeddings import EMBEDDING_DIM, default_store, idf_weights, normalize_rows
+from feedback_nlp import TEXT_COLUMNS
+from feedback_store import COMPANY_COLUMN, STUDENT_COLUMN
+
+# Random-hyperplane LSH: each table hashes a comment to a bucket of nearby comments;
+# more tables find more true neighbours, more bits make buckets smaller
+LSH_TABLES = 8
+LSH_BITS = 10
+
+# Below this many distinct comments every comment is scored directly
+BRUTE_FORCE_LIMIT = 2000
+
+# Matches less similar than this are left out; hashed features make unrelated texts score slightly above 0
+MIN_SCORE = 0.1
+
+# Names listed per match by names_of before the rest are counted
+MAX_LISTED_NAMES = 10
+
+# Comments scored per requested result when grouping results by company or student
+ENTITY_SEARCH_DEPTH = 5
+
+# Targeted summaries list the comments of at most this many rows, picked by
+# representative_rows; aggregates still cover every row
+RETRIEVAL_TOP_K = 50
+
+# Weight of relevance against novelty when picking representative rows (maximal marginal relevance)
+MMR_RELEVANCE = 0.7
+
+# A matching comment: similarity score, text, column, and the row positions where it was written
+Match = namedtuple('Match', ['score', 'text', 'column', 'rows'])
+
+# A company, student or mentor whose comments match: best score and number of matching comments
+EntityMatch = namedtuple('EntityMatch', ['name', 'score', 'comments'])
+
+
+def _clean(values):
+    texts = pd.Series(values, dtype=object).astype('string').str.strip()
+    return texts.mask(texts == '')
+
+
+class CommentIndex:
+    """
+    Approximate nearest-neighbour index over the free-text feedback columns of a
+    FeedbackDataset. Each distinct comment is embedded once (see embeddings.py)
+    and hashed into LSH buckets; queries are re-scored exactly on the candidates.
+    """
+
+    def __init__(self, dataset, store=None, tables=LSH_TABLES, bits=LSH_BITS, seed=0):
+        self.dataset = dataset
+        self.columns = [column for column in TEXT_COLUMNS if dataset.has_column(column)]
+        texts, rows, columns = [], [], []
+        for position, column in enumerate(self.columns):
+            values = _clean(dataset.column(column))
+            present = values.notna().to_numpy()
+            texts.append(values[present])
+            rows.append(np.flatnonzero(present))
+            columns.append(np.full(present.sum(), position, dtype=np.int8))
+        texts = pd.concat(texts, ignore_index=True) if texts else pd.Series(dtype='string')
+        # One entry per (row, column) comment, pointing at its distinct text
+        codes, uniques = pd.factorize(texts)
+        self.texts = [str(text) for text in uniques]
+        self._entry_text = codes
+        self._entry_row = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+        self._entry_column = np.concatenate(columns) if columns else np.empty(0, dtype=np.int8)
+        order = np.argsort(codes, kind='stable')
+        self._text_entries = np.split(order, np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1])
+
+        store = store or default_store()
+        vectors = store.embed(self.texts) if self.texts else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        store.save()
+        self._idf = idf_weights(vectors) if len(vectors) else np.ones(EMBEDDING_DIM, dtype=np.float32)
+        self._store = store
+        self.vectors = normalize_rows(vectors * self._idf)
+
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((tables, bits, EMBEDDING_DIM)).astype(np.float32)
+        self._powers = 1 << np.arange(bits)
+        self._buckets = []
+        if len(self.texts) > BRUTE_FORCE_LIMIT:
+            for planes in self._planes:
+                codes = self._codes(self.vectors, planes)
+                order = np.argsort(codes, kind='stable')
+                keys, starts = np.unique(codes[order], return_index=True)
+                self._buckets.append(dict(zip(keys.tolist(), np.split(order, starts[1:]))))
+
+    def __len__(self):
+        return len(self._entry_text)
+
+    def _codes(self, vectors, planes):
+        return ((vectors @ planes.T) > 0).astype(np.int64) @ self._powers
+
+    def query_vector(self, query):
+        """
+        Embeds a query text the same way as the indexed comments.
+        """
+        return normalize_rows((self._store.embed([query]) * self._idf))[0]
+
+    def _candidates(self, vector):
+        if not self._buckets:
+            return np.arange(len(self.texts))
+        found = []
+        for planes, buckets in zip(self._planes, self._buckets):
+            code = int(self._codes(vector[None, :], planes)[0])
+            # Multi-probe: also look in the buckets one hyperplane away
+            for probe in [code] + [code ^ int(power) for power in self._powers]:
+                if probe in buckets:
+                    found.append(buckets[probe])
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+
+    def _ranked_texts(self, vector, limit):
+        candidates = self._candidates(vector)
+        if len(candidates) < limit:
+            # Too few neighbours hashed together; fall back to an exact scan
+            candidates = np.arange(len(self.texts))
+        scores = self.vectors[candidates] @ vector
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
+
+    def search(self, query, k=10, column=None, exclude_rows=None):
+        """
+        Returns up to `k` Matches most similar to `query` (a text or a query
+        vector), optionally only in one column and skipping the given rows.
+        """
+        if not self.texts:
+            return []
+        vector = self.query_vector(query) if isinstance(query, str) else query
+        excluded = set(np.asarray(exclude_rows if exclude_rows is not None else [], dtype=np.intp).tolist())
+        column_position = self.columns.index(column) if column in self.columns else None
+        matches = []
+        text_ids, scores = self._ranked_texts(vector, k * ENTITY_SEARCH_DEPTH)
+        for text_id, score in zip(text_ids, scores):
+            if score < MIN_SCORE:
+                break
+            entries = self._text_entries[text_id]
+            if column_position is not None:
+                entries = entries[self._entry_column[entries] == column_position]
+            rows = [row for row in self._entry_row[entries].tolist() if row not in excluded]
+            if not rows:
+                continue
+            columns = sorted(set(self._entry_column[entries].tolist()))
+            matches.append(Match(float(score), self.texts[text_id], ', '.join(self.columns[position] for position in columns), rows))
+            if len(matches) == k:
+                break
+        return matches
+
+    def entity_vector(self, key, name, column=None):
+        """
+        Returns the centroid of one company's, student's or mentor's comments, or None.
+        """
+        selected = np.isin(self._entry_row, self.dataset.rows_for(key, name))
+        if column in self.columns:
+            selected &= self._entry_column == self.columns.index(column)
+        if not selected.any():
+            return None
+        return normalize_rows(self.vectors[self._entry_text[selected]].mean(axis=0, keepdims=True))[0]
+
+    def similar_entities(self, key, query=None, name=None, k=10, column=None):
+        """
+        Ranks companies, students or VIIT mentors (`key`) by how closely their
+        comments match `query`, or the comments of the entity `name` (which is
+        then left out of the results). Returns up to `k` EntityMatches.
+        """
+        exclude_rows = None
+        if name is not None:
+            query = self.entity_vector(key, name, column)
+            if query is None:
+                return []
+            exclude_rows = self.dataset.rows_for(key, name)
+        matches = self.search(query, k * ENTITY_SEARCH_DEPTH, column, exclude_rows)
+        if not matches or not self.dataset.has_column(key):
+            return []
+        best = {}
+        for match in matches:
+            for entity in set(self.dataset.column(key, match.rows)):
+                if isinstance(entity, str):
+                    score, comments = best.get(entity, (0.0, 0))
+                    best[entity] = (max(score, match.score), comments + 1)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [EntityMatch(entity, score, comments) for entity, (score, comments) in ranked[:k]]
+
+
+def names_of(dataset, key, rows, limit=MAX_LISTED_NAMES):
+    """
+    Lists the distinct companies, students or mentors (`key`) of the given rows,
+    e.g. "Student 1, Student 7 (+12 more)".
+    """
+    names = sorted({name for name in dataset.column(key, rows) if isinstance(name, str)})
+    listed = ", ".join(names[:limit])
+    return listed + (f" (+{len(names) - limit} more)" if len(names) > limit else "")
+
+
+def show_similar_feedback(dataset):
+    """
+    Draws the "Find similar feedback" expander of the Streamlit apps: comments,
+    companies or students whose feedback matches a query or a student's comments.
+    """
+    # Imported here so prompt building and batch workers can use this module without Streamlit
+    import streamlit as st
+    # Similarity search over the comments, e.g. "which students got feedback like this one?"
+    with st.expander("Find similar feedback"):
+        comment_columns = [column for column in TEXT_COLUMNS if dataset.has_column(column)]
+        search_text = st.text_input("Feedback to look for, e.g. 'needs to improve time management'")
+        search_student = st.selectbox("Or: students with feedback like this student's", ["None"] + dataset.names(STUDENT_COLUMN))
+        search_in = st.selectbox("Search in", ["All comments"] + comment_columns)
+        show_as = st.selectbox("Show", ["Comments", "Companies", "Students"])
+        search_column = None if search_in == "All comments" else search_in
+        if search_student != "None":
+            # The index is built on first use and kept with the dataset
+            similar = dataset.comment_index.similar_entities(STUDENT_COLUMN, name=search_student, column=search_column)
+            st.dataframe({"Student": [match.name for match in similar], "Similarity": [round(match.score, 3) for match in similar],
+                          "Matching comments": [match.comments for match in similar]})
+        elif search_text.strip() and show_as == "Comments":
+            matches = dataset.comment_index.search(search_text, column=search_column)
+            st.dataframe({"Comment": [match.text for match in matches], "Similarity": [round(match.score, 3) for match in matches],
+                          "Column": [match.column for match in matches],
+                          "Students": [names_of(dataset, STUDENT_COLUMN, match.rows) for match in matches]})
+        elif search_text.strip():
+            key, label = (COMPANY_COLUMN, "Company") if show_as == "Companies" else (STUDENT_COLUMN, "Student")
+            similar = dataset.comment_index.similar_entities(key, query=search_text, column=search_column)
+            st.dataframe({label: [match.name for match in similar],
+                          "Similarity": [round(match.score, 3) for match in similar],
+                          "Matching comments": [match.comments for match in similar]})
+
+
+def representative_rows(feedback, top_k=RETRIEVAL_TOP_K, store=None):
+    """
+    Picks the `top_k` rows of `feedback` (a dict of lists) whose comments best
+    represent all of them: close to the centroid of the comments, without
+    repeating each other. Returns their positions, most representative first,
+    or None when no more than `top_k` rows have comments.
+    """
+    columns = [column for column in TEXT_COLUMNS if column in feedback]
+    if not columns:
+        return None
+    texts = pd.DataFrame({column: _clean(feedback[column]) for column in columns})
+    commented = np.flatnonzero(texts.notna().any(axis=1).to_numpy())
+    if len(commented) <= top_k:
+        return None
+
+    codes, uniques = pd.factorize(texts.iloc[commented].stack())
+    vectors = (store or default_store()).embed([str(text) for text in uniques])
+    vectors = normalize_rows(vectors * idf_weights(vectors))
+    # A row's vector is the sum of its comments' vectors
+    row_of_comment = texts.iloc[commented].notna().to_numpy().nonzero()[0]
+    row_vectors = np.zeros((len(commented), vectors.shape[1]), dtype=np.float32)
+    np.add.at(row_vectors, row_of_comment, vectors[codes])
+    row_vectors = normalize_rows(row_vectors)
+
+    relevance = row_vectors @ normalize_rows(row_vectors.mean(axis=0, keepdims=True))[0]
+    redundancy = np.full(len(commented), -np.inf, dtype=np.float32)
+    available = np.ones(len(commented), dtype=bool)
+    picked = []
+    for _ in range(top_k):
+        scores = MMR_RELEVANCE * relevance - (1 - MMR_RELEVANCE) * np.maximum(redundancy, 0)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, row_vectors @ row_vectors[best])
+    return commented[picked]
@@ -0,0 +1,183 @@
+# embeddings.py
+import atexit
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+# Comments are embedded locally with feature hashing: words, word pairs and character
+# 4-grams (so 'communicate' and 'communication' overlap) are hashed into a fixed number
+# of dimensions. No model download or API call is needed.
+EMBEDDING_DIM = 256
+EMBEDDING_VERSION = 1
+
+# Texts embedded per vectorized batch
+BATCH_SIZE = 512
+
+# Embeddings kept in memory and on disk; override the file with FEEDBACK_EMBEDDING_CACHE
+EMBEDDING_CACHE_FILE = os.getenv("FEEDBACK_EMBEDDING_CACHE", "embeddings_cache.npz")
+MAX_CACHED_EMBEDDINGS = 50000
+
+# New embeddings are written to disk after this many, and when the process exits
+SAVE_EVERY = 2000
+
+FEATURE_WEIGHTS = {'word': 1.0, 'pair': 0.5, 'char': 0.25}
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'he', 'her', 'his',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'she', 'so', 'that', 'the', 'their', 'they', 'this', 'to',
+    'very', 'was', 'were', 'will', 'with',
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(feature):
+    # Stable across processes (unlike hash()), so cached vectors stay valid
+    hashed = zlib.crc32(feature.encode("utf-8"))
+    return hashed % EMBEDDING_DIM, 1.0 if (hashed // EMBEDDING_DIM) & 1 else -1.0
+
+
+def _features(text):
+    words = [word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+    features = [(f"w:{word}", FEATURE_WEIGHTS['word']) for word in words]
+    features += [(f"p:{first} {second}", FEATURE_WEIGHTS['pair']) for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [(f"c:{padded[start:start + 4]}", FEATURE_WEIGHTS['char']) for start in range(len(padded) - 3)]
+    return features
+
+
+def embed_texts(texts):
+    """
+    Embeds texts in batches of BATCH_SIZE. Returns a float32 matrix with one
+    L2-normalized row per text (all zeros for a text without words).
+    """
+    matrix = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for start in range(0, len(texts), BATCH_SIZE):
+        rows, columns, weights = [], [], []
+        for offset, text in enumerate(texts[start:start + BATCH_SIZE]):
+            for feature, weight in _features(text):
+                column, sign = _bucket(feature)
+                rows.append(start + offset)
+                columns.append(column)
+                weights.append(sign * weight)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)),
+                  np.asarray(weights, dtype=np.float32))
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def idf_weights(matrix):
+    """
+    Weights each dimension by how rare it is among the rows of `matrix`, so words
+    used in almost every comment ('good', 'work') count less.
+    """
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    return (np.log((1 + len(matrix)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+
+def _text_key(text):
+    return hashlib.blake2b(f"{EMBEDDING_VERSION}:{EMBEDDING_DIM}:{text}".encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingStore:
+    """
+    Embeddings of distinct texts, cached in memory and in a .npz file keyed by
+    a hash of the text, so each comment is embedded once across restarts.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_FILE, max_entries=MAX_CACHED_EMBEDDINGS):
+        self.path = path
+        self.max_entries = max_entries
+        self._vectors = None
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._vectors = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as cached:
+                keys, vectors = cached['keys'], cached['vectors']
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("ignoring unreadable embedding cache %s: %s", self.path, error)
+            return
+        if vectors.ndim == 2 and vectors.shape[1] == EMBEDDING_DIM:
+            self._vectors = dict(zip(keys.tolist(), vectors))
+
+    def embed(self, texts):
+        """
+        Returns the embeddings of `texts` (one row each), computing only the ones not cached yet.
+        """
+        keys = [_text_key(text) for text in texts]
+        with self._lock:
+            if self._vectors is None:
+                self._load()
+            missing = {key: text for key, text in zip(keys, texts) if key not in self._vectors}
+        if missing:
+            computed = embed_texts(list(missing.values()))
+            with self._lock:
+                if len(self._vectors) + len(missing) > self.max_entries:
+                    self._vectors.clear()
+                self._vectors.update(zip(missing, computed))
+                self._unsaved += len(missing)
+                save = self._unsaved >= SAVE_EVERY
+            if save:
+                self.save()
+        with self._lock:
+            vectors = [self._vectors.get(key) for key in keys]
+        # A vector dropped by a concurrent clear() is simply computed again
+        return np.array([vector if vector is not None else embed_texts([text])[0]
+                         for vector, text in zip(vectors, texts)], dtype=np.float32).reshape(len(texts), EMBEDDING_DIM)
+
+    def save(self):
+        """
+        Writes the cached embeddings to disk if any are new.
+        """
+        with self._lock:
+            if not self.path or not self._unsaved:
+                return
+            keys = np.array(list(self._vectors), dtype='S16')
+            vectors = np.array(list(self._vectors.values()), dtype=np.float32).reshape(len(keys), EMBEDDING_DIM)
+            self._unsaved = 0
+        temporary = f"{self.path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(temporary, keys=keys, vectors=vectors)
+            os.replace(temporary, self.path)
+        except OSError as error:
+            # The cache is an optimization; embeddings are simply computed again
+            logger.warning("could not write embedding cache %s: %s", self.path, error)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    """
+    Returns the process-wide EmbeddingStore, saved to disk when the process exits.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = EmbeddingStore()
+            atexit.register(_default_store.save)
+        return _default_store
@@ -0,0 +1,292 @@
+# feedback_db.py
+import hashlib
+import sqlite3
+import time
+
+DATABASE_FILE = "feedback_data.db"
+
+# Entity type stored for each summary option
+ENTITY_TYPES = {
+    "Overall Summary": "overall",
+    "Company-wise Summary": "company",
+    "Student-wise Summary": "student",
+    "VIIT-Mentor-wise Summary": "viit_mentor",
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS datasets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL UNIQUE,
+        name TEXT,
+        row_count INTEGER,
+        created_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS entities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity_type TEXT NOT NULL,
+        name TEXT NOT NULL,
+        UNIQUE (entity_type, name)
+    );
+    CREATE TABLE IF NOT EXISTS summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dataset_id INTEGER REFERENCES datasets (id),
+        entity_id INTEGER NOT NULL REFERENCES entities (id),
+        summary_type TEXT NOT NULL,
+        model TEXT,
+        prompt_hash TEXT,
+        fingerprint TEXT,
+        summary TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_summaries_created ON summaries (created_at);
+    CREATE INDEX IF NOT EXISTS idx_summaries_entity ON summaries (entity_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_summaries_type ON summaries (summary_type, created_at);
+    CREATE INDEX IF NOT EXISTS idx_summaries_dataset ON summaries (dataset_id);
+    CREATE INDEX IF NOT EXISTS idx_summaries_prompt_hash ON summaries (prompt_hash);
+    CREATE TABLE IF NOT EXISTS contacts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity_id INTEGER NOT NULL REFERENCES entities (id),
+        email TEXT NOT NULL,
+        UNIQUE (entity_id, email)
+    );
+    CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        summary_id INTEGER NOT NULL REFERENCES summaries (id),
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        claim TEXT,
+        next_attempt_at REAL NOT NULL,
+        created_at REAL NOT NULL,
+        sent_at REAL,
+        UNIQUE (summary_id, recipient)
+    );
+    CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, next_attempt_at);
+"""
+
+
+def text_hash(text):
+    """
+    SHA-256 of a prompt or file content, used to tell identical inputs apart.
+    """
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    return hashlib.sha256(data).hexdigest()
+
+
+# Create a connection to SQLite database
+def init_db(db_file=DATABASE_FILE):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the UI read while a batch run is writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    _add_fingerprint_column(conn)
+    _migrate_legacy_feedback(conn)
+    conn.commit()
+    return conn
+
+
+def _add_fingerprint_column(conn):
+    # Databases created before entity fingerprints were stored lack the column
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]
+    if 'fingerprint' not in columns:
+        conn.execute("ALTER TABLE summaries ADD COLUMN fingerprint TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_fingerprint ON summaries (entity_id, summary_type, fingerprint)")
+
+
+def _migrate_legacy_feedback(conn):
+    """
+    Moves rows of the old flat `feedback` table (which stored the summary option
+    in company_name and the selected name in student_name) into the new schema,
+    then keeps the old table as `feedback_legacy`.
+    """
+    legacy = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'feedback'").fetchone()
+    if legacy is None:
+        return
+    rows = conn.execute("SELECT company_name, student_name, feedback_data FROM feedback ORDER BY id").fetchall()
+    now = time.time()
+    _insert_summaries(conn, [
+        {"summary_type": option, "entity_name": name, "summary": summary, "created_at": now}
+        for option, name, summary in rows
+        if summary is not None
+    ])
+    conn.execute("ALTER TABLE feedback RENAME TO feedback_legacy")
+
+
+def _entity_id(conn, entity_type, name):
+    conn.execute("INSERT OR IGNORE INTO entities (entity_type, name) VALUES (?, ?)", (entity_type, name))
+    return conn.execute(
+        "SELECT id FROM entities WHERE entity_type = ? AND name = ?", (entity_type, name)
+    ).fetchone()[0]
+
+
+def _insert_summaries(conn, records):
+    entity_ids = {}
+    rows = []
+    for record in records:
+        summary_type = record["summary_type"]
+        entity_type = ENTITY_TYPES.get(summary_type, summary_type)
+        entity_name = (record.get("entity_name") or "All").strip()
+        key = (entity_type, entity_name)
+        if key not in entity_ids:
+            entity_ids[key] = _entity_id(conn, entity_type, entity_name)
+        rows.append((
+            record.get("dataset_id"), entity_ids[key], summary_type, record.get("model"),
+            record.get("prompt_hash"), record.get("fingerprint"), record["summary"],
+            record.get("created_at") or time.time(),
+        ))
+    conn.executemany("""
+        INSERT INTO summaries (dataset_id, entity_id, summary_type, model, prompt_hash, fingerprint, summary, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def save_dataset(conn, content_hash, name=None, row_count=None):
+    """
+    Registers an uploaded dataset (once per content hash) and returns its id.
+    """
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO datasets (content_hash, name, row_count, created_at) VALUES (?, ?, ?, ?)",
+            (content_hash, name, row_count, time.time()),
+        )
+    return conn.execute("SELECT id FROM datasets WHERE content_hash = ?", (content_hash,)).fetchone()[0]
+
+
+def save_contacts(conn, records):
+    """
+    Saves email addresses of companies (their industry mentor), students and
+    VIIT mentors. Each record is a dict with entity_type (see ENTITY_TYPES),
+    name and email. Returns the number of new addresses.
+    """
+    added = 0
+    with conn:
+        for record in records:
+            entity_type = ENTITY_TYPES.get(record["entity_type"], record["entity_type"])
+            entity_id = _entity_id(conn, entity_type, record["name"].strip())
+            cursor = conn.execute("INSERT OR IGNORE INTO contacts (entity_id, email) VALUES (?, ?)",
+                                  (entity_id, record["email"].strip()))
+            added += cursor.rowcount
+    return added
+
+
+def save_summaries(conn, records):
+    """
+    Saves many summaries in a single transaction. Each record is a dict with
+    summary_type, entity_name and summary, and optionally dataset_id, model,
+    prompt_hash, fingerprint and created_at.
+    """
+    with conn:
+        _insert_summaries(conn, records)
+
+
+# Save one summary to the database
+def save_summary(conn, summary_type, entity_name, summary, model=None, prompt_hash=None, dataset_id=None,
+                 fingerprint=None):
+    save_summaries(conn, [{
+        "summary_type": summary_type,
+        "entity_name": entity_name,
+        "summary": summary,
+        "model": model,
+        "prompt_hash": prompt_hash,
+        "dataset_id": dataset_id,
+        "fingerprint": fingerprint,
+    }])
+
+
+def _filters(summary_type=None, entity_name=None, dataset_id=None):
+    clauses, params = [], []
+    if summary_type:
+        clauses.append("s.summary_type = ?")
+        params.append(summary_type)
+    if entity_name:
+        clauses.append("e.name LIKE ?")
+        params.append(f"%{entity_name.strip()}%")
+    if dataset_id is not None:
+        clauses.append("s.dataset_id = ?")
+        params.append(dataset_id)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_summaries(conn, summary_type=None, entity_name=None, dataset_id=None, limit=20, offset=0):
+    """
+    Returns one page of stored summaries, newest first, optionally filtered by
+    summary type, entity name (substring match) and dataset.
+    """
+    where, params = _filters(summary_type, entity_name, dataset_id)
+    return conn.execute(f"""
+        SELECT s.id, s.summary_type, e.entity_type, e.name AS entity_name, s.model,
+               s.prompt_hash, s.summary, s.created_at, s.dataset_id
+        FROM summaries s JOIN entities e ON e.id = s.entity_id
+        {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT ? OFFSET ?
+    """, params + [limit, offset]).fetchall()
+
+
+def count_summaries(conn, summary_type=None, entity_name=None, dataset_id=None):
+    where, params = _filters(summary_type, entity_name, dataset_id)
+    return conn.execute(
+        f"SELECT COUNT(*) FROM summaries s JOIN entities e ON e.id = s.entity_id{where}", params
+    ).fetchone()[0]
+
+
+def latest_summary(conn, summary_type, entity_name, fingerprint=None, model=None):
+    """
+    Returns the most recent summary of one entity, or None. With `fingerprint`
+    (and `model`) only a summary generated from the same rows (by the same
+    model) is returned.
+    """
+    entity_type = ENTITY_TYPES.get(summary_type, summary_type)
+    clauses, params = ["e.entity_type = ?", "e.name = ?", "s.summary_type = ?"], [entity_type, (entity_name or "All").strip(), summary_type]
+    if fingerprint is not None:
+        clauses.append("s.fingerprint = ?")
+        params.append(fingerprint)
+    if model is not None:
+        clauses.append("s.model = ?")
+        params.append(model)
+    return conn.execute(f"""
+        SELECT s.id, s.summary_type, e.name AS entity_name, s.model, s.prompt_hash, s.fingerprint,
+               s.summary, s.created_at, s.dataset_id
+        FROM summaries s JOIN entities e ON e.id = s.entity_id
+        WHERE {" AND ".join(clauses)}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT 1
+    """, params).fetchone()
+
+
+def latest_summaries(conn, summary_type):
+    """
+    Returns the most recent summary text of every entity with a summary of
+    `summary_type`, keyed by entity name, in one query.
+    """
+    rows = conn.execute("""
+        SELECT e.name, s.summary
+        FROM summaries s JOIN entities e ON e.id = s.entity_id
+        WHERE s.summary_type = ?
+        ORDER BY s.created_at, s.id
+    """, (summary_type,))
+    # Later rows overwrite earlier ones, leaving the newest summary per name
+    return dict(rows.fetchall())
+
+
+def stored_fingerprints(conn, summary_type, model=None):
+    """
+    Returns the (entity name, fingerprint) pairs that already have a summary
+    of `summary_type` (generated by `model`, when given).
+    """
+    query = """
+        SELECT DISTINCT e.name, s.fingerprint
+        FROM summaries s JOIN entities e ON e.id = s.entity_id
+        WHERE s.summary_type = ? AND s.fingerprint IS NOT NULL
+    """
+    params = [summary_type]
+    if model is not None:
+        query += " AND s.model = ?"
+        params.append(model)
+    return {(name, fingerprint) for name, fingerprint in conn.execute(query, params)}
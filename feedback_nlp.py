@@ -0,0 +1,114 @@
+# feedback_nlp.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from feedback_store import STRENGTHS_COLUMN, IMPROVEMENT_COLUMN
+
+# Free-text columns scored and tagged locally before anything is sent to the LLM
+TEXT_COLUMNS = [STRENGTHS_COLUMN, IMPROVEMENT_COLUMN]
+
+# TextBlob polarity (-1 to 1) above/below which a comment counts as positive/negative
+SENTIMENT_THRESHOLD = 0.1
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+# Topics and the word stems that tag them, matched at the start of a word
+TOPIC_KEYWORDS = {
+    'communication': ['communicat', 'present', 'speak', 'english', 'express', 'articulat', 'convers'],
+    'technical skills': ['technical', 'knowledge', 'coding', 'programm', 'domain', 'tool', 'technolog', 'software'],
+    'teamwork': ['team', 'collaborat', 'cooperat', 'colleague'],
+    'time management': ['time', 'punctual', 'deadline', 'schedul', 'late'],
+    'confidence': ['confiden', 'shy', 'hesita', 'initiative'],
+    'learning attitude': ['learn', 'curious', 'question', 'grasp', 'adapt', 'eager'],
+    'problem solving': ['problem', 'analytic', 'logic', 'debug', 'solution', 'solv'],
+    'creativity': ['creativ', 'innovat', 'idea'],
+    'work ethic': ['attitude', 'disciplin', 'sincer', 'hardwork', 'hard work', 'dedicat', 'ownership', 'responsib', 'behav'],
+    'documentation': ['document', 'report', 'writing', 'written'],
+    'attention to detail': ['detail', 'accura', 'careful'],
+}
+TOPICS = list(TOPIC_KEYWORDS)
+LABELS = SENTIMENTS + TOPICS
+
+_TOPIC_PATTERNS = {
+    topic: r'\b(?:' + '|'.join(stems) + ')'
+    for topic, stems in TOPIC_KEYWORDS.items()
+}
+
+# Label rows of distinct comments already classified; cleared when it grows past the limit
+MAX_CACHED_TEXTS = 100000
+_label_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _polarity(text):
+    # Imported here so apps that never classify comments do not load TextBlob
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+
+def _classify(texts):
+    """
+    Scores sentiment and tags topics for distinct, non-empty comments. Topic
+    tagging is vectorized; sentiment needs one TextBlob call per comment.
+    Returns a 0/1 matrix with one row per text and one column per label.
+    """
+    lowered = pd.Series(texts, dtype=object).str.lower()
+    matrix = np.zeros((len(texts), len(LABELS)), dtype=np.int8)
+    polarity = np.array([_polarity(text) for text in texts], dtype=float)
+    matrix[:, 0] = polarity > SENTIMENT_THRESHOLD
+    matrix[:, 2] = polarity < -SENTIMENT_THRESHOLD
+    matrix[:, 1] = ~(matrix[:, 0].astype(bool) | matrix[:, 2].astype(bool))
+    for position, topic in enumerate(TOPICS, start=len(SENTIMENTS)):
+        matrix[:, position] = lowered.str.contains(_TOPIC_PATTERNS[topic], regex=True).to_numpy()
+    return matrix
+
+
+def label_matrix(values):
+    """
+    Labels a column of comments: returns a DataFrame with the same index and
+    one 0/1 column per sentiment and topic. Missing comments get all zeros.
+    Each distinct comment is classified once per process and then cached.
+    """
+    texts = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(texts.astype('string').str.strip().replace('', pd.NA))
+    uniques = list(uniques)
+    # Rows are gathered locally so clearing the cache below cannot drop labels this call needs
+    found = {}
+    with _cache_lock:
+        for text in uniques:
+            if text in _label_cache:
+                found[text] = _label_cache[text]
+    missing = [text for text in uniques if text not in found]
+    if missing:
+        labels = _classify(missing)
+        found.update(zip(missing, labels))
+        with _cache_lock:
+            if len(_label_cache) + len(missing) > MAX_CACHED_TEXTS:
+                _label_cache.clear()
+            _label_cache.update(zip(missing, labels))
+    unique_rows = np.array([found[text] for text in uniques],
+                           dtype=np.int8).reshape(len(uniques), len(LABELS))
+    # A trailing all-zero row is picked by code -1 (missing comment)
+    rows = np.vstack([unique_rows, np.zeros((1, len(LABELS)), dtype=np.int8)])[codes]
+    return pd.DataFrame(rows, index=texts.index, columns=LABELS)
+
+
+def label_counts(values):
+    """
+    Counts comments per sentiment and topic, as a Series indexed by LABELS.
+    """
+    return label_matrix(values).sum()
+
+
+def describe_labels(counts):
+    """
+    Formats label counts as one compact line, e.g.
+    "sentiment 12 positive / 3 neutral / 1 negative; topics communication (5), teamwork (3)".
+    """
+    line = "sentiment " + " / ".join(f"{int(counts[label])} {label}" for label in SENTIMENTS)
+    topics = counts[TOPICS]
+    topics = topics[topics > 0].sort_values(ascending=False, kind='stable')
+    if not topics.empty:
+        line += "; topics " + ", ".join(f"{topic} ({int(count)})" for topic, count in topics.items())
+    return line
@@ -0,0 +1,269 @@
+# feedback_store.py
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+
+# Column names used to look up feedback rows
+COMPANY_COLUMN = 'Name of The Company'
+STUDENT_COLUMN = 'Name of The Student'
+VIIT_MENTOR_COLUMN = 'Faculty Mentor from VIIT'
+
+INDEXED_COLUMNS = [COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN]
+
+# The 11 skill ratings given by the industry mentor
+SKILL_COLUMNS = [
+    'i) Communication & Presentation Skills',
+    'ii) Confidence level',
+    'iii) Creativity',
+    'iv) Planning & Organizational skills',
+    'v) Adaptability',
+    'vi) Knowledge',
+    'vii) Attitude & Behaviour at work',
+    'viii) Analytical Skills',
+    'ix) Societal Understanding',
+    'x) Ethics',
+    'xi) Team Work'
+]
+HIRE_COLUMN = '4. Will you consider the student to be absorbed in your organization (if chance given)?'
+REHIRE_COLUMN = 'Would you like to take VIIT students again in next year?'
+INDUSTRY_MENTOR_COLUMN = 'Name of Industry Mentor'
+STRENGTHS_COLUMN = '1. Strengths of the student'
+IMPROVEMENT_COLUMN = '2. Areas of improvement'
+
+# Academic year of each row when exports of several years are combined (see catalog.py)
+YEAR_COLUMN = 'Academic Year'
+
+CANONICAL_COLUMNS = (
+    ['Timestamp', COMPANY_COLUMN, INDUSTRY_MENTOR_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN]
+    + SKILL_COLUMNS
+    + [STRENGTHS_COLUMN, IMPROVEMENT_COLUMN, HIRE_COLUMN, REHIRE_COLUMN]
+)
+
+# Header variants seen in exports of other years, mapped to the canonical names.
+# Keys are compared after normalize_header, so case and spacing do not matter.
+COLUMN_ALIASES = {
+    'company name': COMPANY_COLUMN,
+    'name of company': COMPANY_COLUMN,
+    'student name': STUDENT_COLUMN,
+    'name of student': STUDENT_COLUMN,
+    'faculty mentor': VIIT_MENTOR_COLUMN,
+    'viit mentor': VIIT_MENTOR_COLUMN,
+    'viit faculty mentor': VIIT_MENTOR_COLUMN,
+    'industry mentor': INDUSTRY_MENTOR_COLUMN,
+    'name of the industry mentor': INDUSTRY_MENTOR_COLUMN,
+    'strengths of the student': STRENGTHS_COLUMN,
+    'areas of improvement': IMPROVEMENT_COLUMN,
+}
+
+
+def normalize_header(name):
+    """
+    Lowercases a column header and collapses its whitespace.
+    """
+    return re.sub(r'\s+', ' ', str(name)).strip().lower()
+
+
+def _alias_map():
+    aliases = {normalize_header(name): name for name in CANONICAL_COLUMNS}
+    # Skill headers are also accepted without their roman numeral, e.g. 'Creativity'
+    for name in SKILL_COLUMNS:
+        aliases[normalize_header(name.split(')', 1)[1])] = name
+    aliases.update((normalize_header(alias), name) for alias, name in COLUMN_ALIASES.items())
+    return aliases
+
+
+_ALIASES = _alias_map()
+
+
+def canonical_column(name):
+    """
+    Returns the canonical name of a column header, or the stripped header
+    itself when it is not a known feedback column.
+    """
+    return _ALIASES.get(normalize_header(name), str(name).strip())
+
+
+def canonical_columns(columns):
+    """
+    Maps each header to its canonical name. When two headers map to the same
+    name, only the first is renamed.
+    """
+    renamed, taken = {}, set()
+    for column in columns:
+        name = canonical_column(column)
+        renamed[column] = column if name in taken else name
+        taken.add(renamed[column])
+    return renamed
+
+
+def _encode_column(series):
+    """
+    Stores a column compactly: numeric columns as a numpy array, text columns
+    as integer codes into a table of unique values (-1 marks a missing value).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Already encoded by the ingestion stage
+        return series.cat.codes.to_numpy().astype(np.int32), np.asarray(series.cat.categories, dtype=object)
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(), None
+    codes, categories = pd.factorize(series, use_na_sentinel=True)
+    return codes.astype(np.int32), np.asarray(categories, dtype=object)
+
+
+def _build_index(codes, categories):
+    """
+    Builds a hash index mapping each unique value to the row positions holding it.
+    """
+    valid = codes >= 0
+    positions = np.flatnonzero(valid)
+    order = np.argsort(codes[valid], kind='stable')
+    sorted_positions = positions[order]
+    counts = np.bincount(codes[valid], minlength=len(categories))
+    boundaries = np.cumsum(counts)[:-1]
+    return {
+        value: rows
+        for value, rows in zip(categories, np.split(sorted_positions, boundaries))
+        if len(rows)
+    }
+
+
+class FeedbackDataset:
+    """
+    Columnar feedback table built once per upload, with prebuilt indexes by
+    company, student and VIIT mentor so summaries only touch matching rows.
+    """
+
+    def __init__(self, df, ingest_report=None):
+        df = df.rename(columns=canonical_columns(df.columns))
+        # IngestReport of the CSV this dataset was read from, if any
+        self.ingest_report = ingest_report
+        self.column_names = list(df.columns)
+        self.num_rows = len(df)
+        self._values = {}
+        self._categories = {}
+        for name in self.column_names:
+            values, categories = _encode_column(df[name])
+            self._values[name] = values
+            self._categories[name] = categories
+
+        # Content hash of every row; entity fingerprints are built from these
+        self._row_hashes = pd.util.hash_pandas_object(df[sorted(df.columns)], index=False).to_numpy()
+
+        self._analytics = None
+        self._comment_index = None
+        self._indexes = {}
+        for key in INDEXED_COLUMNS:
+            column = self.resolve_column(key)
+            if column is None:
+                continue
+            if self._categories[column] is None:
+                # Numeric identifiers are rare, but index them the same way
+                values, categories = _encode_column(df[column].astype(object))
+            else:
+                values, categories = self._values[column], self._categories[column]
+            self._indexes[key] = _build_index(values, categories)
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        return cls(pd.DataFrame(data_dict))
+
+    def resolve_column(self, name):
+        """
+        Returns the column stored for `name` (any alias of it), or None.
+        """
+        if name in self._values:
+            return name
+        column = canonical_column(name)
+        return column if column in self._values else None
+
+    def has_column(self, name):
+        return self.resolve_column(name) is not None
+
+    def names(self, key):
+        """
+        Returns the unique values of an indexed column (company, student or VIIT mentor).
+        """
+        return list(self._indexes.get(key, {}).keys())
+
+    def rows_for(self, key, value):
+        """
+        Returns the row positions matching `value` in an indexed column.
+        """
+        return self._indexes.get(key, {}).get(value, np.empty(0, dtype=np.intp))
+
+    def column(self, name, rows=None):
+        """
+        Decodes a single column (optionally only the given rows) into a list.
+        """
+        column = self.resolve_column(name)
+        values = self._values[column]
+        if rows is not None:
+            values = values[rows]
+        categories = self._categories[column]
+        if categories is None:
+            return values.tolist()
+        decoded = np.where(values >= 0, categories[np.maximum(values, 0)] if len(categories) else None, np.nan)
+        return decoded.tolist()
+
+    def subset(self, key, value):
+        """
+        Returns the feedback rows for one company, student or VIIT mentor as a
+        dict of lists, in the same shape as `df.to_dict(orient='list')`.
+        """
+        rows = self.rows_for(key, value)
+        return {name: self.column(name, rows) for name in self.column_names}
+
+    def fingerprint(self, key=None, value=None):
+        """
+        Hashes the rows of one company, student or VIIT mentor (all rows when
+        `key` is None). Row order does not matter, so the fingerprint only
+        changes when rows of that entity are added, removed or edited.
+        """
+        hashes = self._row_hashes if key is None else self._row_hashes[self.rows_for(key, value)]
+        return hashlib.sha256(np.sort(hashes).tobytes()).hexdigest()
+
+    def to_dict(self):
+        return {name: self.column(name) for name in self.column_names}
+
+    def to_frame(self):
+        """
+        Returns the rows as a DataFrame without decoding them: text columns become
+        categoricals over the stored codes and unique values, numeric columns keep their arrays.
+        """
+        return pd.DataFrame({
+            name: self._values[name] if self._categories[name] is None
+            else pd.Categorical.from_codes(self._values[name], self._categories[name])
+            for name in self.column_names
+        }, copy=False)
+
+    @property
+    def analytics(self):
+        """
+        AnalyticsCube for this dataset, built on first use.
+        """
+        if self._analytics is None:
+            # Imported here because analytics depends on this module's column names
+            from analytics import AnalyticsCube
+            self._analytics = AnalyticsCube(self.to_frame())
+        return self._analytics
+
+    @property
+    def comment_index(self):
+        """
+        CommentIndex (similarity search over the comments) for this dataset, built on first use.
+        """
+        if self._comment_index is None:
+            from comment_search import CommentIndex
+            self._comment_index = CommentIndex(self)
+        return self._comment_index
+
+
+def load_dataset(file):
+    """
+    Reads a feedback CSV (path or uploaded file) into a FeedbackDataset.
+    """
+    # Imported here because ingest depends on this module's column names
+    from ingest import read_feedback_csv
+    return FeedbackDataset(*read_feedback_csv(file))
@@ -1,13 +1,15 @@
 # app.py
+import time
 import streamlit as st
-import pandas as pd
-import sqlite3
-import matplotlib.pyplot as plt
-from prompts import get_prompt
-from langchain_groq import ChatGroq
-import os
-from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from prompts import build_prompt
+from feedback_db import DATABASE_FILE, ENTITY_TYPES, init_db, save_dataset, save_summary, latest_summary, query_summaries, count_summaries, text_hash
+from batch import job_fingerprint
+from summarizer import summarize_feedback, progress_reporter, DEFAULT_MAX_CONCURRENCY
+from llm_cache import model_name, summary_model
+from resources import get_chain, get_llm_cache, load_feedback_dataset, upload_hash, clear_caches
+from ingest import report_warnings
+from metrics import stage_timer, record_request, render_sidebar
+from feedback_store import COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN
 
 # Set the page configuration
 st.set_page_config(
@@ -17,48 +19,19 @@ st.set_page_config(
     initial_sidebar_state="auto",
 )
 
-# Load environment variables for API key
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
-
-# Database setup
-DATABASE_FILE = "feedback_data.db"
-
-# Create a connection to SQLite database
-def init_db():
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    # Create table to store feedback data
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_name TEXT,
-            student_name TEXT,
-            viit_mentor_name TEXT,
-            feedback_data TEXT
-        )
-    """)
-    conn.commit()
-    return conn
-
-# Save feedback data to the database
-def save_to_db(conn, company_name, student_name, viit_mentor_name, feedback_data):
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO feedback (company_name, student_name, viit_mentor_name, feedback_data)
-        VALUES (?, ?, ?, ?)
-    """, (company_name, student_name, viit_mentor_name, feedback_data))
-    conn.commit()
-
-# Fetch feedback data from the database
-def fetch_from_db(conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM feedback")
-    return cursor.fetchall()
+# Stored summaries shown per page in the "Fetch Stored Data" view
+PAGE_SIZE = 20
 
 # Initialize database
 conn = init_db()
 
+# Explicitly invalidate cached uploads and the LLM client (e.g. after editing .env)
+if st.sidebar.button("Reload cached data and LLM client"):
+    clear_caches()
+
+# Latency and token counts of recorded summary requests
+render_sidebar()
+
 # Streamlit App
 st.title("Eduplus Industry Feedback Summarization")
 st.write("Upload a CSV file to generate and store summaries. You can also fetch stored data.")
@@ -68,12 +41,19 @@ uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
 
 if uploaded_file:
     st.write("File uploaded successfully!")
-    data_dict = pd.read_csv(uploaded_file).to_dict(orient='list')
+    # Per-request stage timings and token counts, recorded in metrics.jsonl
+    timings = {}
+    with stage_timer(timings, 'ingest'):
+        data_dict = load_feedback_dataset(uploaded_file)
+
+    # Rows and ratings skipped while reading the upload
+    for warning in report_warnings(data_dict.ingest_report):
+        st.warning(warning)
 
-    # Extract unique company names, student names, and VIIT mentor names
-    company_names = list(set(data_dict.get('Name of The Company', [])))
-    student_names = list(set(data_dict.get('Name of The Student', [])))
-    mentor_names = list(set(data_dict.get('Faculty Mentor from VIIT', [])))
+    # Extract unique company names, student names, and VIIT mentor names from the prebuilt indexes
+    company_names = data_dict.names(COMPANY_COLUMN)
+    student_names = data_dict.names(STUDENT_COLUMN)
+    mentor_names = data_dict.names(VIIT_MENTOR_COLUMN)
 
     # Dropdown for summary options
     summary_option = st.selectbox(
@@ -89,49 +69,74 @@ if uploaded_file:
     elif summary_option == "VIIT-Mentor-wise Summary":
         additional_input = st.selectbox("Select a VIIT mentor for the summary", mentor_names)
 
-    # Load LLM
-    def load_llm():
-        return ChatGroq(temperature=0.4, model_name="llama3-8b-8192", api_key=groq_api_key)
-
-    llm = load_llm()
-
     if summary_option != "Select an option" and (not additional_input or additional_input.strip()):
-        prompt_text = get_prompt(summary_option, data_dict, additional_input)
+        prompt_text, prompt_tokens = build_prompt(summary_option, data_dict, additional_input)
         st.write(f"Selected Option: {summary_option}")
-
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", "You are a helpful assistant that summarizes feedback data for university internship programs."),
-                ("human", "{input}"),
-                ("system", "Here is the feedback data: {feedback_data}. Provide a structured summary based on this data."),
-            ]
-        )
-
-        input_data = {"input": f"Summarize the feedback data for {summary_option}.", "feedback_data": prompt_text}
-        chain = prompt_template | llm
-
-        if st.button("Generate Summary"):
+        st.caption(f"Prompt size: ~{prompt_tokens} tokens")
+
+        max_concurrency = st.slider("Parallel LLM calls for large uploads", 1, 8, DEFAULT_MAX_CONCURRENCY)
+
+        # A summary of exactly these feedback rows is served from the database instead of the LLM
+        fingerprint = job_fingerprint(data_dict, summary_option, additional_input)
+        regenerate = st.checkbox("Regenerate even if the feedback rows are unchanged")
+        generate = st.button("Generate Summary")
+        # Shared LLM client and prompt chain, created once per process when first needed
+        chain = get_chain() if generate else None
+        stored = None if regenerate or not generate else latest_summary(conn, summary_option, additional_input, fingerprint, model_name(chain))
+        if generate and stored is not None:
+            st.write("Summary:")
+            st.markdown(stored['summary'])
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(stored['created_at']))
+            st.caption(f"The feedback rows are unchanged since this summary was generated on {created}; no LLM call was made.")
+        elif generate:
             st.write("Summarizing feedback data...")
-            response = chain.invoke(input_data)
-            response_content = getattr(response, 'content', str(response))
-            cleaned_response = response_content.replace("\n\n", "\n").replace("\n", "\n\n")
-
+            # Responses (chunk summaries included) are cached on disk, so repeats and retries skip the LLM
+            llm_cache = get_llm_cache(DATABASE_FILE)
+            progress_callback = progress_reporter(st.empty())
             st.write("Summary:")
-            st.write(cleaned_response)
-
-            # Save feedback data to the database
-            save_to_db(conn, summary_option, additional_input or "All", "N/A", cleaned_response)
-            st.success("Summary saved to the database!")
-
-# Fetch data button
-if st.button("Fetch Stored Data"):
-    st.write("Fetching stored data from the database...")
-    stored_data = fetch_from_db(conn)
-    if stored_data:
-        st.write("Stored Feedback Summaries:")
-        for record in stored_data:
-            st.write(f"ID: {record[0]}, Company: {record[1]}, Student: {record[2]}, Mentor: {record[3]}")
-            st.write(f"Summary: {record[4]}")
-            st.write("---")
+            # Tokens are rendered as they arrive instead of after the whole completion
+            summary_placeholder = st.empty()
+            models = []
+            cleaned_response = summarize_feedback(
+                chain, summary_option, data_dict, additional_input,
+                max_concurrency=max_concurrency,
+                cache=llm_cache,
+                progress_callback=progress_callback,
+                on_text=summary_placeholder.markdown,
+                timings=timings,
+                models=models,
+            )
+            # The model that actually answered; a fallback model when the first one was rate limited
+            model = summary_model(models)
+            st.caption(f"First token after {timings['time_to_first_token']:.2f}s, complete after {timings['total']:.2f}s")
+            st.caption("LLM cache: {hits} hits, {misses} misses, {entries} stored responses".format(**llm_cache.stats()))
+
+            # Save the summary with the dataset, model and prompt it came from
+            if model is None:
+                st.warning("This summary was written by the local stand-in model, so it was not saved.")
+            else:
+                with stage_timer(timings, 'db_save'):
+                    dataset_id = save_dataset(conn, upload_hash(uploaded_file), uploaded_file.name, data_dict.num_rows)
+                    save_summary(conn, summary_option, additional_input or "All", cleaned_response,
+                                 model=model, prompt_hash=text_hash(prompt_text), dataset_id=dataset_id,
+                                 fingerprint=fingerprint)
+                st.success("Summary saved to the database!")
+            record_request(timings, app="fetch", summary_type=summary_option, entity=additional_input or "All", model=model)
+
+# Browse stored summaries one filtered page at a time
+if st.checkbox("Fetch Stored Data"):
+    type_filter = st.selectbox("Filter by summary type", ["All types"] + list(ENTITY_TYPES))
+    summary_type = None if type_filter == "All types" else type_filter
+    name_filter = st.text_input("Filter by company, student or mentor name")
+    total = count_summaries(conn, summary_type, name_filter)
+    if total:
+        page_count = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+        st.write(f"Stored Feedback Summaries ({total} found):")
+        for record in query_summaries(conn, summary_type, name_filter, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(record['created_at']))
+            with st.expander(f"{record['summary_type']} - {record['entity_name']} ({created})"):
+                st.caption(f"ID: {record['id']}, Model: {record['model'] or 'unknown'}")
+                st.write(record['summary'])
     else:
         st.write("No data found in the database.")
@@ -0,0 +1,136 @@
+# ingest.py
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from feedback_store import (
+    COMPANY_COLUMN,
+    STUDENT_COLUMN,
+    VIIT_MENTOR_COLUMN,
+    INDUSTRY_MENTOR_COLUMN,
+    SKILL_COLUMNS,
+    HIRE_COLUMN,
+    REHIRE_COLUMN,
+    canonical_columns,
+)
+
+# Rows parsed at a time; only one raw chunk is held as Python strings at once
+CHUNK_ROWS = 5000
+
+# Skill ratings outside this range (or not numbers at all) are treated as missing
+RATING_MIN = 0
+RATING_MAX = 10
+RATING_DTYPE = np.float32
+
+# Repeated text stored as categoricals: names and yes/no answers
+CATEGORY_COLUMNS = [COMPANY_COLUMN, INDUSTRY_MENTOR_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN, HIRE_COLUMN, REHIRE_COLUMN]
+
+# Columns required for the company, student and VIIT mentor summaries
+REQUIRED_COLUMNS = [COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN]
+
+IngestReport = namedtuple('IngestReport', ['rows_read', 'rows_kept', 'rows_dropped', 'invalid_ratings', 'renamed', 'missing'])
+
+
+def _clean_text(values):
+    values = values.astype('string').str.strip()
+    return values.mask(values == '')
+
+
+def _normalize_chunk(chunk, invalid_ratings):
+    """
+    Casts one chunk to the compact schema and drops rows that name neither a
+    company nor a student. Counts invalid ratings into `invalid_ratings`.
+    """
+    for column in chunk.columns:
+        if column in SKILL_COLUMNS:
+            raw = chunk[column]
+            ratings = pd.to_numeric(raw, errors='coerce')
+            invalid = (ratings.isna() & raw.notna()) | (ratings < RATING_MIN) | (ratings > RATING_MAX)
+            invalid_ratings[column] = invalid_ratings.get(column, 0) + int(invalid.sum())
+            chunk[column] = ratings.mask(invalid).astype(RATING_DTYPE)
+        elif column in CATEGORY_COLUMNS:
+            chunk[column] = _clean_text(chunk[column]).astype('category')
+
+    keys = [column for column in (COMPANY_COLUMN, STUDENT_COLUMN) if column in chunk.columns]
+    if keys:
+        chunk = chunk[chunk[keys].notna().any(axis=1)]
+    return chunk
+
+
+def _missing_part(like, rows):
+    # Stands in for a column that one of the frames does not have
+    if isinstance(like.dtype, pd.CategoricalDtype):
+        return pd.Series(pd.Categorical.from_codes(np.full(rows, -1), dtype=like.dtype))
+    return pd.Series(np.nan, index=range(rows), dtype=like.dtype if pd.api.types.is_float_dtype(like.dtype) else object)
+
+
+def concat_frames(frames):
+    """
+    Joins normalized frames (chunks of one CSV, or the exports of several
+    years) column by column, merging categoricals without decoding them back
+    to strings. Columns missing from some frames are filled with missing values.
+    """
+    names = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    columns = {}
+    for column in names:
+        like = next(frame[column] for frame in frames if column in frame.columns)
+        parts = [frame[column].reset_index(drop=True) if column in frame.columns else _missing_part(like, len(frame))
+                 for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_feedback_csv(source, chunk_rows=CHUNK_ROWS):
+    """
+    Reads a feedback CSV (path or file object) in chunks of `chunk_rows`.
+    Headers are mapped to their canonical names once, skill ratings become
+    float32, names and yes/no answers become categoricals, and each chunk is
+    validated as it is read. Returns the DataFrame and an IngestReport.
+    """
+    renamed = None
+    invalid_ratings = {}
+    rows_read = 0
+    chunks = []
+    with pd.read_csv(source, chunksize=chunk_rows, skipinitialspace=True) as reader:
+        for chunk in reader:
+            if renamed is None:
+                renamed = canonical_columns(chunk.columns)
+            rows_read += len(chunk)
+            chunk = chunk.rename(columns=renamed).dropna(how='all')
+            chunks.append(_normalize_chunk(chunk, invalid_ratings))
+
+    if not chunks:
+        # Header-only file
+        df = pd.DataFrame(columns=list((renamed or {}).values()))
+    else:
+        df = concat_frames(chunks)
+    renamed = renamed or {}
+    report = IngestReport(
+        rows_read=rows_read,
+        rows_kept=len(df),
+        rows_dropped=rows_read - len(df),
+        invalid_ratings={column: count for column, count in invalid_ratings.items() if count},
+        renamed={old: new for old, new in renamed.items() if old != new},
+        missing=[column for column in REQUIRED_COLUMNS if column not in df.columns],
+    )
+    return df, report
+
+
+def report_warnings(report):
+    """
+    Describes the problems found while reading, one message per problem.
+    """
+    warnings = []
+    if report.missing:
+        warnings.append("Missing columns: " + ", ".join(f"'{column}'" for column in report.missing))
+    if report.rows_dropped:
+        warnings.append(f"Skipped {report.rows_dropped} of {report.rows_read} rows with no company or student name.")
+    if report.invalid_ratings:
+        counts = ", ".join(f"{column} ({count})" for column, count in report.invalid_ratings.items())
+        warnings.append(f"Ignored ratings that are not numbers between {RATING_MIN} and {RATING_MAX}: {counts}")
+    return warnings
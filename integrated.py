@@ -1,15 +1,22 @@
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import os
-from dotenv import load_dotenv
-from prompts import get_prompt
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+import io
+import time
 
-# Load environment variables for API key
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+import streamlit as st
+from summarizer import summarize_feedback, progress_reporter, DEFAULT_MAX_CONCURRENCY
+from resources import (
+    get_chain, get_llm_cache, get_chart_cache, get_catalog, load_feedback_dataset, load_analytics, analytics_version,
+    load_catalog_dataset, load_catalog_analytics, catalog_version, upload_hash, prompt_size, clear_caches,
+)
+from ingest import report_warnings
+from llm_cache import summary_model
+from metrics import stage_timer, record_request, render_sidebar
+from analytics import HIRE_YES, REHIRE_YES, FEEDBACK_COUNT, OVERALL_PERFORMANCE, HIRE_RATE, REHIRE_RATE
+from feedback_nlp import SENTIMENTS, TOPICS
+from comment_search import show_similar_feedback
+from feedback_store import COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN
+from charts import CHART_BACKENDS, DEFAULT_BACKEND, skill_bar_chart, student_pie_chart, show_chart
+from feedback_db import init_db
+from reports import REPORT_KINDS, build_specs, generate_reports
 
 # Set the page configuration
 st.set_page_config(
@@ -19,38 +26,70 @@ st.set_page_config(
     initial_sidebar_state="auto",
 )
 
-# Load LLM
-def load_llm():
-    return ChatGroq(temperature=0.4, model_name="llama3-8b-8192", api_key=groq_api_key)
+# Feedback export shown in the Performance Analysis tab
+PERFORMANCE_DATA_FILE = "Industry Mentor Feedback Form (AY 2023-24).csv"
+
+# Explicitly invalidate cached uploads and the LLM client (e.g. after editing .env)
+if st.sidebar.button("Reload cached data and LLM client"):
+    clear_caches()
+
+# Latency and token counts of recorded summary requests
+render_sidebar()
 
-# Convert CSV to dictionary
-def csv_to_dict(file_path):
-    df = pd.read_csv(file_path)
-    return df.to_dict(orient='list')
+# Exports of other academic years, stored once as Parquet for summaries and analytics across years
+with st.sidebar.expander("Academic year datasets"):
+    catalog = get_catalog()
+    for year, entry in sorted(catalog.entries().items()):
+        st.caption(f"{year}: {entry['rows']} rows from {entry['source']}")
+    catalog_files = st.file_uploader("Add exports (academic year in the file name, e.g. 'AY 2024-25')",
+                                     type="csv", accept_multiple_files=True, key="catalog_files")
+    if catalog_files and st.button("Save to catalog"):
+        for catalog_file in catalog_files:
+            try:
+                year, report = catalog.add(catalog_file.getvalue(), catalog_file.name)
+                st.success(f"{year}: saved {report.rows_kept} rows from {catalog_file.name}")
+            except ValueError as error:
+                st.error(str(error))
 
 # App section 1: Feedback Summarization
 def feedback_summarization():
     st.title("Eduplus Industry Feedback Summarization")
     st.write("Upload a CSV file to generate a summary.")
     
-    uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+    # Academic years saved in the catalog can be summarized together instead of an upload
+    uploaded_file = None
+    selected_years = []
+    catalog_years = get_catalog().years()
+    if catalog_years and st.radio("Feedback source", ["Upload a CSV", "Saved academic years"]) == "Saved academic years":
+        selected_years = st.multiselect("Academic years", catalog_years, default=catalog_years)
+    else:
+        uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
     
-    if uploaded_file:
-        st.write("File uploaded successfully!")
-        data_dict = csv_to_dict(uploaded_file)
+    if uploaded_file or selected_years:
+        if uploaded_file:
+            st.write("File uploaded successfully!")
+        # Per-request stage timings and token counts, recorded in metrics.jsonl
+        timings = {}
+        with stage_timer(timings, 'ingest'):
+            data_dict = load_feedback_dataset(uploaded_file) if uploaded_file else load_catalog_dataset(selected_years)
+
+        # Rows and ratings skipped while reading the upload
+        for warning in report_warnings(data_dict.ingest_report):
+            st.warning(warning)
         
-        company_names = list(set(data_dict.get('Name of The Company', [])))
-        student_names = list(set(data_dict.get('Name of The Student', [])))
+        company_names = data_dict.names(COMPANY_COLUMN)
+        student_names = data_dict.names(STUDENT_COLUMN)
         
-        # Handle potential column mismatches for VIIT mentor names
-        if 'Faculty Mentor from VIIT' in data_dict:
-            mentor_names = list(set(data_dict['Faculty Mentor from VIIT']))
-        elif 'Faculty Mentor from VIIT ' in data_dict:  # Check for trailing spaces
-            mentor_names = list(set(data_dict['Faculty Mentor from VIIT ']))
+        # Header variants (e.g. trailing spaces) are renamed on ingestion; the column may still be missing
+        if data_dict.has_column(VIIT_MENTOR_COLUMN):
+            mentor_names = data_dict.names(VIIT_MENTOR_COLUMN)
         else:
             mentor_names = []
             st.error("The column 'Faculty Mentor from VIIT' is missing in the uploaded CSV.")
         
+        # Similarity search over the comments, e.g. "which students got feedback like this one?"
+        show_similar_feedback(data_dict)
+
         # Summary dropdown
         summary_option = st.selectbox(
             "Select a summary type",
@@ -65,106 +104,138 @@ def feedback_summarization():
         elif summary_option == "VIIT-Mentor-wise Summary":
             additional_input = st.selectbox("Select a VIIT mentor for the summary", mentor_names)
         
-        llm = load_llm()
-        
         if summary_option != "Select an option" and (not additional_input or additional_input.strip()):
-            prompt_text = get_prompt(summary_option, data_dict, additional_input)
-            
-            prompt_template = ChatPromptTemplate.from_messages(
-                [
-                    (
-                        "system",
-                        "You are a helpful assistant that summarizes feedback data for university internship programs."
-                    ),
-                    ("human", "{input}"),
-                    (
-                        "system",
-                        "Here is the feedback data: {feedback_data}. Provide a structured summary based on this data."
-                    ),
-                ]
-            )
+            # Built once per dataset, summary type and entity; the prompt itself is built when the summary is generated
+            dataset_hash = upload_hash(uploaded_file) if uploaded_file else catalog_version(selected_years)[2]
+            prompt_tokens = prompt_size(dataset_hash, summary_option, additional_input, data_dict)
+            st.caption(f"Prompt size: ~{prompt_tokens} tokens")
             
-            input_data = {
-                "input": f"Summarize the feedback data for {summary_option}.",
-                "feedback_data": prompt_text
-            }
-            
-            chain = prompt_template | llm
+            # Uploads too large for one context window are summarized with map-reduce
+            max_concurrency = st.slider("Parallel LLM calls for large uploads", 1, 8, DEFAULT_MAX_CONCURRENCY)
             
             if st.button("Generate Summary"):
                 st.write("Summarizing feedback data...")
-                response = chain.invoke(input_data)
-                cleaned_response = response.content.replace("\n\n", "\n").replace("\n", "\n\n") if hasattr(response, 'content') else str(response)
+                # Shared LLM client and prompt chain, created once per process on first use
+                chain = get_chain()
+                # Responses (chunk summaries included) are cached on disk, so repeats and retries skip the LLM
+                llm_cache = get_llm_cache()
+                progress_callback = progress_reporter(st.empty())
                 st.write("Summary:")
-                st.write(cleaned_response)
+                # Tokens are rendered as they arrive instead of after the whole completion
+                summary_placeholder = st.empty()
+                models = []
+                cleaned_response = summarize_feedback(
+                    chain, summary_option, data_dict, additional_input,
+                    max_concurrency=max_concurrency,
+                    cache=llm_cache,
+                    progress_callback=progress_callback,
+                    on_text=summary_placeholder.markdown,
+                    timings=timings,
+                    models=models,
+                )
+                st.caption(f"First token after {timings['time_to_first_token']:.2f}s, complete after {timings['total']:.2f}s")
+                st.caption("LLM cache: {hits} hits, {misses} misses, {entries} stored responses".format(**llm_cache.stats()))
+                record_request(timings, app="integrated", summary_type=summary_option, entity=additional_input or "All", model=summary_model(models))
 
 # App section 2: Performance Analysis
 def performance_analysis():
     st.title("Student and Company Performance Analysis")
-    data = pd.read_csv("Industry Mentor Feedback Form (AY 2023-24).csv")
-    
     st.sidebar.header("Filters")
-    companies = data['Name of The Company'].unique()
+    # With academic years in the catalog, the analysis covers the selected years instead of the bundled export
+    catalog_years = get_catalog().years()
+    selected_years = st.sidebar.multiselect("Academic years", catalog_years, default=catalog_years,
+                                            key="analysis_years") if catalog_years else []
+    # Aggregates for every company, student and mentor are computed once per file version, and
+    # charts once per file version, company and backend, then reused across reruns
+    if selected_years:
+        cube = load_catalog_analytics(selected_years)
+        version = catalog_version(selected_years)
+    else:
+        cube = load_analytics(PERFORMANCE_DATA_FILE)
+        version = analytics_version(PERFORMANCE_DATA_FILE)
+    charts = get_chart_cache()
+    
+    companies = cube.names(COMPANY_COLUMN)
     selected_company = st.sidebar.selectbox("Select a Company", companies)
+    backend = st.sidebar.selectbox("Chart style", CHART_BACKENDS, index=CHART_BACKENDS.index(DEFAULT_BACKEND))
     
-    filtered_data = data[data['Name of The Company'] == selected_company]
-    students_in_company = filtered_data['Name of The Student'].unique()
-    selected_student = st.sidebar.selectbox("Select a Student (Optional)", ['All'] + list(students_in_company))
+    student_averages = cube.student_performance(selected_company)
+    selected_student = st.sidebar.selectbox("Select a Student (Optional)", ['All'] + list(student_averages.index))
     
     st.header(f"Analysis for {selected_company}")
     
-    if not filtered_data.empty:
+    company_stats = cube.stats(COMPANY_COLUMN, selected_company)
+    if company_stats is not None:
         # Skill averages plot
         st.subheader("Skill Averages of Students in the Company")
-        numeric_cols = [
-            'i) Communication & Presentation Skills',
-            'ii) Confidence level',
-            'iii) Creativity',
-            'iv) Planning & Organizational skills',
-            'v) Adaptability',
-            'vi) Knowledge',
-            'vii) Attitude & Behaviour at work',
-            'viii) Analytical Skills',
-            'ix) Societal Understanding',
-            'x) Ethics',
-            'xi) Team Work'
-        ]
-        skill_means = filtered_data[numeric_cols].mean()
-        fig1, ax1 = plt.subplots(figsize=(8, 6))
-        ax1.bar(skill_means.index, skill_means, color='skyblue')
-        ax1.set_title('Average Skills Across Students', fontsize=14)
-        ax1.set_xticklabels(skill_means.index, rotation=45, ha='right')
-        ax1.set_ylabel('Average Score')
-        st.pyplot(fig1)
+        skill_means = company_stats[cube.skill_columns].astype(float)
+        show_chart(charts.get_or_render((version, selected_company, 'skills', backend),
+                                        lambda: skill_bar_chart(skill_means, backend)))
         
         # Hiring insights
         st.subheader("Hiring Insights for the Selected Company")
-        if '4. Will you consider the student to be absorbed in your organization (if chance given)?' in filtered_data.columns:
-            hire_yes_count = filtered_data['4. Will you consider the student to be absorbed in your organization (if chance given)?'].str.strip().str.lower().value_counts().get('yes', 0)
-            st.write(f"Students Considered for Hiring: **{hire_yes_count}**")
+        if cube.has_hiring:
+            st.write(f"Students Considered for Hiring: **{int(company_stats[HIRE_YES])}**")
         
         # Rehire feedback
         st.subheader("Company's Feedback on Rehiring VIIT Students")
-        if 'Would you like to take VIIT students again in next year?' in filtered_data.columns:
-            rehire_yes_count = filtered_data['Would you like to take VIIT students again in next year?'].str.strip().str.lower().value_counts().get('yes', 0)
-            st.write(f"Positive Responses (Yes): **{rehire_yes_count}**")
+        if cube.has_rehire:
+            st.write(f"Positive Responses (Yes): **{int(company_stats[REHIRE_YES])}**")
+        
+        # The same company across the selected academic years
+        by_year = cube.company_by_year(selected_company)
+        if len(by_year) > 1:
+            st.subheader("Year-over-Year Comparison")
+            st.bar_chart(by_year[[OVERALL_PERFORMANCE]].astype(float))
+            st.dataframe(by_year[[FEEDBACK_COUNT, OVERALL_PERFORMANCE, HIRE_RATE, REHIRE_RATE] + cube.skill_columns].round(2))
+        
+        # Sentiment and topics of the mentors' comments, classified locally without the LLM
+        for column in cube.text_columns:
+            labels = cube.comment_labels(selected_company, column)
+            if labels is None or not labels[SENTIMENTS].sum():
+                continue
+            st.subheader(f"Comment Themes: {column}")
+            st.caption("Sentiment: " + ", ".join(f"{int(labels[label])} {label}" for label in SENTIMENTS))
+            topics = labels[TOPICS]
+            if topics.sum():
+                st.bar_chart(topics[topics > 0].sort_values(ascending=False).to_frame('Comments'))
         
         # Pie chart for student performance
         st.subheader("Overall Performance of Students")
-        filtered_data['Overall Performance'] = filtered_data[numeric_cols].mean(axis=1)
-        student_averages = filtered_data.groupby('Name of The Student')['Overall Performance'].mean()
-        fig2, ax2 = plt.subplots(figsize=(8, 6))
-        ax2.pie(student_averages, labels=student_averages.index, autopct='%1.1f%%', startangle=90, colors=plt.cm.tab20.colors)
-        ax2.set_title("Overall Performance of Students", fontsize=14)
-        st.pyplot(fig2)
+        show_chart(charts.get_or_render((version, selected_company, 'students', backend),
+                                        lambda: student_pie_chart(student_averages, backend)))
     
     if selected_student != 'All':
         st.header(f"Performance of {selected_student}")
-        student_data = filtered_data[filtered_data['Name of The Student'] == selected_student]
-        if not student_data.empty:
-            student_performance = student_data[numeric_cols].T
-            student_performance.columns = ['Rating']
-            st.bar_chart(student_performance)
+        student_skills = cube.student_skills(selected_company, selected_student)
+        if student_skills is not None:
+            st.bar_chart(student_skills.astype(float).to_frame('Rating'))
+
+    # One PDF per company and student with its stored summary and charts, rendered on a
+    # process pool and reusing the cached chart images (see reports.py)
+    with st.expander("PDF reports for all companies and students"):
+        report_kinds = st.multiselect("Reports", list(REPORT_KINDS), default=list(REPORT_KINDS),
+                                      format_func=REPORT_KINDS.get)
+        if st.button("Generate PDF reports"):
+            source = "AY " + ", ".join(sorted(selected_years)) if selected_years else PERFORMANCE_DATA_FILE
+            conn = init_db()
+            specs = build_specs(cube, conn, report_kinds, charts, version,
+                                subtitle=f"{source}, generated {time.strftime('%Y-%m-%d')}")
+            conn.close()
+            report_progress = st.progress(0.0)
+
+            def report_done(done, total, file_name):
+                report_progress.progress(done / total, text=f"{done}/{total}: {file_name}")
+
+            started = time.perf_counter()
+            archive = io.BytesIO()
+            generate_reports(specs, archive, progress_callback=report_done, chart_cache=charts, version=version)
+            # Kept for the download button, which reruns the script when clicked
+            st.session_state['report_archive'] = archive.getvalue()
+            st.caption(f"{len(specs)} reports in {time.perf_counter() - started:.1f}s")
+        if st.session_state.get('report_archive'):
+            st.download_button("Download reports (zip)", st.session_state['report_archive'],
+                               file_name="feedback_reports.zip", mime="application/zip")
 
 # Main app logic
 tab1, tab2 = st.tabs(["Feedback Summarization", "Performance Analysis"])
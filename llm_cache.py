@@ -0,0 +1,216 @@
+# llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from feedback_db import DATABASE_FILE
+
+# Cached responses older than this are treated as misses and removed
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Least recently used responses beyond this count are evicted
+DEFAULT_MAX_ENTRIES = 5000
+
+# Response metadata flag of a stand-in model's answers (see llm_client.LocalChatModel);
+# they are shown but never cached or stored as summaries
+PLACEHOLDER_KEY = "placeholder"
+
+
+def _llm_of(chain):
+    return getattr(chain, 'last', chain)
+
+
+def model_name(chain):
+    """
+    Returns the model name of the LLM at the end of a chain.
+    """
+    llm = _llm_of(chain)
+    return getattr(llm, 'model_name', type(llm).__name__)
+
+
+def prompt_cache_key(chain, input_data, model=None):
+    """
+    Hashes the fully rendered prompt together with the model name (the chain's
+    model unless `model` is given) and temperature, so the same request to the
+    same model always maps to the same entry.
+    """
+    prompt_template = getattr(chain, 'first', None)
+    if prompt_template is not None and hasattr(prompt_template, 'format'):
+        rendered = prompt_template.format(**input_data)
+    else:
+        rendered = json.dumps(input_data, sort_keys=True)
+    payload = json.dumps({
+        "prompt": rendered,
+        "model": model or model_name(chain),
+        "temperature": getattr(_llm_of(chain), 'temperature', None),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def answering_model(response, chain):
+    """
+    Returns the name of the model that wrote `response` (a message or chunk):
+    the one in its response metadata, which differs from the chain's model when
+    llm_client fell back to another one. None for a stand-in model's answer.
+    """
+    metadata = getattr(response, 'response_metadata', None) or {}
+    if metadata.get(PLACEHOLDER_KEY):
+        return None
+    return metadata.get('model_name') or model_name(chain)
+
+
+def summary_model(models):
+    """
+    Names the model that wrote a summary from the `models` list filled by the
+    cached_* functions, one entry per LLM call: several names are joined with
+    '+' when fallback models answered some of the calls. Returns None when a
+    stand-in model answered any of them, as such summaries must not be stored.
+    """
+    if not models or None in models:
+        return None
+    return "+".join(dict.fromkeys(models))
+
+
+def _cache_response(chain, input_data, cache, response, response_content, models):
+    # Stored under the model that answered, so a fallback answer is never served as the chain's own model's
+    model = answering_model(response, chain)
+    if models is not None:
+        models.append(model)
+    if cache is not None and model is not None:
+        cache[prompt_cache_key(chain, input_data, model)] = response_content
+
+
+class LLMCache:
+    """
+    Persistent cache of LLM responses stored in the SQLite database, with TTL
+    and size-based (least recently used) eviction. Safe to share between threads.
+    """
+
+    def __init__(self, db_file=DATABASE_FILE, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def __setitem__(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute("""
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+def _cached(chain, input_data, cache, models):
+    if cache is None:
+        return None
+    cached = cache.get(prompt_cache_key(chain, input_data))
+    if cached is not None and models is not None:
+        models.append(model_name(chain))
+    return cached
+
+
+def cached_invoke(chain, input_data, cache=None, models=None):
+    """
+    Invokes the chain, answering from `cache` (an LLMCache or any dict-like
+    object) when the same prompt was already sent to the same model.
+    `models` (a list), when given, receives the name of the model that answered
+    (see answering_model and summary_model).
+    """
+    cached = _cached(chain, input_data, cache, models)
+    if cached is not None:
+        return cached
+    response = chain.invoke(input_data)
+    response_content = getattr(response, 'content', str(response))
+    _cache_response(chain, input_data, cache, response, response_content, models)
+    return response_content
+
+
+async def acached_invoke(chain, input_data, cache=None, models=None):
+    """
+    Async version of cached_invoke, using the chain's `ainvoke`.
+    """
+    cached = _cached(chain, input_data, cache, models)
+    if cached is not None:
+        return cached
+    response = await chain.ainvoke(input_data)
+    response_content = getattr(response, 'content', str(response))
+    _cache_response(chain, input_data, cache, response, response_content, models)
+    return response_content
+
+
+def cached_stream(chain, input_data, cache=None, models=None):
+    """
+    Streaming version of cached_invoke: yields the response text chunk by chunk
+    as the LLM produces it. A cached response is yielded as a single chunk, and a
+    streamed response is cached once it is complete.
+    """
+    cached = _cached(chain, input_data, cache, models)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    first = None
+    for chunk in chain.stream(input_data):
+        # The answering model is named in the metadata of the first chunk
+        first = first if first is not None else chunk
+        text = getattr(chunk, 'content', str(chunk))
+        if text:
+            chunks.append(text)
+            yield text
+    _cache_response(chain, input_data, cache, first, "".join(chunks), models)
@@ -0,0 +1,348 @@
+# llm_client.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from llm_cache import PLACEHOLDER_KEY
+from metrics import record_llm_call
+from prompt_budget import estimate_tokens
+from rate_limits import RateLimiter, is_rate_limit_error, retry_after
+
+# Models tried in order: the first one that is within its quota and not
+# cooling down after an error answers. Set FEEDBACK_LLM_MODELS to a comma-separated
+# list to change them; 'local' is an offline stand-in that needs no API key.
+LLM_MODELS_VARIABLE = "FEEDBACK_LLM_MODELS"
+DEFAULT_MODELS = ["llama3-8b-8192", "llama3-70b-8192"]
+LOCAL_MODEL = "local"
+TEMPERATURE = 0.4
+
+# Per-call timeouts (seconds) and the HTTP connections kept open to the API, shared by all models
+REQUEST_TIMEOUT_SECONDS = 60.0
+CONNECT_TIMEOUT_SECONDS = 10.0
+MAX_CONNECTIONS = 16
+
+# Requests and tokens per minute allowed per model (Groq free tier); override for
+# every model with FEEDBACK_LLM_RPM and FEEDBACK_LLM_TPM
+MODEL_QUOTAS = {
+    "llama3-8b-8192": (30, 30000),
+    "llama3-70b-8192": (30, 6000),
+}
+DEFAULT_QUOTA = (30, 6000)
+
+# Tokens a completion is assumed to use when checking the token quota
+COMPLETION_TOKENS = 1000
+
+# Calls (across all models) before an error is raised; a failing model is skipped
+# for an exponentially growing time, or as long as its Retry-After asks
+DEFAULT_MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+LOCAL_RESPONSE = (
+    "This summary was written by the local stand-in model; no LLM was called. "
+    "Set GROQ_API_KEY and FEEDBACK_LLM_MODELS to generate real summaries."
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient_error(error):
+    """
+    True for errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses.
+    """
+    if is_rate_limit_error(error):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status >= 500 or status == 408
+    name = type(error).__name__.lower()
+    return isinstance(error, (TimeoutError, ConnectionError)) or 'timeout' in name or 'connection' in name
+
+
+def model_quota(name):
+    requests, tokens = MODEL_QUOTAS.get(name, DEFAULT_QUOTA)
+    return int(os.getenv("FEEDBACK_LLM_RPM", requests)), int(os.getenv("FEEDBACK_LLM_TPM", tokens))
+
+
+class ModelRoute:
+    """
+    One model behind the client: its request and token buckets (None for no
+    quota) and how long it is skipped after an error.
+    """
+
+    def __init__(self, name, model, quota=None):
+        self.name = name
+        self.model = model
+        self.requests = self.tokens = None
+        if quota is not None:
+            requests_per_minute, tokens_per_minute = quota
+            self.requests = RateLimiter(requests_per_minute / 60, requests_per_minute)
+            self.tokens = RateLimiter(tokens_per_minute / 60, tokens_per_minute)
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def reserve(self, tokens):
+        """
+        Takes one request and `tokens` tokens of the quota if both are available.
+        Returns 0, or the seconds until they are.
+        """
+        if self.requests is None:
+            return 0.0
+        wait = max(self.requests.wait_time(), self.tokens.wait_time(tokens))
+        if wait:
+            return wait
+        # Both are available (the router's lock keeps other callers out meanwhile)
+        self.requests.try_acquire()
+        self.tokens.try_acquire(tokens)
+        return 0.0
+
+
+class ModelRouter:
+    """
+    Picks the model for each call and tracks errors and latency per model. Safe to share between threads.
+    """
+
+    def __init__(self, routes, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.routes = routes
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+    def select(self, tokens):
+        """
+        Returns the first route that may take a call of `tokens` tokens now (its
+        quota is taken) and 0, or None and the seconds until one may.
+        """
+        with self._lock:
+            now = time.monotonic()
+            waits = []
+            for route in self.routes:
+                if route.cooldown_until > now:
+                    waits.append(route.cooldown_until - now)
+                    continue
+                wait = route.reserve(tokens)
+                if not wait:
+                    return route, 0.0
+                waits.append(wait)
+            return None, min(waits)
+
+    def succeeded(self, route, seconds):
+        record_llm_call(route.name, seconds)
+        with self._lock:
+            route.failures = 0
+
+    def failed(self, route, error, seconds):
+        """
+        Records a failed call. Returns whether it is worth retrying, in which case
+        the model is skipped until its backoff (or the server's Retry-After) has passed.
+        """
+        record_llm_call(route.name, seconds, failed=True)
+        if not is_transient_error(error):
+            return False
+        with self._lock:
+            route.failures += 1
+            delay = retry_after(error) or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (route.failures - 1))
+            route.cooldown_until = time.monotonic() + delay * random.uniform(1.0, 1.25)
+        logger.warning("%s failed (%s: %s); skipping it for %.1fs", route.name, type(error).__name__, error, delay)
+        return True
+
+
+def _prompt_tokens(messages):
+    return estimate_tokens("".join(str(message.content) for message in messages)) + COMPLETION_TOKENS
+
+
+def _answered_by(message, route):
+    # Names the model that answered, so it is cached and stored under that name (see llm_cache.answering_model)
+    return message.copy(update={"response_metadata": dict(message.response_metadata, model_name=route.name)})
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Chat model that spreads calls over several models (see ModelRouter): it
+    waits for the rate limits instead of hitting them, retries transient
+    errors with backoff, and falls back to the next model while one is
+    limited or failing. A streamed call is only retried before its first chunk.
+    `model_name` is the first model's; every answer names the model that wrote
+    it in its response metadata ('model_name').
+    """
+
+    router: Any
+    model_name: str
+    temperature: Optional[float] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self):
+        return "resilient"
+
+    def _route(self, messages):
+        tokens = _prompt_tokens(messages)
+        while True:
+            route, wait = self.router.select(tokens)
+            if route is not None:
+                return route
+            time.sleep(wait)
+
+    async def _aroute(self, messages):
+        tokens = _prompt_tokens(messages)
+        while True:
+            route, wait = self.router.select(tokens)
+            if route is not None:
+                return route
+            await asyncio.sleep(wait)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(1, self.router.max_attempts + 1):
+            route = self._route(messages)
+            started = time.perf_counter()
+            try:
+                message = route.model.invoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                if not self.router.failed(route, error, time.perf_counter() - started) or attempt == self.router.max_attempts:
+                    raise
+                continue
+            self.router.succeeded(route, time.perf_counter() - started)
+            return ChatResult(generations=[ChatGeneration(message=_answered_by(message, route))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(1, self.router.max_attempts + 1):
+            route = await self._aroute(messages)
+            started = time.perf_counter()
+            try:
+                message = await route.model.ainvoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                if not self.router.failed(route, error, time.perf_counter() - started) or attempt == self.router.max_attempts:
+                    raise
+                continue
+            self.router.succeeded(route, time.perf_counter() - started)
+            return ChatResult(generations=[ChatGeneration(message=_answered_by(message, route))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(1, self.router.max_attempts + 1):
+            route = self._route(messages)
+            started = time.perf_counter()
+            received = False
+            try:
+                for chunk in route.model.stream(messages, stop=stop, **kwargs):
+                    # Only the first chunk names the model; chunk metadata is concatenated when merged
+                    yield ChatGenerationChunk(message=chunk if received else _answered_by(chunk, route))
+                    received = True
+            except Exception as error:
+                retry = self.router.failed(route, error, time.perf_counter() - started)
+                if received or not retry or attempt == self.router.max_attempts:
+                    raise
+                continue
+            self.router.succeeded(route, time.perf_counter() - started)
+            return
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Offline stand-in model that answers every prompt with a fixed text, for
+    tests and demos without an API key. Its answers are flagged as placeholders
+    so they are never cached or stored as summaries.
+    """
+
+    model_name: str = LOCAL_MODEL
+    response: str = LOCAL_RESPONSE
+
+    @property
+    def _llm_type(self):
+        return LOCAL_MODEL
+
+    def _metadata(self):
+        return {"model_name": self.model_name, PLACEHOLDER_KEY: True}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = AIMessage(content=self.response, response_metadata=self._metadata())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content=self.response, response_metadata=self._metadata()))
+
+
+class _PerLoop:
+    """
+    Keeps one object per asyncio event loop, made on first use in that loop.
+    Pooled async connections only work in the loop that opened them, and
+    batch.py runs each batch in a new loop.
+    """
+
+    def __init__(self, make):
+        self._make = make
+        self._objects = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._objects:
+                self._objects[loop] = self._make()
+            return self._objects[loop]
+
+
+class _AsyncCompletions:
+    """
+    Stands in for AsyncGroq(...).chat.completions in ChatGroq, using the
+    running loop's client.
+    """
+
+    def __init__(self, make_client):
+        self._clients = _PerLoop(make_client)
+
+    def create(self, **kwargs):
+        return self._clients.get().chat.completions.create(**kwargs)
+
+
+def _groq_model(name, temperature, api_key, http_clients, timeout):
+    import groq
+    from langchain_groq import ChatGroq
+    http_client, async_http_clients = http_clients
+    # Retries are handled by ResilientChatModel, so neither Groq client may retry as well
+    return ChatGroq(
+        model_name=name, temperature=temperature, api_key=api_key, timeout=timeout, max_retries=0,
+        client=groq.Groq(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0).chat.completions,
+        async_client=_AsyncCompletions(lambda: groq.AsyncGroq(
+            api_key=api_key, http_client=async_http_clients.get(), timeout=timeout, max_retries=0,
+        )),
+    )
+
+
+def build_llm(models=None, temperature=TEMPERATURE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Returns a ResilientChatModel over the given model names (FEEDBACK_LLM_MODELS
+    by default). Groq models share one pool of keep-alive HTTP connections for
+    sync calls and one per event loop for async calls (batch.py).
+    Groq models are left out when GROQ_API_KEY is not set.
+    """
+    if models is None:
+        models = [name.strip() for name in os.getenv(LLM_MODELS_VARIABLE, ",".join(DEFAULT_MODELS)).split(",") if name.strip()]
+    api_key = os.getenv("GROQ_API_KEY")
+    routes, http_clients = [], None
+    for name in models:
+        if name == LOCAL_MODEL:
+            routes.append(ModelRoute(name, LocalChatModel()))
+            continue
+        if not api_key:
+            logger.warning("GROQ_API_KEY is not set; leaving out %s", name)
+            continue
+        if http_clients is None:
+            import httpx
+            timeout = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+            limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+            http_clients = (httpx.Client(timeout=timeout, limits=limits),
+                            _PerLoop(lambda: httpx.AsyncClient(timeout=timeout, limits=limits)))
+        routes.append(ModelRoute(name, _groq_model(name, temperature, api_key, http_clients, timeout), model_quota(name)))
+    if not routes:
+        raise ValueError(f"No LLM available: set GROQ_API_KEY, or add '{LOCAL_MODEL}' to {LLM_MODELS_VARIABLE}")
+    return ResilientChatModel(router=ModelRouter(routes, max_attempts), model_name=routes[0].name, temperature=temperature)
@@ -0,0 +1,188 @@
+# metrics.py
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# One JSON line per summary request; override with FEEDBACK_METRICS_FILE
+METRICS_FILE = os.getenv("FEEDBACK_METRICS_FILE", "metrics.jsonl")
+
+# Pipeline stages timed for each request, in pipeline order
+STAGES = ['ingest', 'filter', 'prompt_build', 'llm_call', 'render', 'post_process', 'db_save']
+
+# Estimated token counts recorded next to the stage timings
+TOKEN_FIELDS = ['prompt_tokens', 'completion_tokens', 'llm_calls']
+
+# Fields of a record that are labels or not worth aggregating
+_NOT_AGGREGATED = {'timestamp'}
+
+# Recent LLM calls kept in memory per process for the per-model latency stats
+MAX_LLM_CALLS = 2000
+
+logger = logging.getLogger(__name__)
+_write_lock = threading.Lock()
+_llm_calls = deque(maxlen=MAX_LLM_CALLS)
+_llm_calls_lock = threading.Lock()
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Adds the seconds spent in the `with` block to `timings[stage]`, so a stage
+    entered several times (e.g. one LLM call per chunk) accumulates.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def count_tokens(timings, prompt_tokens=0, completion_tokens=0, llm_calls=0):
+    timings['prompt_tokens'] = timings.get('prompt_tokens', 0) + prompt_tokens
+    timings['completion_tokens'] = timings.get('completion_tokens', 0) + completion_tokens
+    timings['llm_calls'] = timings.get('llm_calls', 0) + llm_calls
+
+
+def record_request(timings, path=METRICS_FILE, **labels):
+    """
+    Logs one request's timings and token counts as structured JSON and appends
+    them to the metrics file. `labels` (e.g. summary_type, app) are stored as is.
+    """
+    record = {"timestamp": round(time.time(), 3)}
+    record.update(labels)
+    record.update((key, round(value, 6) if isinstance(value, float) else value) for key, value in timings.items())
+    line = json.dumps(record, sort_keys=True, default=str)
+    logger.info("request metrics %s", line)
+    try:
+        with _write_lock, open(path, "a", encoding="utf-8") as metrics_file:
+            metrics_file.write(line + "\n")
+    except OSError as error:
+        # Metrics must never break a summary request
+        logger.warning("could not write metrics to %s: %s", path, error)
+    return record
+
+
+def record_llm_call(model, seconds, failed=False):
+    """
+    Records the latency of one LLM call (see llm_client.py); failed calls are
+    recorded as 'error_latency' so they do not skew the latency percentiles.
+    """
+    with _llm_calls_lock:
+        _llm_calls.append({"model": model, "error_latency" if failed else "latency": seconds})
+
+
+def llm_call_stats():
+    """
+    Returns aggregate() tables of the recent LLM calls of this process, one per model.
+    """
+    with _llm_calls_lock:
+        calls = list(_llm_calls)
+    return aggregate(calls, group_by='model')
+
+
+def load_records(path=METRICS_FILE, since=None):
+    """
+    Reads the metrics file, optionally keeping only records newer than the
+    `since` timestamp. Malformed lines are skipped.
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as metrics_file:
+        for line in metrics_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if since is None or record.get("timestamp", 0) >= since:
+                records.append(record)
+    return records
+
+
+def aggregate(records, group_by=None):
+    """
+    Computes count, p50, p95 and max of every numeric field. With `group_by`
+    (a label such as 'summary_type') returns one table per label value.
+    """
+    if group_by is not None:
+        groups = {}
+        for record in records:
+            groups.setdefault(str(record.get(group_by)), []).append(record)
+        return {name: aggregate(group) for name, group in groups.items()}
+
+    values = {}
+    for record in records:
+        for key, value in record.items():
+            if key not in _NOT_AGGREGATED and isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.setdefault(key, []).append(value)
+    order = {name: idx for idx, name in enumerate(STAGES + TOKEN_FIELDS)}
+    stats = {}
+    for key in sorted(values, key=lambda name: (order.get(name, len(order)), name)):
+        samples = np.asarray(values[key], dtype=float)
+        p50, p95 = np.percentile(samples, [50, 95])
+        stats[key] = {"count": len(samples), "p50": p50, "p95": p95, "max": samples.max()}
+    return stats
+
+
+def format_stats(stats):
+    """
+    Formats aggregate() output as an aligned text table.
+    """
+    width = max([len(key) for key in stats] + [6])
+    lines = [f"{'metric':<{width}}  {'count':>6}  {'p50':>10}  {'p95':>10}  {'max':>10}"]
+    for key, row in stats.items():
+        lines.append(f"{key:<{width}}  {row['count']:>6}  {row['p50']:>10.3f}  {row['p95']:>10.3f}  {row['max']:>10.3f}")
+    return "\n".join(lines)
+
+
+def render_sidebar(path=METRICS_FILE):
+    """
+    Shows the p50/p95 of recorded requests and of this process's LLM calls in
+    a sidebar expander of the Streamlit apps.
+    """
+    # Imported here so the metrics CLI runs without Streamlit
+    import streamlit as st
+    # Latency and token counts of recorded summary requests
+    with st.sidebar.expander("Request metrics (p50/p95)"):
+        request_stats = aggregate(load_records(path))
+        if request_stats:
+            st.code(format_stats(request_stats))
+        else:
+            st.write("No summary requests recorded yet.")
+        # Latency of this process's LLM calls per model, fallback models included
+        for llm_model, llm_stats in llm_call_stats().items():
+            st.caption(f"LLM calls to {llm_model}")
+            st.code(format_stats(llm_stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show p50/p95 latency and token counts of recorded summary requests.")
+    parser.add_argument("--file", default=METRICS_FILE, help="Metrics file written by the apps")
+    parser.add_argument("--days", type=float, help="Only include requests from the last N days")
+    parser.add_argument("--by", help="Group by a label, e.g. summary_type or app")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 24 * 60 * 60 if args.days else None
+    records = load_records(args.file, since)
+    if not records:
+        print(f"No requests recorded in {args.file}.")
+        return 1
+    print(f"{len(records)} requests")
+    if args.by:
+        for name, stats in aggregate(records, args.by).items():
+            print(f"\n{args.by} = {name}")
+            print(format_stats(stats))
+    else:
+        print(format_stats(aggregate(records)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,425 @@
+# notifications.py
+import argparse
+import csv
+import io
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import namedtuple
+from email.message import EmailMessage
+
+from dotenv import load_dotenv
+
+from feedback_db import DATABASE_FILE, init_db, save_contacts
+from rate_limits import RateLimiter
+
+# Notifications are sent through the SMTP server configured with these variables;
+# smtp_sink.py is a local stand-in for trying it out
+SMTP_HOST_VARIABLE = "SMTP_HOST"
+DEFAULT_SENDER = "feedback-system@localhost"
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+STATUSES = [PENDING, SENDING, SENT, FAILED]
+
+# Messages claimed from the queue and sent over one connection, and committed in one transaction
+DEFAULT_BATCH_SIZE = 50
+
+# Messages per second (sustained) and the burst allowed above it
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 20
+
+# Failed deliveries are retried with exponential backoff; a notification fails
+# for good after this many attempts or on a permanent (5xx) SMTP error
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 3600.0
+
+# A batch claimed by a dispatcher that died is taken over after this long
+CLAIM_TIMEOUT_SECONDS = 600.0
+
+# How often an idle background dispatcher looks for due notifications
+IDLE_POLL_SECONDS = 5.0
+
+# Who is notified for each entity type, and how the message starts
+GREETINGS = {
+    "company": (
+        "Internship feedback summary for {name}",
+        "Dear Industry Mentor,\n\nThank you for mentoring VIIT students at {name}. "
+        "Below is a summary of the feedback shared by your organisation.",
+    ),
+    "student": (
+        "Your internship feedback summary",
+        "Dear {name},\n\nBelow is a summary of the feedback your industry mentor gave on your internship.",
+    ),
+    "viit_mentor": (
+        "Industry feedback summary for your mentees",
+        "Dear {name},\n\nBelow is a summary of the industry feedback on the students you mentor.",
+    ),
+}
+
+# Contact types accepted in the contacts CSV, and the entity type they are stored as
+CONTACT_TYPES = {
+    "company": "company",
+    "student": "student",
+    "mentor": "viit_mentor",
+    "viit_mentor": "viit_mentor",
+}
+
+SIGNATURE = "\n\n--\nSent automatically by the VIIT Industry Feedback System."
+
+# A claimed notification ready to be sent
+Outgoing = namedtuple('Outgoing', ['id', 'recipient', 'subject', 'body', 'attempts'])
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    """
+    A message could not be delivered. Permanent errors (e.g. an unknown
+    mailbox) are not retried.
+    """
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def build_message(entity_type, name, summary_type, summary):
+    """
+    Returns the (subject, body) of the notification of one stored summary.
+    """
+    subject, greeting = GREETINGS[entity_type]
+    return subject.format(name=name), f"{greeting.format(name=name)}\n\n{summary_type}\n\n{summary.strip()}{SIGNATURE}"
+
+
+def read_contacts(csv_file):
+    """
+    Reads contacts from a CSV with the columns type (company, student or mentor),
+    name and email. Returns the records for save_contacts and the number of
+    rows skipped because of an unknown type or a missing name or email.
+    """
+    if isinstance(csv_file, bytes):
+        csv_file = io.StringIO(csv_file.decode("utf-8-sig"))
+    reader = csv.DictReader(csv_file)
+    fields = {field.strip().lower(): field for field in reader.fieldnames or []}
+    missing = [field for field in ("type", "name", "email") if field not in fields]
+    if missing:
+        raise ValueError(f"Contacts CSV lacks the column(s): {', '.join(missing)}")
+    records, skipped = [], 0
+    for row in reader:
+        contact_type = (row[fields["type"]] or "").strip().lower()
+        name, email = (row[fields["name"]] or "").strip(), (row[fields["email"]] or "").strip()
+        if contact_type not in CONTACT_TYPES or not name or "@" not in email:
+            skipped += 1
+            continue
+        records.append({"entity_type": CONTACT_TYPES[contact_type], "name": name, "email": email})
+    return records, skipped
+
+
+def queue_notifications(conn, since=None, entity_types=tuple(GREETINGS)):
+    """
+    Queues the latest summary of every company, student and VIIT mentor that
+    has a contact, once per summary and address, so running it again only adds
+    summaries generated since. With `since`, only summaries created at or after
+    that time are considered. Returns the number of notifications queued.
+    """
+    clauses, params = [f"e.entity_type IN ({', '.join('?' * len(entity_types))})"], list(entity_types)
+    if since is not None:
+        clauses.append("s.created_at >= ?")
+        params.append(since)
+    rows = conn.execute(f"""
+        SELECT s.id, s.summary_type, s.summary, e.entity_type, e.name, c.email
+        FROM summaries s
+        JOIN entities e ON e.id = s.entity_id
+        JOIN contacts c ON c.entity_id = s.entity_id
+        WHERE {" AND ".join(clauses)}
+          AND s.id = (SELECT latest.id FROM summaries latest
+                      WHERE latest.entity_id = s.entity_id AND latest.summary_type = s.summary_type
+                      ORDER BY latest.created_at DESC, latest.id DESC LIMIT 1)
+    """, params)
+    now = time.time()
+    with conn:
+        cursor = conn.executemany("""
+            INSERT OR IGNORE INTO notifications (summary_id, recipient, subject, body, status, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            (summary_id, email, *build_message(entity_type, name, summary_type, summary), PENDING, now, now)
+            for summary_id, summary_type, summary, entity_type, name, email in rows
+        ))
+    return max(cursor.rowcount, 0)
+
+
+def notification_counts(conn):
+    """
+    Returns the number of notifications per status.
+    """
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(conn.execute("SELECT status, COUNT(*) FROM notifications GROUP BY status").fetchall())
+    return counts
+
+
+def recent_failures(conn, limit=20):
+    return conn.execute("""
+        SELECT recipient, subject, attempts, last_error FROM notifications
+        WHERE status = ? ORDER BY id DESC LIMIT ?
+    """, (FAILED, limit)).fetchall()
+
+
+def retry_failed(conn):
+    """
+    Puts failed notifications back in the queue. Returns how many.
+    """
+    with conn:
+        return conn.execute("""
+            UPDATE notifications SET status = ?, attempts = 0, next_attempt_at = ? WHERE status = ?
+        """, (PENDING, time.time(), FAILED)).rowcount
+
+
+class SMTPTransport:
+    """
+    Sends messages over one SMTP connection, opened on the first message and
+    kept open for the following ones; it is reopened if the server drops it.
+    """
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        self._smtp = smtp
+
+    def send(self, message):
+        for attempt in range(2):
+            try:
+                if self._smtp is None:
+                    self._connect()
+                self._smtp.send_message(message)
+                return
+            except smtplib.SMTPServerDisconnected as error:
+                # Idle connections are closed by most servers; reconnect once
+                self._smtp = None
+                if attempt:
+                    raise DeliveryError(f"Connection lost: {error}") from error
+            except smtplib.SMTPRecipientsRefused as error:
+                codes = [code for code, _ in error.recipients.values()]
+                raise DeliveryError(f"Recipient refused: {error.recipients}", permanent=min(codes) >= 500) from error
+            except smtplib.SMTPResponseException as error:
+                raise DeliveryError(str(error), permanent=error.smtp_code >= 500) from error
+            except (OSError, smtplib.SMTPException) as error:
+                self.close()
+                raise DeliveryError(str(error)) from error
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (OSError, smtplib.SMTPException):
+            self._smtp.close()
+        self._smtp = None
+
+
+def transport_from_env():
+    """
+    Returns an SMTPTransport configured by SMTP_HOST, SMTP_PORT, SMTP_USERNAME,
+    SMTP_PASSWORD and SMTP_STARTTLS, or None when SMTP_HOST is not set.
+    """
+    load_dotenv()
+    host = os.getenv(SMTP_HOST_VARIABLE)
+    if not host:
+        return None
+    return SMTPTransport(
+        host, int(os.getenv("SMTP_PORT", "25")), os.getenv("SMTP_USERNAME"), os.getenv("SMTP_PASSWORD"),
+        os.getenv("SMTP_STARTTLS", "").lower() in ("1", "true", "yes"),
+    )
+
+
+class NotificationDispatcher:
+    """
+    Delivers queued notifications in batches: each batch is claimed in one
+    transaction, sent over the transport's open connection at no more than
+    `rate` messages per second, and its results are committed together.
+    Failed messages are retried later with exponential backoff. Several
+    dispatchers (e.g. one per process) can share a database.
+    """
+
+    def __init__(self, transport, db_file=DATABASE_FILE, sender=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.transport = transport
+        self.db_file = db_file
+        self.sender = sender or os.getenv("NOTIFY_SENDER", DEFAULT_SENDER)
+        self.limiter = RateLimiter(rate, burst)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _claim(self, conn):
+        claim, now = uuid.uuid4().hex, time.time()
+        with conn:
+            # Due pending notifications, and ones whose claim has expired
+            conn.execute("""
+                UPDATE notifications SET status = ?, claim = ?, attempts = attempts + 1, next_attempt_at = ?
+                WHERE id IN (SELECT id FROM notifications
+                             WHERE status IN (?, ?) AND next_attempt_at <= ?
+                             ORDER BY next_attempt_at, id LIMIT ?)
+            """, (SENDING, claim, now + CLAIM_TIMEOUT_SECONDS, PENDING, SENDING, now, self.batch_size))
+        return [Outgoing(*row) for row in conn.execute(
+            "SELECT id, recipient, subject, body, attempts FROM notifications WHERE claim = ? ORDER BY id", (claim,)
+        )]
+
+    def _email(self, outgoing):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = outgoing.recipient
+        message["Subject"] = outgoing.subject
+        message.set_content(outgoing.body)
+        return message
+
+    def _retry_delay(self, attempts):
+        return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1)) * random.uniform(1.0, 1.25)
+
+    def run_once(self, conn):
+        """
+        Claims and sends one batch of due notifications. Returns how many were claimed.
+        """
+        batch = self._claim(conn)
+        sent, retried, failed, released = [], [], [], []
+        for position, outgoing in enumerate(batch):
+            if not self.limiter.acquire(self._stop):
+                # Stopping: the rest of the batch goes back to the queue as it was
+                released = [(time.time(), rest.id) for rest in batch[position:]]
+                break
+            try:
+                self.transport.send(self._email(outgoing))
+            except DeliveryError as error:
+                logger.warning("notification %s to %s failed: %s", outgoing.id, outgoing.recipient, error)
+                if error.permanent or outgoing.attempts >= self.max_attempts:
+                    failed.append((FAILED, str(error), outgoing.id))
+                else:
+                    retried.append((PENDING, str(error), time.time() + self._retry_delay(outgoing.attempts), outgoing.id))
+            else:
+                sent.append((SENT, time.time(), outgoing.id))
+        with conn:
+            conn.executemany("UPDATE notifications SET status = ?, claim = NULL, last_error = NULL, sent_at = ? "
+                             "WHERE id = ?", sent)
+            conn.executemany("UPDATE notifications SET status = ?, claim = NULL, last_error = ?, next_attempt_at = ? "
+                             "WHERE id = ?", retried)
+            conn.executemany("UPDATE notifications SET status = ?, claim = NULL, last_error = ? WHERE id = ?", failed)
+            conn.executemany("UPDATE notifications SET status = ?, claim = NULL, attempts = attempts - 1, next_attempt_at = ? "
+                             "WHERE id = ?", [(PENDING, *row) for row in released])
+        return len(batch)
+
+    def drain(self):
+        """
+        Sends every due notification, then closes the connection. Returns the counts per status.
+        """
+        conn = init_db(self.db_file)
+        try:
+            while self.run_once(conn) and not self._stop.is_set():
+                pass
+            return notification_counts(conn)
+        finally:
+            self.transport.close()
+            conn.close()
+
+    # Background delivery, e.g. for the Streamlit app
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._work, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """
+        Makes the background thread look for due notifications now instead of at its next poll.
+        """
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _work(self):
+        conn = init_db(self.db_file)
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self.run_once(conn):
+                        continue
+                except Exception:
+                    logger.exception("notification dispatch failed")
+                # Nothing due: release the connection until there is
+                self.transport.close()
+                self._wake.wait(IDLE_POLL_SECONDS)
+                self._wake.clear()
+        finally:
+            self.transport.close()
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email stored summaries to companies, students and VIIT mentors.")
+    parser.add_argument("--db", default=DATABASE_FILE, help="SQLite database with the summaries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    contacts = commands.add_parser("contacts", help="Import email addresses from a CSV with type,name,email columns")
+    contacts.add_argument("csv_file")
+    queue = commands.add_parser("queue", help="Queue the latest summary of every entity with a contact")
+    queue.add_argument("--since-hours", type=float, help="Only summaries generated in the last N hours")
+    send = commands.add_parser("send", help=f"Send the queued notifications through {SMTP_HOST_VARIABLE}")
+    send.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Messages per second")
+    send.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    commands.add_parser("retry", help="Queue failed notifications again")
+    commands.add_parser("status", help="Count notifications per status")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    conn = init_db(args.db)
+    try:
+        if args.command == "contacts":
+            with open(args.csv_file, encoding="utf-8-sig", newline="") as csv_file:
+                records, skipped = read_contacts(csv_file)
+            print(f"Added {save_contacts(conn, records)} of {len(records)} contacts ({skipped} rows skipped).")
+        elif args.command == "queue":
+            since = time.time() - args.since_hours * 3600 if args.since_hours else None
+            print(f"Queued {queue_notifications(conn, since)} notifications.")
+        elif args.command == "send":
+            transport = transport_from_env()
+            if transport is None:
+                print(f"Set {SMTP_HOST_VARIABLE} (and SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD) to send notifications.")
+                return 1
+            started = time.perf_counter()
+            counts = NotificationDispatcher(transport, args.db, rate=args.rate, burst=max(1, int(args.rate)),
+                                            batch_size=args.batch_size).drain()
+            print(f"Done in {time.perf_counter() - started:.1f}s: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+        elif args.command == "retry":
+            print(f"Queued {retry_failed(conn)} failed notifications again.")
+        else:
+            for status, count in notification_counts(conn).items():
+                print(f"{status}: {count}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
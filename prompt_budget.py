@@ -0,0 +1,229 @@
+# prompt_budget.py
+import numpy as np
+import pandas as pd
+
+from feedback_nlp import TEXT_COLUMNS, label_counts, describe_labels
+from feedback_store import INDEXED_COLUMNS
+
+# Prompt budget for llama3-8b-8192, leaving room for the system messages and the completion
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Rough token estimate for English text (LLaMA tokenizers average ~4 characters per token)
+CHARS_PER_TOKEN = 4
+
+# Longest comment kept verbatim before it is truncated
+MAX_COMMENT_CHARS = 300
+
+# Text columns with at most this many distinct answers (e.g. Yes/No questions) are counted, not listed
+MAX_CATEGORY_VALUES = 8
+
+# Share of the data budget that name/mentor/email columns may use before comments
+NAME_BUDGET_SHARE = 0.3
+
+# Room reserved for the "(N more comments omitted)" note
+OMITTED_NOTE_TOKENS = 10
+
+SKIPPED_COLUMNS = {'timestamp'}
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of LLM tokens in `text`.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_name_column(column):
+    lowered = column.strip().lower()
+    return (
+        column.strip() in INDEXED_COLUMNS
+        or 'name' in lowered
+        or 'mentor' in lowered
+        or 'email' in lowered
+    )
+
+
+def _format_number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def _numeric_lines(column, values):
+    """
+    Pre-aggregates a numeric column into mean, range and rating distribution.
+    """
+    # Plain numpy keeps this cheap for the small per-entity slices built in batch mode
+    values = values.to_numpy(dtype=float)
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return []
+    line = (
+        f"- {column.strip()}: mean {_format_number(values.mean())}, "
+        f"min {_format_number(values.min())}, max {_format_number(values.max())}"
+    )
+    if np.array_equal(values, np.round(values)):
+        ratings, counts = np.unique(values.astype(int), return_counts=True)
+        if len(ratings) <= 10:
+            line += ", distribution " + ", ".join(f"{rating}: {count}" for rating, count in zip(ratings, counts))
+    return [line]
+
+
+def _category_lines(column, values):
+    counts = values.str.strip().str.capitalize().value_counts()
+    return [f"- {column.strip()}: " + ", ".join(f"{answer} ({count})" for answer, count in counts.items())]
+
+
+def _ranked_comments(values, by_frequency=True):
+    """
+    Deduplicates comments (ignoring case and spacing) and ranks them by how often
+    they occur, then by length, truncating long ones. With `by_frequency=False`
+    the comments keep the order of `values`.
+    """
+    cleaned = values.str.strip()
+    cleaned = cleaned[cleaned != '']
+    keys = cleaned.str.lower().str.split().str.join(' ')
+    grouped = pd.DataFrame({'text': cleaned, 'key': keys}).groupby('key', sort=False)
+    ranked = pd.DataFrame({
+        'text': grouped['text'].first(),
+        'count': grouped.size(),
+    })
+    ranked['length'] = ranked['text'].str.len()
+    if by_frequency:
+        ranked = ranked.sort_values(['count', 'length'], ascending=[False, False], kind='stable')
+    comments = []
+    for text, count in zip(ranked['text'], ranked['count']):
+        if len(text) > MAX_COMMENT_CHARS:
+            text = text[:MAX_COMMENT_CHARS].rstrip() + '...'
+        comments.append(f"  - {text}" + (f" (x{count})" if count > 1 else ''))
+    return comments
+
+
+def _line_tokens(line):
+    # A line's tokens plus its newline; summed over the lines this never undercounts the joined text
+    return estimate_tokens(line) + 1
+
+
+def _fill(lines, budget):
+    """
+    Takes lines in order until `budget` tokens are used; returns the kept lines,
+    the tokens they use and how many were left out.
+    """
+    kept = []
+    used = 0
+    for line in lines:
+        cost = _line_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept, used, len(lines) - len(kept)
+
+
+def _shorten_names(line, budget):
+    """
+    Keeps the leading whole names of a name line so it fits in `budget` tokens;
+    returns None when not even one fits.
+    """
+    label, _, listed = line[:max(budget - 3, 0) * CHARS_PER_TOKEN].partition(': ')
+    if ', ' not in listed:
+        # The only name left may be cut off
+        return None
+    return f"{label}: {listed.rsplit(', ', 1)[0]}, ..."
+
+
+def compact_feedback(feedback, token_budget, comment_rows=None):
+    """
+    Builds a compact text view of feedback rows (a dict of lists) that fits in
+    `token_budget` tokens, aggregates included. Returns the text, the number of
+    tokens it uses and how many aggregate lines and distinct comments had to be
+    left out to fit (long name lists are shortened, not counted).
+    With `comment_rows` (row positions, most relevant first) only the comments
+    of those rows are listed; aggregates and local labels still use every row.
+    """
+    df = pd.DataFrame(feedback)
+    stats = [f"Feedback rows: {len(df)}"]
+    names = []
+    comment_columns = []
+    for column in df.columns:
+        if column.strip().lower() in SKIPPED_COLUMNS:
+            continue
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            stats.extend(_numeric_lines(column, values))
+            continue
+        values = values.dropna().astype(str)
+        if values.empty:
+            continue
+        if _is_name_column(column):
+            counts = values.str.strip().value_counts()
+            names.append(f"- {column.strip()} ({len(counts)} unique): " + ", ".join(
+                f"{name} ({count})" if count > 1 else name for name, count in counts.items()
+            ))
+            continue
+        is_comment = values.str.strip().str.lower().nunique() > MAX_CATEGORY_VALUES
+        if is_comment and comment_rows is not None:
+            listed = df[column].iloc[comment_rows].dropna().astype(str)
+            comment_columns.append((column.strip(), _ranked_comments(listed, by_frequency=False)))
+        elif is_comment:
+            comment_columns.append((column.strip(), _ranked_comments(values)))
+        else:
+            stats.extend(_category_lines(column, values))
+        if is_comment or column.strip() in TEXT_COLUMNS:
+            # Sentiment and topics are classified locally; the LLM only gets the counts
+            stats.append(f"- {column.strip()} (local labels): {describe_labels(label_counts(values))}")
+
+    # Every section header is charged first and only emitted with at least one
+    # line under it. Aggregates come first; they are bounded by the number of
+    # columns, so only a very small budget cuts them short
+    text_lines = []
+    remaining = token_budget
+    header = "Aggregated ratings and answers:"
+    kept, used, omitted_total = _fill(stats, remaining - _line_tokens(header))
+    if kept:
+        text_lines += [header] + kept
+        remaining -= _line_tokens(header) + used
+
+    if names:
+        header = "People and organisations:"
+        name_budget = remaining - _line_tokens(header)
+        if comment_columns:
+            name_budget = int(name_budget * NAME_BUDGET_SHARE)
+        kept, used = [], 0
+        for line in names:
+            cost = _line_tokens(line)
+            if cost > name_budget - used:
+                # Too many names to list them all; keep the leading ones
+                line = _shorten_names(line, name_budget - used)
+                if line is None:
+                    continue
+                cost = _line_tokens(line)
+            kept.append(line)
+            used += cost
+        if kept:
+            text_lines += [header] + kept
+            remaining -= _line_tokens(header) + used
+
+    if comment_columns:
+        if comment_rows is not None:
+            header = f"Comments of the {len(comment_rows)} most representative rows (deduplicated, most representative first):"
+        else:
+            header = "Comments (deduplicated, most frequent first):"
+        available = remaining - _line_tokens(header)
+        blocks = []
+        # Share what is left between the comment columns, handing unused budget on to the next one
+        for position, (column, comments) in enumerate(comment_columns):
+            column_header = f"- {column}:"
+            column_budget = available // (len(comment_columns) - position)
+            kept, _, omitted = _fill(comments, column_budget - _line_tokens(column_header) - OMITTED_NOTE_TOKENS)
+            omitted_total += omitted
+            if not kept:
+                continue
+            block = [column_header] + kept
+            if omitted:
+                block.append(f"  ({omitted} more comments omitted)")
+            blocks += block
+            available -= sum(_line_tokens(line) for line in block)
+        if blocks:
+            text_lines += [header] + blocks
+
+    text = "\n".join(text_lines)
+    return text, estimate_tokens(text), omitted_total
@@ -1,31 +1,85 @@
 # prompts.py
 
 # prompts.py
+from feedback_store import FeedbackDataset, COMPANY_COLUMN, STUDENT_COLUMN, VIIT_MENTOR_COLUMN
+from prompt_budget import DEFAULT_TOKEN_BUDGET, compact_feedback, estimate_tokens
+from comment_search import RETRIEVAL_TOP_K, representative_rows
 
-def get_prompt(option, data_dict, additional_input=None):
+def get_prompt(option, data_dict, additional_input=None, token_budget=DEFAULT_TOKEN_BUDGET):
     """
     Generates a specific prompt based on the user's selected option and additional input.
+    `data_dict` may be a FeedbackDataset or a plain dict of lists.
     """
+    prompt, _ = build_prompt(option, data_dict, additional_input, token_budget)
+    return prompt
+
+def build_prompt(option, data_dict, additional_input=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Same as get_prompt, but also returns the estimated number of tokens the prompt uses.
+    """
+    prompt_template, feedback = get_prompt_template(option, data_dict, additional_input)
+    if prompt_template is None:
+        return None, 0
+    prompt = fit_feedback(prompt_template, feedback, token_budget, relevant_comment_rows(option, feedback))
+    return prompt, estimate_tokens(prompt)
+
+def get_prompt_template(option, data_dict, additional_input=None):
+    """
+    Returns the prompt for the selected option with a {feedback} slot, together
+    with the feedback rows (a dict of lists) that belong in that slot.
+    """
+    if not isinstance(data_dict, FeedbackDataset):
+        data_dict = FeedbackDataset.from_dict(data_dict)
     if option == "Overall Summary":
-        return overall_summary_prompt(data_dict)
+        return overall_summary_template(data_dict)
     elif option == "Company-wise Summary":
-        return company_summary_prompt(data_dict, additional_input)
+        return company_summary_template(data_dict, additional_input)
     elif option == "Student-wise Summary":
-        return student_summary_prompt(data_dict, additional_input)
+        return student_summary_template(data_dict, additional_input)
     elif option == "VIIT-Mentor-wise Summary":
-        return viit_mentor_summary_prompt(data_dict, additional_input)
+        return viit_mentor_summary_template(data_dict, additional_input)
+    return None, None
+
+def relevant_comment_rows(option, feedback, top_k=RETRIEVAL_TOP_K):
+    """
+    For a company, student or VIIT mentor summary with more than `top_k`
+    commented rows, returns the positions of the `top_k` rows whose comments
+    best represent the rest (found with the comment embeddings). Returns None
+    when every comment should be considered.
+    """
+    if option not in ("Company-wise Summary", "Student-wise Summary", "VIIT-Mentor-wise Summary"):
+        return None
+    return representative_rows(feedback, top_k)
+
+def fit_feedback(prompt_template, feedback, token_budget, comment_rows=None):
+    """
+    Replaces the {feedback} slot in `prompt_template` with a compact view of the
+    feedback rows, sized so the whole prompt stays within `token_budget` tokens.
+    `comment_rows` limits the listed comments to those rows (see relevant_comment_rows).
+    """
+    prompt, _ = compact_prompt(prompt_template, feedback, token_budget, comment_rows)
+    return prompt
+
+def compact_prompt(prompt_template, feedback, token_budget, comment_rows=None):
+    """
+    Same as fit_feedback, but also returns how many aggregate lines and comments
+    were left out to fit the budget (0 when the whole feedback fits).
+    """
+    overhead = estimate_tokens(prompt_template.replace("{feedback}", ""))
+    feedback_text, _, omitted = compact_feedback(feedback, token_budget - overhead, comment_rows)
+    return prompt_template.replace("{feedback}", feedback_text), omitted
     
-def overall_summary_prompt(data_dict):
-
-    company_names = data_dict['Name of The Company'] 
-    # Remove duplicates by converting the list to a set, then sort and join into a comma-separated string
-    unique_company_names = list(set(company_names))
-    student_names = data_dict['Name of The Student']
-    company_count=len(unique_company_names)
-    student_count=len(student_names)
+def overall_summary_prompt(data_dict, token_budget=DEFAULT_TOKEN_BUDGET):
+    return fit_feedback(*overall_summary_template(data_dict), token_budget)
+
+def overall_summary_template(data_dict):
+
+    # Unique company names come straight from the prebuilt company index
+    company_count = len(data_dict.names(COMPANY_COLUMN))
+    student_count = data_dict.num_rows
     prompt = f"""
     Provide a comprehensive overall summary based on the following internship feedback data:
-    {data_dict}
+    {{feedback}}
     You must not use or generate any data or text based on information outside of this provided context. Only refer to the data provided in this input.
 
     Ensure the output is structured and covers the following aspects:
@@ -39,31 +93,22 @@ def overall_summary_prompt(data_dict):
         - Mention any standout observations or trends in the feedback, if applicable.
 
     """
-    return prompt
+    return prompt, data_dict.to_dict()
 
-def company_summary_prompt(data_dict, company_name):
+def company_summary_prompt(data_dict, company_name, token_budget=DEFAULT_TOKEN_BUDGET):
     """
     Creates a company-wise summary prompt for the LLM.
     """
-    company_column = data_dict['Name of The Company']
-    
-    # Initialize a dictionary to hold filtered feedback data for the selected company
-    company_feedback = {key: [] for key in data_dict.keys()}
-    
-    # Iterate through each row and check if the company name matches
-    for idx, company in enumerate(company_column):
-        if company == company_name:
-            for key in data_dict.keys():
-                company_feedback[key].append(data_dict[key][idx])  # Append data for all matching rows
-    
-    # Count number of students working for the selected company
-    student_count = len(company_feedback['Name of The Student'])
-    # Join names of students working for the selected company into a comma-separated string
-    student_names = ', '.join(company_feedback['Name of The Student'])
+    return fit_feedback(*company_summary_template(data_dict, company_name), token_budget)
+
+def company_summary_template(data_dict, company_name):
+    # Slice only the rows for the selected company using the company index
+    company_feedback = data_dict.subset(COMPANY_COLUMN, company_name)
     
     prompt = f"""
     Provide a summary for the company '{company_name}' based on the following internship feedback data:
-    {company_feedback}
+    {data_dict.analytics.describe(COMPANY_COLUMN, company_name)}
+    {{feedback}}
     You must not use or generate any data or text based on information outside of this provided context. Only refer to the data provided in this input.
 
     Summarize strengths and weaknesses of interns working for this company.
@@ -78,50 +123,81 @@ def company_summary_prompt(data_dict, company_name):
     7. **Overall weaknesses:**
     8. **Overall Summary:**
     """
-    return prompt
+    return prompt, company_feedback
 
 
-def student_summary_prompt(data_dict, student_name):
+def student_summary_prompt(data_dict, student_name, token_budget=DEFAULT_TOKEN_BUDGET):
     """
     Creates a student-wise summary prompt for the LLM.
     """
-    student_column = data_dict['Name of The Student']
-    
-    # Filter rows where the student name matches
-    student_feedback = {key: [] for key in data_dict.keys()}
-    
-    for idx, student in enumerate(student_column):
-        if student == student_name:
-            for key in data_dict.keys():
-                student_feedback[key].append(data_dict[key][idx])
+    return fit_feedback(*student_summary_template(data_dict, student_name), token_budget)
+
+def student_summary_template(data_dict, student_name):
+    # Slice only the rows for the selected student using the student index
+    student_feedback = data_dict.subset(STUDENT_COLUMN, student_name)
     
     prompt = f"""
     Provide a summary for the student '{student_name}' based on the following internship feedback data:
-    {student_feedback}
+    {data_dict.analytics.describe(STUDENT_COLUMN, student_name)}
+    {{feedback}}
     Summarize the student's performance, strengths, and areas for improvement.
     """
-    return prompt
+    return prompt, student_feedback
 
-def viit_mentor_summary_prompt(data_dict, mentor_name):
+def viit_mentor_summary_prompt(data_dict, mentor_name, token_budget=DEFAULT_TOKEN_BUDGET):
     """
     Creates a VIIT-Mentor-wise summary prompt for the LLM.
     """
-    mentor_column = data_dict['Faculty Mentor from VIIT ']
-    
-    # Filter rows where the mentor name matches
-    mentor_feedback = {key: [] for key in data_dict.keys()}
-    
-    for idx, mentor in enumerate(mentor_column):
-        if mentor == mentor_name:
-            for key in data_dict.keys():
-                mentor_feedback[key].append(data_dict[key][idx])
+    return fit_feedback(*viit_mentor_summary_template(data_dict, mentor_name), token_budget)
+
+def viit_mentor_summary_template(data_dict, mentor_name):
+    # Slice only the rows for the selected mentor using the VIIT mentor index
+    mentor_feedback = data_dict.subset(VIIT_MENTOR_COLUMN, mentor_name)
     
     prompt = f"""
     Provide a summary for the VIIT Mentor '{mentor_name}' based on the following internship feedback data:
-    {mentor_feedback}
+    {data_dict.analytics.describe(VIIT_MENTOR_COLUMN, mentor_name)}
+    {{feedback}}
     Summarize the mentor's involvement, feedback, and performance trends across students they supervised.
     """
-    return prompt
+    return prompt, mentor_feedback
+
+def chunk_summary_prompt(feedback, subject, part, total_parts, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Creates the map-step prompt that summarizes one chunk of a large upload.
+    """
+    prompt = f"""
+    The internship feedback data for {subject} is too large to read at once, so it has been split into {total_parts} parts.
+    This is part {part} of {total_parts}:
+    {{feedback}}
+    You must not use or generate any data or text based on information outside of this provided context. Only refer to the data provided in this input.
+
+    Write a concise partial summary of this part. Keep the counts of students and companies, the average ratings,
+    the names that appear, the strengths and weaknesses mentioned, and any standout comments, so that it can later be merged with the other parts.
+    """
+    return fit_feedback(prompt, feedback, token_budget)
+
+def merge_summaries_prompt(partial_summaries, subject):
+    """
+    Creates the intermediate reduce-step prompt that merges several partial summaries into one.
+    """
+    joined = "\n\n".join(f"Partial summary {idx + 1}:\n{summary}" for idx, summary in enumerate(partial_summaries))
+    return f"""
+    The following are partial summaries of the internship feedback data for {subject}:
+    {joined}
+    You must not use or generate any data or text based on information outside of this provided context. Only refer to the data provided in this input.
+
+    Merge them into a single partial summary. Add up counts, keep the names that appear, combine average ratings
+    and keep the common strengths, weaknesses and standout comments.
+    """
+
+def reduce_summary_prompt(prompt_template, partial_summaries):
+    """
+    Creates the final reduce-step prompt: the selected option's own prompt, with the
+    partial summaries in place of the feedback rows.
+    """
+    joined = "\n\n".join(f"Partial summary {idx + 1}:\n{summary}" for idx, summary in enumerate(partial_summaries))
+    return prompt_template.replace("{feedback}", "(summarized in parts)\n" + joined)
 
 
 
@@ -0,0 +1,73 @@
+# rate_limits.py
+import threading
+import time
+
+
+def is_rate_limit_error(error):
+    """
+    True for HTTP 429 / rate-limit errors raised by the Groq client.
+    """
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or 'ratelimit' in type(error).__name__.lower() or 'rate limit' in str(error).lower()
+
+
+def retry_after(error):
+    """
+    Returns the seconds the server asked to wait (Retry-After header), or None.
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket: allows `rate` tokens per second on average (one per call by
+    default) and bursts of up to `burst`. Safe to share between threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount=1):
+        """
+        Returns the seconds until `amount` tokens are available (0 if they are now).
+        More than `burst` tokens count as a full bucket.
+        """
+        with self._lock:
+            self._refill()
+            return max(0.0, min(amount, self.burst) - self._tokens) / self.rate
+
+    def try_acquire(self, amount=1):
+        """
+        Takes `amount` tokens if they are available now. Returns whether it did.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < min(amount, self.burst):
+                return False
+            self._tokens -= min(amount, self.burst)
+            return True
+
+    def acquire(self, stop=None, amount=1):
+        """
+        Blocks until `amount` tokens are available. Returns False if the `stop` Event is set first.
+        """
+        while not self.try_acquire(amount):
+            wait = self.wait_time(amount)
+            if stop is None:
+                time.sleep(wait)
+            elif stop.wait(wait):
+                return False
+        return True
@@ -0,0 +1,231 @@
+# reports.py
+import argparse
+import io
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from charts import Chart, skill_bar_chart, student_pie_chart
+from feedback_db import DATABASE_FILE, init_db, latest_summaries
+from feedback_store import COMPANY_COLUMN, STUDENT_COLUMN
+from analytics import OVERALL_PERFORMANCE
+
+# Reports rendered at the same time; charts and PDF layout are CPU-bound, so one process per core
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Reports handed to a worker process at a time
+CHUNK_SIZE = 4
+
+# Charts in a report are this wide on an A4 page (mm)
+CHART_WIDTH = 170
+
+# Report kinds and how they are labelled
+REPORT_KINDS = {'company': 'Companies', 'student': 'Students'}
+
+NO_SUMMARY = "No summary has been generated yet. Run batch mode to generate the summaries of all companies and students."
+
+# What goes into one PDF. `charts` maps a chart name to its PNG bytes when it
+# is already cached, or to the values to draw it from (a Series) when not;
+# `table` is a list of (label, value) rows, the first being the header.
+ReportSpec = namedtuple('ReportSpec', ['file_name', 'name', 'title', 'subtitle', 'figures', 'summary', 'charts', 'table'])
+
+# A finished PDF, and the charts drawn for it (chart name -> PNG) so they can be cached
+RenderedReport = namedtuple('RenderedReport', ['file_name', 'name', 'pdf', 'charts'])
+
+# Characters the built-in PDF fonts (Latin-1) lack, and their replacements
+_REPLACEMENTS = str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"', '–': '-', '—': '-', '•': '-', '…': '...', ' ': ' '})
+
+
+def _latin1(text):
+    return str(text).translate(_REPLACEMENTS).encode('latin-1', 'replace').decode('latin-1')
+
+
+def _file_name(folder, name, taken):
+    base = re.sub(r'[^\w\- .]+', '_', str(name)).strip(' ._') or 'report'
+    file_name, count = f"{folder}/{base}.pdf", 1
+    while file_name in taken:
+        count += 1
+        file_name = f"{folder}/{base} ({count}).pdf"
+    taken.add(file_name)
+    return file_name
+
+
+def build_specs(cube, summary_conn, kinds=tuple(REPORT_KINDS), chart_cache=None, version=None, subtitle=''):
+    """
+    Collects what each company and student report shows: key figures from the
+    AnalyticsCube, the stored LLM summary and the skill charts. Charts already
+    in `chart_cache` (keyed like the Performance Analysis tab's matplotlib
+    charts, under `version`) are reused instead of drawn again.
+    """
+    specs, taken = [], set()
+
+    def chart(name, kind, values):
+        cached = chart_cache.get((version, name, kind, 'matplotlib')) if chart_cache is not None else None
+        return cached.payload if cached is not None else values
+
+    if 'company' in kinds:
+        summaries = latest_summaries(summary_conn, "Company-wise Summary")
+        for company in cube.names(COMPANY_COLUMN):
+            stats = cube.stats(COMPANY_COLUMN, company)
+            students = cube.student_performance(company).astype(float)
+            specs.append(ReportSpec(
+                _file_name('companies', company, taken), company, f"Industry Feedback Report: {company}", subtitle,
+                cube.describe(COMPANY_COLUMN, company).splitlines()[1:], summaries.get(company, NO_SUMMARY),
+                {'skills': chart(company, 'skills', stats[cube.skill_columns].astype(float)),
+                 'students': chart(company, 'students', students)},
+                [('Student', OVERALL_PERFORMANCE)]
+                + [(student, f"{rating:.2f}") for student, rating in students.sort_values(ascending=False).items()],
+            ))
+    if 'student' in kinds:
+        summaries = latest_summaries(summary_conn, "Student-wise Summary")
+        for student in cube.names(STUDENT_COLUMN):
+            stats = cube.stats(STUDENT_COLUMN, student)
+            specs.append(ReportSpec(
+                _file_name('students', student, taken), student, f"Internship Feedback Report: {student}", subtitle,
+                [f"- Company: {', '.join(cube.companies_of(student)) or 'unknown'}"]
+                + cube.describe(STUDENT_COLUMN, student).splitlines()[1:],
+                summaries.get(student, NO_SUMMARY),
+                {'student_skills': chart(student, 'student_skills', stats[cube.skill_columns].astype(float))},
+                [('Skill', 'Rating')]
+                + [(skill, f"{rating:.2f}") for skill, rating in stats[cube.skill_columns].astype(float).dropna().items()]
+                + [(OVERALL_PERFORMANCE, f"{stats[OVERALL_PERFORMANCE]:.2f}")],
+            ))
+    return specs
+
+
+def _chart_png(name, values):
+    if name == 'students':
+        return student_pie_chart(values, 'matplotlib').payload
+    title = 'Skill Ratings' if name == 'student_skills' else 'Average Skills Across Students'
+    return skill_bar_chart(values, 'matplotlib', title).payload
+
+
+def _write_markdown(pdf, text):
+    # Summaries are markdown; headings and **bold** lines are set in bold, bullets indented
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            pdf.ln(2)
+            continue
+        bold = stripped.startswith('#') or (stripped.startswith('**') and stripped.endswith(('**', ':')))
+        bullet = stripped[:2] in ('- ', '* ', '• ')
+        stripped = stripped.lstrip('#').replace('**', '').strip()
+        pdf.set_font('Helvetica', 'B' if bold else '', 10)
+        if bullet:
+            pdf.set_x(pdf.l_margin + 5)
+            stripped = '- ' + stripped[2:].strip()
+        pdf.multi_cell(0, 5, _latin1(stripped), new_x='LMARGIN', new_y='NEXT')
+
+
+def render_report(spec):
+    """
+    Draws the charts a report still needs and lays out its PDF. Runs in a worker process.
+    """
+    from fpdf import FPDF
+
+    rendered = {name: _chart_png(name, values) for name, values in spec.charts.items() if not isinstance(values, bytes)}
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 16)
+    pdf.multi_cell(0, 8, _latin1(spec.title), new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 9)
+    pdf.cell(0, 6, _latin1(spec.subtitle), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(3)
+
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 7, 'Key figures (dataset average in parentheses)', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 10)
+    for line in spec.figures:
+        pdf.multi_cell(0, 5, _latin1(line), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(3)
+
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 7, 'Summary', new_x='LMARGIN', new_y='NEXT')
+    _write_markdown(pdf, spec.summary)
+
+    for name, values in spec.charts.items():
+        pdf.add_page()
+        pdf.image(io.BytesIO(rendered.get(name, values)), w=CHART_WIDTH)
+
+    if spec.table:
+        pdf.ln(4)
+        # The first row is the header
+        pdf.set_font('Helvetica', 'B', 10)
+        for label, value in spec.table:
+            pdf.cell(140, 6, _latin1(label), border=1)
+            pdf.cell(30, 6, value, border=1, align='R', new_x='LMARGIN', new_y='NEXT')
+            pdf.set_font('Helvetica', '', 10)
+    return RenderedReport(spec.file_name, spec.name, bytes(pdf.output()), rendered)
+
+
+def generate_reports(specs, output, workers=DEFAULT_WORKERS, progress_callback=None, chart_cache=None, version=None):
+    """
+    Renders the reports on a pool of `workers` processes and writes each PDF
+    into the zip `output` (a path or binary file) as soon as it is finished,
+    so only the PDFs in flight are held in memory. Charts drawn on the way are
+    added to `chart_cache` for the next run and the Performance Analysis tab.
+    """
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        def add(report):
+            # PDF streams and PNGs are compressed already, so the zip only stores them
+            archive.writestr(report.file_name, report.pdf)
+            if chart_cache is not None:
+                for kind, png in report.charts.items():
+                    chart_cache.put((version, report.name, kind, 'matplotlib'), Chart('image', png))
+            if progress_callback is not None:
+                progress_callback(len(archive.filelist), len(specs), report.file_name)
+
+        if workers <= 1 or len(specs) <= CHUNK_SIZE:
+            for spec in specs:
+                add(render_report(spec))
+            return
+        # spawn, not fork: forking a multi-threaded process (like the Streamlit server) can deadlock
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            chunks = [specs[start:start + CHUNK_SIZE] for start in range(0, len(specs), CHUNK_SIZE)]
+            for future in as_completed([pool.submit(_render_chunk, chunk) for chunk in chunks]):
+                for report in future.result():
+                    add(report)
+
+
+def _render_chunk(specs):
+    return [render_report(spec) for spec in specs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a PDF report for every company and student into a zip file.")
+    parser.add_argument("csv_file", nargs="?", help="Feedback CSV export (default: the academic years in the catalog)")
+    parser.add_argument("--years", nargs="+", help="Catalog academic years to cover (default: all)")
+    parser.add_argument("--only", choices=list(REPORT_KINDS), help="Only company or only student reports")
+    parser.add_argument("--out", default="feedback_reports.zip", help="Zip file to write")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--db", default=DATABASE_FILE, help="SQLite database with the stored summaries")
+    args = parser.parse_args()
+
+    from analytics import AnalyticsCube
+    if args.csv_file:
+        from ingest import read_feedback_csv
+        cube, source = AnalyticsCube(read_feedback_csv(args.csv_file)[0]), os.path.basename(args.csv_file)
+    else:
+        from catalog import FeedbackCatalog
+        catalog = FeedbackCatalog()
+        years = args.years or catalog.years()
+        cube, source = AnalyticsCube(catalog.load(years)[0]), "AY " + ", ".join(sorted(years))
+
+    started = time.perf_counter()
+    conn = init_db(args.db)
+    try:
+        specs = build_specs(cube, conn, [args.only] if args.only else tuple(REPORT_KINDS),
+                            subtitle=f"{source}, generated {time.strftime('%Y-%m-%d')}")
+    finally:
+        conn.close()
+    generate_reports(specs, args.out, args.workers)
+    print(f"Wrote {len(specs)} reports to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
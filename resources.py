@@ -0,0 +1,171 @@
+# resources.py
+import hashlib
+import io
+import os
+
+import streamlit as st
+from dotenv import load_dotenv
+
+from feedback_db import DATABASE_FILE
+from analytics import AnalyticsCube
+from catalog import FeedbackCatalog
+from charts import ChartCache
+from feedback_store import FeedbackDataset
+from ingest import read_feedback_csv
+from prompts import build_prompt
+from llm_cache import LLMCache
+from notifications import NotificationDispatcher, transport_from_env
+from summarizer import build_chain
+
+# Parsed uploads kept in memory; the least recently used are dropped first
+MAX_CACHED_DATASETS = 8
+
+# Prompt sizes shown before a summary is generated, per dataset, summary type and entity
+MAX_CACHED_PROMPT_SIZES = 256
+
+# Load environment variables for API key
+load_dotenv()
+
+
+# Process-wide LLM client, created once instead of on every rerun: pooled connections,
+# rate limits, retries and fallback models (see llm_client.py)
+@st.cache_resource
+def get_llm():
+    from llm_client import build_llm
+    return build_llm()
+
+
+# Prompt template connected to the shared LLM client
+@st.cache_resource
+def get_chain():
+    return build_chain(get_llm())
+
+
+# Persistent LLM response cache shared by every session of this process
+@st.cache_resource
+def get_llm_cache(db_file=DATABASE_FILE):
+    return LLMCache(db_file)
+
+
+# Rendered analytics charts shared by every session of this process
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
+
+
+# Background thread emailing queued notifications; None when no SMTP server is configured
+@st.cache_resource
+def get_notification_dispatcher(db_file=DATABASE_FILE):
+    transport = transport_from_env()
+    if transport is None:
+        return None
+    dispatcher = NotificationDispatcher(transport, db_file)
+    dispatcher.start()
+    return dispatcher
+
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def _parse_dataset(content_hash, _content):
+    # Keyed on the content hash only; the leading underscore stops Streamlit hashing the bytes again
+    return FeedbackDataset(*read_feedback_csv(io.BytesIO(_content)))
+
+
+def upload_hash(uploaded_file):
+    """
+    Returns the SHA-256 of an uploaded file, computed once per upload and session.
+    """
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return hashes[uploaded_file.file_id]
+
+
+def load_feedback_dataset(uploaded_file):
+    """
+    Returns the indexed dataset for an upload. The same file content is parsed
+    only once per process, however often the script reruns or who uploads it.
+    """
+    return _parse_dataset(upload_hash(uploaded_file), uploaded_file.getvalue())
+
+
+@st.cache_resource
+def _build_analytics(path, modified_time):
+    return AnalyticsCube(read_feedback_csv(path)[0])
+
+
+def analytics_version(path):
+    """
+    Identifies the version of a CSV on disk; cached analytics and charts are keyed on it.
+    """
+    return (path, os.path.getmtime(path))
+
+
+def load_analytics(path):
+    """
+    Returns the AnalyticsCube for a CSV on disk, rebuilt only when the file changes.
+    """
+    return _build_analytics(*analytics_version(path))
+
+
+# Feedback exports of several academic years, stored once as Parquet (see catalog.py)
+@st.cache_resource
+def get_catalog():
+    return FeedbackCatalog()
+
+
+def catalog_version(years):
+    """
+    Identifies the stored content of the selected academic years; cached datasets,
+    analytics and charts of the catalog are keyed on it.
+    """
+    years = tuple(sorted(years))
+    return ('catalog', years, get_catalog().content_hash(years))
+
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def _load_catalog_dataset(version):
+    return FeedbackDataset(*get_catalog().load(version[1]))
+
+
+def load_catalog_dataset(years):
+    """
+    Returns the indexed dataset of the selected academic years, loaded from
+    Parquet once and reloaded only when one of the years is replaced.
+    """
+    return _load_catalog_dataset(catalog_version(years))
+
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def _build_catalog_analytics(version):
+    return AnalyticsCube(get_catalog().load(version[1])[0])
+
+
+def load_catalog_analytics(years):
+    """
+    Returns the AnalyticsCube of the selected academic years.
+    """
+    return _build_catalog_analytics(catalog_version(years))
+
+
+@st.cache_data(max_entries=MAX_CACHED_PROMPT_SIZES)
+def prompt_size(dataset_hash, summary_option, name, _dataset):
+    """
+    Returns the estimated tokens of the prompt for a summary, built once per
+    dataset content hash, summary type and entity instead of on every rerun.
+    """
+    return build_prompt(summary_option, _dataset, name)[1]
+
+
+def clear_caches():
+    """
+    Drops cached datasets, CSVs, charts and the LLM client and chain; they are rebuilt on next use.
+    """
+    _parse_dataset.clear()
+    _build_analytics.clear()
+    _load_catalog_dataset.clear()
+    _build_catalog_analytics.clear()
+    prompt_size.clear()
+    get_chart_cache().clear()
+    get_chain.clear()
+    get_llm.clear()
+    st.session_state.pop('upload_hashes', None)
@@ -0,0 +1,400 @@
+# service.py
+import argparse
+import io
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+from dotenv import load_dotenv
+
+from batch import BATCH_OPTIONS, job_fingerprint
+from feedback_db import DATABASE_FILE, init_db, save_dataset, save_summary, latest_summary, text_hash
+from feedback_store import FeedbackDataset
+from ingest import read_feedback_csv, report_warnings
+from llm_cache import LLMCache, model_name, summary_model
+from metrics import stage_timer, record_request, load_records, aggregate
+from prompts import build_prompt
+from summarizer import build_chain, summarize_feedback, DEFAULT_MAX_CONCURRENCY
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+DEFAULT_WORKERS = 4
+
+# Set this in the Streamlit apps' environment to send summaries to the service
+SERVICE_URL_VARIABLE = "FEEDBACK_SERVICE_URL"
+
+SUMMARY_OPTIONS = ["Overall Summary"] + list(BATCH_OPTIONS)
+
+# Parsed uploads and finished jobs kept in memory; the oldest are dropped first
+MAX_DATASETS = 8
+MAX_FINISHED_JOBS = 500
+
+# Seconds between status requests while a front end waits for a job
+POLL_SECONDS = 0.5
+
+# Largest CSV accepted by POST /datasets
+MAX_UPLOAD_BYTES = 200 * 2 ** 20
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryService:
+    """
+    Runs summary jobs on a pool of worker threads, independent of any
+    Streamlit session. Datasets are registered once by content hash; jobs are
+    queued and polled by id. Finished summaries are stored in the database,
+    and a summary of unchanged rows is answered from it without an LLM call.
+    """
+
+    def __init__(self, chain, db_file=DATABASE_FILE, workers=DEFAULT_WORKERS,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, cache=None):
+        self.chain = chain
+        self.db_file = db_file
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._datasets = OrderedDict()
+        self._jobs = OrderedDict()
+        self._threads = []
+
+    def start(self):
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"summary-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # Datasets
+
+    def add_dataset(self, content, name=None):
+        """
+        Parses and registers a CSV upload. Returns its id (the SHA-256 of the content).
+        """
+        dataset_id = text_hash(content)
+        with self._lock:
+            if dataset_id in self._datasets:
+                self._datasets.move_to_end(dataset_id)
+                return dataset_id
+        dataset = FeedbackDataset(*read_feedback_csv(io.BytesIO(content)))
+        with self._lock:
+            self._datasets[dataset_id] = (dataset, name)
+            while len(self._datasets) > MAX_DATASETS:
+                self._datasets.popitem(last=False)
+        return dataset_id
+
+    def dataset(self, dataset_id):
+        """
+        Returns the (FeedbackDataset, file name) registered under `dataset_id`, or (None, None).
+        """
+        with self._lock:
+            return self._datasets.get(dataset_id, (None, None))
+
+    def describe_dataset(self, dataset_id):
+        dataset, name = self.dataset(dataset_id)
+        if dataset is None:
+            return None
+        return {
+            "dataset_id": dataset_id,
+            "name": name,
+            "rows": dataset.num_rows,
+            "warnings": report_warnings(dataset.ingest_report) if dataset.ingest_report else [],
+            "names": {option: dataset.names(column) for option, column in BATCH_OPTIONS.items()},
+        }
+
+    # Jobs
+
+    def submit(self, dataset_id, summary_type, name=None, regenerate=False):
+        """
+        Queues a summary job and returns its id. Raises KeyError for an unknown
+        dataset and ValueError for an unknown summary type.
+        """
+        if self.dataset(dataset_id)[0] is None:
+            raise KeyError(dataset_id)
+        if summary_type not in SUMMARY_OPTIONS:
+            raise ValueError(f"Unknown summary type {summary_type!r}")
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "dataset_id": dataset_id,
+            "summary_type": summary_type,
+            "name": name,
+            "regenerate": bool(regenerate),
+            "status": QUEUED,
+            "progress": None,
+            "text": "",
+            "summary": None,
+            "error": None,
+            "from_store": False,
+            "timings": {},
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._queue.put(job_id)
+        return job_id
+
+    def job(self, job_id):
+        """
+        Returns a snapshot of a job, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, timings=dict(job["timings"]))
+        snapshot["queue_position"] = self._queue_position(job_id) if snapshot["status"] == QUEUED else None
+        return snapshot
+
+    def _queue_position(self, job_id):
+        with self._queue.mutex:
+            pending = list(self._queue.queue)
+        return pending.index(job_id) + 1 if job_id in pending else None
+
+    def status(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            datasets = len(self._datasets)
+        return {"workers": len(self._threads), "datasets": datasets, "jobs": counts}
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _forget_old_jobs(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (DONE, FAILED)]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+
+    def _work(self):
+        # Each worker has its own SQLite connection
+        conn = init_db(self.db_file)
+        try:
+            while True:
+                job_id = self._queue.get()
+                if job_id is None:
+                    return
+                try:
+                    self._run(conn, job_id)
+                except Exception as error:
+                    logger.exception("summary job %s failed", job_id)
+                    self._update(job_id, status=FAILED, error=str(error), finished_at=time.time())
+                self._forget_old_jobs()
+        finally:
+            conn.close()
+
+    def _run(self, conn, job_id):
+        job = self.job(job_id)
+        dataset, file_name = self.dataset(job["dataset_id"])
+        if dataset is None:
+            raise KeyError(f"Dataset {job['dataset_id']} is no longer loaded; upload it again")
+        self._update(job_id, status=RUNNING, started_at=time.time())
+        option, name = job["summary_type"], job["name"]
+        fingerprint = job_fingerprint(dataset, option, name)
+
+        stored = None if job["regenerate"] else latest_summary(conn, option, name, fingerprint, model_name(self.chain))
+        if stored is not None:
+            self._update(job_id, status=DONE, summary=stored["summary"], text=stored["summary"],
+                         from_store=True, finished_at=time.time())
+            return
+
+        timings = {}
+
+        def on_text(text):
+            self._update(job_id, text=text)
+
+        def on_progress(stage, done, total):
+            self._update(job_id, progress={"stage": stage, "done": done, "total": total})
+
+        models = []
+        summary = summarize_feedback(
+            self.chain, option, dataset, name,
+            max_concurrency=self.max_concurrency, cache=self.cache,
+            progress_callback=on_progress, on_text=on_text, timings=timings, models=models,
+        )
+        # Stored under the model that answered; a stand-in model's summary is not stored
+        model = summary_model(models)
+        if model is not None:
+            prompt_text, _ = build_prompt(option, dataset, name)
+            with stage_timer(timings, 'db_save'):
+                dataset_id = save_dataset(conn, job["dataset_id"], file_name, dataset.num_rows)
+                save_summary(conn, option, name or "All", summary, model=model, prompt_hash=text_hash(prompt_text),
+                             dataset_id=dataset_id, fingerprint=fingerprint)
+        record_request(timings, app="service", summary_type=option, entity=name or "All", model=model)
+        self._update(job_id, status=DONE, summary=summary, text=summary, timings=timings, finished_at=time.time())
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        """
+        JSON API:
+          GET  /health                  worker and job counts
+          GET  /metrics                 p50/p95 of recorded requests (see metrics.py)
+          POST /datasets                CSV body, optional X-Filename header
+          GET  /datasets/<id>           rows, warnings and entity names
+          POST /jobs                    {"dataset_id", "summary_type", "name", "regenerate"}
+          GET  /jobs/<id>               status, partial text and the summary when done
+        """
+
+        def log_message(self, format, *args):
+            logger.info("%s %s", self.address_string(), format % args)
+
+        def _send(self, status, body):
+            payload = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_UPLOAD_BYTES:
+                raise ValueError("Upload too large")
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            if parts == ["health"]:
+                return self._send(200, service.status())
+            if parts == ["metrics"]:
+                return self._send(200, aggregate(load_records()))
+            if len(parts) == 2 and parts[0] == "datasets":
+                dataset = service.describe_dataset(parts[1])
+                return self._send(200, dataset) if dataset else self._send(404, {"error": "Unknown dataset"})
+            if len(parts) == 2 and parts[0] == "jobs":
+                job = service.job(parts[1])
+                return self._send(200, job) if job else self._send(404, {"error": "Unknown job"})
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            try:
+                if parts == ["datasets"]:
+                    dataset_id = service.add_dataset(self._body(), self.headers.get("X-Filename"))
+                    return self._send(201, service.describe_dataset(dataset_id))
+                if parts == ["jobs"]:
+                    request = json.loads(self._body() or b"{}")
+                    job_id = service.submit(request.get("dataset_id"), request.get("summary_type"),
+                                            request.get("name"), request.get("regenerate", False))
+                    return self._send(202, {"job_id": job_id})
+            except KeyError:
+                return self._send(404, {"error": "Unknown dataset"})
+            except ValueError as error:
+                return self._send(400, {"error": str(error)})
+            self._send(404, {"error": "Not found"})
+
+    return Handler
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Starts the workers and serves the HTTP API until interrupted.
+    """
+    service.start()
+    server = ThreadingHTTPServer((host, port), _handler(service))
+    logger.info("summary service listening on http://%s:%d with %d workers", host, port, service.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+class ServiceClient:
+    """
+    Minimal client for the summary service, used by the Streamlit apps.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, path, body=None, headers=None):
+        req = urlrequest.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urlerror.HTTPError as error:
+            # Unknown datasets and jobs read as None; everything else is an error
+            if error.code == 404 and method == "GET":
+                return None
+            raise RuntimeError(json.loads(error.read() or b"{}").get("error", str(error))) from error
+
+    def dataset(self, dataset_id):
+        return self._call("GET", f"/datasets/{dataset_id}")
+
+    def upload_dataset(self, content, name=None, dataset_id=None):
+        """
+        Uploads a CSV unless the service already has it. Returns the dataset id.
+        """
+        if dataset_id and self.dataset(dataset_id):
+            return dataset_id
+        headers = {"Content-Type": "text/csv", "X-Filename": name or ""}
+        return self._call("POST", "/datasets", content, headers)["dataset_id"]
+
+    def submit(self, dataset_id, summary_type, name=None, regenerate=False):
+        body = json.dumps({"dataset_id": dataset_id, "summary_type": summary_type, "name": name,
+                           "regenerate": regenerate}).encode("utf-8")
+        return self._call("POST", "/jobs", body, {"Content-Type": "application/json"})["job_id"]
+
+    def job(self, job_id):
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def wait(self, job_id, on_update=None, poll_seconds=POLL_SECONDS):
+        """
+        Polls a job until it is done or failed, calling `on_update(job)` after
+        every poll. Returns the final job, or None if the service forgot it.
+        """
+        while True:
+            job = self.job(job_id)
+            if on_update and job:
+                on_update(job)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            time.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve feedback summaries over HTTP with a pool of worker threads.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Summary jobs run at the same time")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Parallel LLM calls per job for large uploads")
+    parser.add_argument("--db", default=DATABASE_FILE, help="SQLite database for summaries and the LLM cache")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from llm_client import build_llm
+
+    load_dotenv()
+    service = SummaryService(build_chain(build_llm()), args.db, args.workers, args.concurrency, LLMCache(args.db))
+    serve(service, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
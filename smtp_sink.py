@@ -0,0 +1,138 @@
+# smtp_sink.py
+import argparse
+import os
+import socketserver
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 1025
+
+# A received message: envelope sender, recipients and the raw message bytes
+ReceivedMessage = namedtuple('ReceivedMessage', ['sender', 'recipients', 'data'])
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server that accepts every message and keeps it in
+    `messages` (and writes it to `out_dir` as an .eml file, when given), for
+    trying out notifications without a real mail server. Recipients in
+    `reject` are refused permanently (550) and those in `defer` temporarily (451).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, out_dir=None, reject=(), defer=()):
+        super().__init__((host, port), _SMTPHandler)
+        self.out_dir = out_dir
+        self.reject = {address.lower() for address in reject}
+        self.defer = {address.lower() for address in defer}
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def deliver(self, message):
+        with self._lock:
+            self.messages.append(message)
+            count = len(self.messages)
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{count:06d}.eml"), "wb") as eml_file:
+                eml_file.write(message.data)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def _reset(self):
+        self.sender, self.recipients = None, []
+
+    def handle(self):
+        server = self.server
+        with server._lock:
+            server.connections += 1
+        self._reset()
+        self._reply(f"220 {DEFAULT_HOST} SMTP sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self._reply(f"250-{DEFAULT_HOST}")
+                self._reply("250 8BITMIME")
+            elif command == "HELO":
+                self._reply(f"250 {DEFAULT_HOST}")
+            elif command == "MAIL":
+                self._reset()
+                self.sender = argument.partition(":")[2].split()[0].strip("<>") if ":" in argument else ""
+                self._reply("250 OK")
+            elif command == "RCPT":
+                recipient = argument.partition(":")[2].strip().strip("<>")
+                if recipient.lower() in server.reject:
+                    self._reply("550 No such user")
+                elif recipient.lower() in server.defer:
+                    self._reply("451 Try again later")
+                else:
+                    self.recipients.append(recipient)
+                    self._reply("250 OK")
+            elif command == "DATA":
+                if not self.recipients:
+                    self._reply("503 No valid recipients")
+                    continue
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                server.deliver(ReceivedMessage(self.sender, self.recipients, b"".join(lines)))
+                self._reset()
+                self._reply("250 OK")
+            elif command == "RSET":
+                self._reset()
+                self._reply("250 OK")
+            elif command == "NOOP":
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP server that accepts notifications instead of sending them.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--out-dir", default="sent_mail", help="Directory the received messages are written to")
+    args = parser.parse_args()
+    sink = SMTPSink(args.host, args.port, args.out_dir)
+    print(f"Accepting mail on {args.host}:{args.port}, saving it to {args.out_dir}/ (set SMTP_HOST={args.host} SMTP_PORT={args.port})")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.server_close()
+        print(f"Received {len(sink.messages)} messages.")
+
+
+if __name__ == "__main__":
+    main()
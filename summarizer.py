@@ -0,0 +1,328 @@
+# summarizer.py
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from llm_cache import cached_invoke, cached_stream
+from metrics import stage_timer, count_tokens
+from prompt_budget import DEFAULT_TOKEN_BUDGET, CHARS_PER_TOKEN, estimate_tokens
+from prompts import (
+    get_prompt_template,
+    relevant_comment_rows,
+    compact_prompt,
+    chunk_summary_prompt,
+    merge_summaries_prompt,
+    reduce_summary_prompt,
+)
+
+# Number of chunk summaries requested from the LLM at the same time
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Tokens kept free in each chunk for the map-step instructions
+CHUNK_PROMPT_RESERVE = 400
+
+logger = logging.getLogger(__name__)
+
+
+def build_prompt_template():
+    # Imported on first use: LangChain takes most of a second to import and is
+    # not needed until a summary is requested
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", "You are a helpful assistant that summarizes feedback data for university internship programs."),
+            ("human", "{input}"),
+            ("system", "Here is the feedback data: {feedback_data}. Provide a structured summary based on this data."),
+        ]
+    )
+
+
+def build_chain(llm):
+    """
+    Connects the summarization prompt template to the LLM.
+    """
+    return build_prompt_template() | llm
+
+
+def clean_response(response_content):
+    """
+    Normalizes blank lines in the LLM output so Streamlit renders each line as a paragraph.
+    """
+    return response_content.replace("\n\n", "\n").replace("\n", "\n\n")
+
+
+class ResponseCleaner:
+    """
+    Applies clean_response to streamed text as it arrives. A run of newlines is
+    held back until the next character shows how long the run is.
+    """
+
+    def __init__(self):
+        self.pending_newlines = 0
+
+    def _newlines(self):
+        # clean_response turns a run of n newlines into ceil(n / 2) paragraph breaks
+        text = "\n\n" * ((self.pending_newlines + 1) // 2)
+        self.pending_newlines = 0
+        return text
+
+    def feed(self, text):
+        cleaned = []
+        for piece in re.split(r"(\n+)", text):
+            if piece.startswith("\n"):
+                self.pending_newlines += len(piece)
+            elif piece:
+                cleaned.append(self._newlines())
+                cleaned.append(piece)
+        return "".join(cleaned)
+
+    def flush(self):
+        return self._newlines()
+
+
+def _invoke(chain, instruction, prompt_text, cache=None, models=None):
+    return cached_invoke(chain, {"input": instruction, "feedback_data": prompt_text}, cache, models)
+
+
+def _stream(chain, instruction, prompt_text, cache, on_text, timings, models=None):
+    """
+    Streams the response, calling `on_text` with the cleaned text received so
+    far. Records time to first token and total time in `timings`, and the time
+    spent in `on_text` as 'render'.
+    """
+    cleaner = ResponseCleaner()
+    chunks = []
+    shown = ""
+    started = time.perf_counter()
+    for chunk in cached_stream(chain, {"input": instruction, "feedback_data": prompt_text}, cache, models):
+        if not chunks:
+            timings['time_to_first_token'] = time.perf_counter() - started
+        chunks.append(chunk)
+        shown += cleaner.feed(chunk)
+        with stage_timer(timings, 'render'):
+            on_text(shown)
+    with stage_timer(timings, 'render'):
+        on_text(shown + cleaner.flush())
+    timings['total'] = time.perf_counter() - started
+    timings.setdefault('time_to_first_token', timings['total'])
+    response_content = "".join(chunks)
+    count_tokens(timings, estimate_tokens(prompt_text), estimate_tokens(response_content), 1)
+    return response_content
+
+
+def _row_tokens(feedback):
+    """
+    Estimates how many prompt tokens each feedback row needs when sent verbatim.
+    """
+    df = pd.DataFrame(feedback)
+    row_chars = pd.Series(0, index=df.index)
+    for column in df.columns:
+        # Each value also costs a quote/comma separator; column names are sent once, not per row
+        row_chars += df[column].astype(str).str.len() + 4
+    return row_chars // CHARS_PER_TOKEN + 1
+
+
+def chunk_rows(feedback, token_budget):
+    """
+    Splits feedback rows (a dict of lists) into consecutive chunks that each fit in `token_budget` tokens.
+    """
+    row_tokens = _row_tokens(feedback)
+    chunk_ids = ((row_tokens.cumsum() - 1) // max(token_budget, 1)).to_numpy()
+    chunks = []
+    for chunk_id in pd.unique(chunk_ids):
+        rows = (chunk_ids == chunk_id).nonzero()[0]
+        chunks.append({key: [values[idx] for idx in rows] for key, values in feedback.items()})
+    return chunks
+
+
+def needs_map_reduce(prompt_template, feedback, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    True when even the compact view of the feedback rows (see
+    prompt_budget.compact_feedback) has to leave comments or aggregates out to
+    fit within the token budget.
+    """
+    _, omitted = compact_prompt(prompt_template, feedback, token_budget)
+    return omitted > 0
+
+
+def _run_all(chain, instruction, prompts, max_concurrency, cache, on_done, timings=None, models=None):
+    """
+    Sends prompts to the LLM concurrently, reusing and filling `cache`. Every
+    response that arrives is cached even if another call fails, so a retry only
+    pays for the missing ones. Token counts are added to `timings`.
+    """
+    results = [None] * len(prompts)
+    first_error = None
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = {
+            pool.submit(_invoke, chain, instruction, prompt_text, cache, models): idx
+            for idx, prompt_text in enumerate(prompts)
+        }
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as error:
+                first_error = first_error or error
+                continue
+            on_done()
+    if first_error is not None:
+        raise first_error
+    if timings is not None:
+        count_tokens(
+            timings,
+            sum(estimate_tokens(prompt_text) for prompt_text in prompts),
+            sum(estimate_tokens(response) for response in results),
+            len(prompts),
+        )
+    return results
+
+
+def _group_by_budget(summaries, token_budget):
+    """
+    Groups consecutive summaries so that each group fits in `token_budget` tokens.
+    """
+    groups = [[]]
+    used = 0
+    for summary in summaries:
+        cost = estimate_tokens(summary) + 10
+        if groups[-1] and used + cost > token_budget:
+            groups.append([])
+            used = 0
+        groups[-1].append(summary)
+        used += cost
+    if len(groups) == len(summaries):
+        # Every summary is large on its own; merge them pairwise so the tree still shrinks
+        groups = [summaries[idx:idx + 2] for idx in range(0, len(summaries), 2)]
+    return groups
+
+
+def map_reduce_summarize(chain, summary_option, prompt_template, feedback, subject,
+                         token_budget=DEFAULT_TOKEN_BUDGET, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                         cache=None, progress_callback=None, on_text=None, timings=None, models=None):
+    """
+    Summarizes feedback that is too large for one context window: rows are split
+    into chunks that are summarized concurrently (map), then the partial
+    summaries are merged in a tree until they fit in the option's own prompt (reduce).
+
+    `cache` is an LLMCache or any dict-like object; chunk and merge results are stored in it.
+    `progress_callback(stage, done, total)` is called as LLM calls complete.
+    When `on_text` is given the final summary is streamed to it (see summarize_feedback).
+    `timings` (a dict) receives the time spent building prompts and waiting for the LLM.
+    `models` (a list) receives the model that answered each call (see llm_cache.summary_model).
+    """
+    timings = timings if timings is not None else {}
+
+    def report(stage, total):
+        done = [0]
+        if progress_callback:
+            progress_callback(stage, 0, total)
+
+        def on_done():
+            done[0] += 1
+            if progress_callback:
+                progress_callback(stage, done[0], total)
+        return on_done
+
+    with stage_timer(timings, 'prompt_build'):
+        chunks = chunk_rows(feedback, token_budget - CHUNK_PROMPT_RESERVE)
+        chunk_prompts = [
+            chunk_summary_prompt(chunk, subject, idx + 1, len(chunks), token_budget)
+            for idx, chunk in enumerate(chunks)
+        ]
+    instruction = f"Summarize one part of the feedback data for {summary_option}."
+    with stage_timer(timings, 'llm_call'):
+        summaries = _run_all(chain, instruction, chunk_prompts, max_concurrency, cache,
+                             report("map", len(chunk_prompts)), timings, models)
+
+    level = 0
+    final_prompt = reduce_summary_prompt(prompt_template, summaries)
+    while estimate_tokens(final_prompt) > token_budget and len(summaries) > 1:
+        level += 1
+        with stage_timer(timings, 'prompt_build'):
+            overhead = estimate_tokens(merge_summaries_prompt([], subject))
+            groups = _group_by_budget(summaries, token_budget - overhead)
+            merge_prompts = [merge_summaries_prompt(group, subject) for group in groups if len(group) > 1]
+        instruction = f"Merge the partial summaries of the feedback data for {summary_option}."
+        with stage_timer(timings, 'llm_call'):
+            merged = iter(_run_all(chain, instruction, merge_prompts, max_concurrency, cache,
+                                   report(f"reduce level {level}", len(merge_prompts)), timings, models))
+        # Single-summary groups are carried to the next level unchanged
+        summaries = [next(merged) if len(group) > 1 else group[0] for group in groups]
+        final_prompt = reduce_summary_prompt(prompt_template, summaries)
+
+    instruction = f"Summarize the feedback data for {summary_option}."
+    if on_text is not None:
+        return _timed_stream(chain, instruction, final_prompt, cache, on_text, timings, models)
+    with stage_timer(timings, 'llm_call'):
+        return _run_all(chain, instruction, [final_prompt], 1, cache, report("final summary", 1), timings, models)[0]
+
+
+def _timed_stream(chain, instruction, prompt_text, cache, on_text, timings, models=None):
+    # Rendering happens between chunks, so it is taken out of the LLM call time
+    rendered = timings.get('render', 0.0)
+    with stage_timer(timings, 'llm_call'):
+        response_content = _stream(chain, instruction, prompt_text, cache, on_text, timings, models)
+    timings['llm_call'] -= timings['render'] - rendered
+    return response_content
+
+
+def progress_reporter(progress_bar):
+    """
+    Returns a progress_callback that drives a Streamlit progress bar. Pass an
+    `st.empty()` placeholder to only show the bar once there is progress to report.
+    """
+    def update(stage, done, total):
+        progress_bar.progress(done / total if total else 1.0, text=f"Summarizing ({stage}): {done}/{total}")
+    return update
+
+
+def summarize_feedback(chain, summary_option, data_dict, additional_input=None,
+                       token_budget=DEFAULT_TOKEN_BUDGET, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                       cache=None, progress_callback=None, on_text=None, timings=None, models=None):
+    """
+    Generates the summary for the selected option, switching to map-reduce when
+    the compacted rows do not fit in a single prompt (a company, student or mentor
+    with many rows lists its most representative comments instead). Returns the
+    cleaned response.
+
+    When `on_text` is given, the summary is streamed: `on_text` is called with the
+    cleaned text received so far after every chunk. `timings` (a dict) receives
+    'time_to_first_token' and 'total' in seconds for the streamed call, the
+    seconds spent in each pipeline stage (see metrics.STAGES) and estimated
+    prompt and completion token counts. `models` (a list) receives the model
+    that answered each LLM call; llm_cache.summary_model names the summary's
+    model from it (None when a stand-in model wrote it).
+    """
+    timings = timings if timings is not None else {}
+    with stage_timer(timings, 'filter'):
+        prompt_template, feedback = get_prompt_template(summary_option, data_dict, additional_input)
+        # A large company, student or mentor is summarized from its most representative
+        # comments (plus aggregates of every row) in one call instead of with map-reduce
+        comment_rows = relevant_comment_rows(summary_option, feedback)
+    with stage_timer(timings, 'prompt_build'):
+        prompt_text, omitted = compact_prompt(prompt_template, feedback, token_budget, comment_rows)
+    # Map-reduce only when the compact prompt could not hold every comment (see needs_map_reduce)
+    if comment_rows is None and omitted:
+        subject = f"'{additional_input}' ({summary_option})" if additional_input else "all students and companies"
+        response_content = map_reduce_summarize(
+            chain, summary_option, prompt_template, feedback, subject,
+            token_budget, max_concurrency, cache, progress_callback, on_text, timings, models,
+        )
+    else:
+        instruction = f"Summarize the feedback data for {summary_option}."
+        if on_text is not None:
+            response_content = _timed_stream(chain, instruction, prompt_text, cache, on_text, timings, models)
+        else:
+            with stage_timer(timings, 'llm_call'):
+                response_content = _invoke(chain, instruction, prompt_text, cache, models)
+            count_tokens(timings, estimate_tokens(prompt_text), estimate_tokens(response_content), 1)
+    if 'time_to_first_token' in timings:
+        logger.info(
+            "summary option=%r input=%r time_to_first_token=%.3fs total=%.3fs",
+            summary_option, additional_input, timings['time_to_first_token'], timings['total'],
+        )
+    with stage_timer(timings, 'post_process'):
+        return clean_response(response_content)
@@ -0,0 +1,18 @@
+# test_feedback_nlp.py
+import feedback_nlp
+from feedback_nlp import label_matrix
+
+
+def test_label_matrix_keeps_cached_rows_when_cache_is_evicted(monkeypatch):
+    monkeypatch.setattr(feedback_nlp, 'MAX_CACHED_TEXTS', 4)
+    monkeypatch.setattr(feedback_nlp, '_label_cache', {})
+    cached = ["Great communication with the team", "Excellent technical knowledge"]
+    fresh = ["Good at solving problems", "Very creative ideas", "Punctual and disciplined"]
+    expected = label_matrix(cached + fresh).to_numpy()
+    feedback_nlp._label_cache.clear()
+    label_matrix(cached)
+    # Two cached plus three new texts crosses the limit and clears the cache mid-call
+    result = label_matrix(cached + fresh + [None])
+    assert (result.to_numpy()[:-1] == expected).all()
+    assert result.iloc[:2].to_numpy().sum(axis=1).min() > 0
+    assert result.iloc[-1].sum() == 0
@@ -0,0 +1,35 @@
+# test_prompt_budget.py
+from benchmark import synthetic_feedback
+from feedback_store import STRENGTHS_COLUMN
+from prompt_budget import compact_feedback, estimate_tokens
+
+SECTION_HEADERS = ("Aggregated ratings and answers:", "People and organisations:", "Comments")
+
+
+def _feedback(rows=120):
+    df = synthetic_feedback(rows)
+    # Distinct comments, so the comment section has more than the budget can hold
+    df[STRENGTHS_COLUMN] = [f"Comment {idx} about the intern's work on the project" for idx in range(rows)]
+    return df.to_dict('list')
+
+
+def test_compact_feedback_stays_within_small_budgets():
+    feedback = _feedback()
+    for comment_rows in (None, list(range(20))):
+        for token_budget in list(range(0, 400, 3)) + [1000, 3000]:
+            text, tokens, _ = compact_feedback(feedback, token_budget, comment_rows)
+            assert tokens == estimate_tokens(text)
+            assert tokens <= token_budget, (token_budget, text)
+            lines = text.splitlines()
+            # A section header always has at least one line under it
+            for position, line in enumerate(lines):
+                if line.startswith(SECTION_HEADERS):
+                    assert position + 1 < len(lines) and not lines[position + 1].startswith(SECTION_HEADERS), (token_budget, text)
+
+
+def test_compact_feedback_reports_omitted_comments():
+    feedback = _feedback()
+    _, _, omitted = compact_feedback(feedback, 300)
+    assert omitted > 0
+    _, _, omitted = compact_feedback(feedback, 100000)
+    assert omitted == 0
@@ -0,0 +1,28 @@
+# test_startup.py
+from benchmark import startup_profile, synthetic_feedback
+
+# Imports the apps must only load on demand (when a summary is generated or a chart drawn)
+LAZY_MODULES = {'langchain_core', 'langchain_groq', 'matplotlib', 'plotly'}
+
+# The bundled export integrated.py analyses when the catalog is empty (PERFORMANCE_DATA_FILE)
+PERFORMANCE_DATA_FILE = "Industry Mentor Feedback Form (AY 2023-24).csv"
+
+
+def _loaded_at_startup(script, workdir):
+    profile = startup_profile(script, runs=1, workdir=str(workdir))
+    assert profile["error"] is None, f"{script} stopped early: {profile['error']}"
+    return set(profile["heavy_modules"]) & LAZY_MODULES
+
+
+def test_apps_load_heavy_modules_lazily(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEEDBACK_CATALOG_DIR", str(tmp_path / "catalog"))
+    # integrated.py draws its analytics charts on the first run; native charts need no extra imports
+    monkeypatch.setenv("FEEDBACK_CHART_BACKEND", "native")
+    synthetic_feedback(60).to_csv(tmp_path / PERFORMANCE_DATA_FILE, index=False)
+    # Some Streamlit versions import plotly themselves; only what the apps add on top counts
+    bare_app = tmp_path / "bare_app.py"
+    bare_app.write_text("import streamlit as st\n")
+    preloaded = _loaded_at_startup(bare_app, tmp_path)
+
+    for script in ('app.py', 'integrated.py'):
+        assert _loaded_at_startup(script, tmp_path) - preloaded == set(), f"{script} imports heavy modules at startup"